@@ -3,25 +3,46 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from app.api import api_router
+from app.api.v1.auth.keys import key_ring
+from app.api.v1.auth.revocation import revocation_list
 from app.config import settings
 from app.db import db_helper
+from app.db.partitions import messages_partitions
+from app.db.redis import pubsub_listener
 from app.logger import logger
+from app.metrics import metrics
+from app.metrics.lookups import RequestLookupsMiddleware
 from app.rabbitmq import rabbitmq_client
+from app.utils.passwords import password_hasher
+from app.utils.warmup import warmup
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> None:
     """Жизненный цикл приложения."""
     logger.debug("Инициализация FastAPI приложения")
+    key_ring.load()
     await rabbitmq_client.connect()
+    await pubsub_listener.start()
+    await revocation_list.start()
+    warmup.start()
+    await messages_partitions.start()
 
     yield
 
     logger.debug("Закрытие FasAPI приложения")
+    await warmup.stop()
+    await messages_partitions.stop()
+    await revocation_list.stop()
+    await pubsub_listener.stop()
     await db_helper.dispose()
     await rabbitmq_client.close()
+    password_hasher.shutdown()
 
 
 main_app = FastAPI(lifespan=lifespan)
 
+if settings.metrics.enabled:
+    main_app.add_middleware(RequestLookupsMiddleware, registry=metrics)
+
 main_app.include_router(api_router, prefix=settings.api.prefix)
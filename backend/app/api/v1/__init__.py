@@ -1,4 +1,6 @@
 from fastapi import APIRouter  # noqa: I001
+from app.api.v1.health import health_router
+from app.api.v1.metrics import metrics_router
 from app.api.v1.users import users_router
 from app.api.v1.websocket import websocket_router
 
@@ -6,5 +8,8 @@ from app.config import settings as settings
 
 v1_router = APIRouter()
 
+v1_router.include_router(health_router, prefix=settings.api.v1.endpoints.health)
 v1_router.include_router(users_router, prefix=settings.api.v1.endpoints.users)
 v1_router.include_router(websocket_router, prefix=settings.api.v1.endpoints.websocket)
+if settings.metrics.enabled:
+    v1_router.include_router(metrics_router, prefix=settings.api.v1.endpoints.metrics)
@@ -1,13 +1,18 @@
+import base64
+import binascii
 from datetime import datetime, timezone
-from uuid import UUID
+from uuid import UUID, uuid4
 
 import jwt
+import orjson
 from cryptography.hazmat.primitives.asymmetric.ec import EllipticCurvePrivateKey
 from cryptography.hazmat.primitives.asymmetric.ed448 import Ed448PrivateKey
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
 from fastapi import HTTPException, status
 
+from app.api.v1.auth.keys import JWTKeyRing, key_ring
+from app.api.v1.auth.token_cache import VerifiedTokenCache, verified_token_cache
 from app.config import settings
 
 
@@ -15,53 +20,85 @@ def _create_token(
     payload: dict[str, str | datetime],
     secret: RSAPrivateKey | EllipticCurvePrivateKey | Ed25519PrivateKey | Ed448PrivateKey | str | bytes,
     algorithm: str,
+    headers: dict[str, str] | None = None,
 ) -> str:
     """Создание токена."""
     return jwt.encode(
         payload=payload,
         key=secret,
         algorithm=algorithm,
+        headers=headers,
     )
 
 
-def create_access_token(user_id: UUID) -> str:
-    """Создает access token."""
-    return _create_token(
+def _create_signed_token(payload: dict[str, str | datetime], keys: JWTKeyRing = key_ring) -> str:
+    """Создание токена подписанного активным ключом из связки."""
+    key = keys.get_signing_key()
+    return _create_token(payload=payload, secret=key.private_key, algorithm=key.algorithm, headers={"kid": key.kid})
+
+
+def create_access_token(user_id: UUID, claims: dict[str, bool | int | None] | None = None) -> str:
+    """Создает access token.
+
+    В claims передаются дополнительные данные пользователя, которые вшиваются в токен.
+    """
+    return _create_signed_token(
         payload={
+            **(claims or {}),
             "sub": str(user_id),
+            "jti": uuid4().hex,
             "token_type": "access",
             "iat": datetime.now(timezone.utc),
             "exp": datetime.now(timezone.utc) + settings.jwt.access_token_expires_delta,
         },
-        secret=settings.jwt.private_key_path.read_bytes(),
-        algorithm=settings.jwt.algorithm,
     )
 
 
 def create_refresh_token(user_id: UUID) -> str:
     """Создает refresh token."""
-    return _create_token(
+    return _create_signed_token(
         payload={
             "sub": str(user_id),
+            "jti": uuid4().hex,
             "token_type": "refresh",
             "iat": datetime.now(timezone.utc),
             "exp": datetime.now(timezone.utc) + settings.jwt.refresh_token_expires_delta,
         },
-        secret=settings.jwt.private_key_path.read_bytes(),
-        algorithm=settings.jwt.algorithm,
     )
 
 
-def decode_token(token: str) -> dict[str, str | datetime]:
+def _get_token_kid(token: str) -> str | None:
+    """Достает kid из заголовка токена без полного разбора токена."""
+    header_segment = token.partition(".")[0]
+    try:
+        header = orjson.loads(base64.urlsafe_b64decode(header_segment + "=" * (-len(header_segment) % 4)))
+    except (binascii.Error, ValueError) as e:
+        raise jwt.DecodeError("Некорректный заголовок токена") from e
+    if not isinstance(header, dict):
+        raise jwt.DecodeError("Некорректный заголовок токена")
+    kid = header.get("kid")
+    return kid if isinstance(kid, str) else None
+
+
+def decode_token(
+    token: str, keys: JWTKeyRing = key_ring, cache: VerifiedTokenCache = verified_token_cache
+) -> dict[str, str | datetime]:
     """Декодирует токен и возвращает его payload."""
+    payload = cache.get(token)
+    if payload is not None:
+        return payload
     try:
+        key = keys.get_verification_key(_get_token_kid(token))
+        if key is None:
+            raise jwt.InvalidTokenError("Неизвестный kid")
         payload = jwt.decode(
             token,
-            key=settings.jwt.public_key_path.read_bytes(),
-            algorithms=[settings.jwt.algorithm],
+            key=key.public_key,
+            algorithms=[key.algorithm],
         )
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    cache.set(token, payload)
     return payload
@@ -0,0 +1,262 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed448, ed25519, rsa
+from jwt.algorithms import get_default_algorithms
+
+from app.config import settings
+from app.logger import logger
+
+PRIVATE_KEY_SUFFIX = ".pem"
+PUBLIC_KEY_SUFFIX = ".pub"
+PEM_PREFIX = b"-----BEGIN"
+
+# Алгоритмы подписи для ключей на эллиптических кривых.
+EC_CURVE_ALGORITHMS: dict[str, str] = {
+    "secp256r1": "ES256",
+    "secp384r1": "ES384",
+    "secp521r1": "ES512",
+}
+EC_ALGORITHM_CURVES: dict[str, type[ec.EllipticCurve]] = {
+    "ES256": ec.SECP256R1,
+    "ES384": ec.SECP384R1,
+    "ES512": ec.SECP521R1,
+}
+RSA_ALGORITHMS: tuple[str, ...] = ("RS256", "RS384", "RS512", "PS256", "PS384", "PS512")
+
+
+def get_key_algorithm(key: Any, rsa_algorithm: str = "RS256") -> str:
+    """Определяет алгоритм подписи JWT по типу ключа."""
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return rsa_algorithm
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+        algorithm = EC_CURVE_ALGORITHMS.get(key.curve.name)
+        if algorithm is None:
+            raise ValueError(f"Неподдерживаемая кривая {key.curve.name}")
+        return algorithm
+    if isinstance(
+        key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey, ed448.Ed448PrivateKey, ed448.Ed448PublicKey)
+    ):
+        return "EdDSA"
+    raise ValueError(f"Неподдерживаемый тип ключа {type(key).__name__}")
+
+
+def generate_key_pair(algorithm: str) -> tuple[bytes, bytes]:
+    """Генерирует пару ключей для алгоритма и возвращает приватный и публичный ключи в формате PEM."""
+    if algorithm in RSA_ALGORITHMS:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=settings.jwt.rsa_key_size)
+    elif algorithm in EC_ALGORITHM_CURVES:
+        private_key = ec.generate_private_key(EC_ALGORITHM_CURVES[algorithm]())
+    elif algorithm == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f"Неподдерживаемый алгоритм {algorithm}")
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem, public_pem
+
+
+@dataclass(frozen=True, slots=True)
+class JWTKey:
+    """Разобранная пара ключей JWT."""
+
+    kid: str
+    algorithm: str
+    private_key: Any | None
+    public_key: Any
+
+
+class JWTKeyRing:
+    """Связка ключей для подписи и проверки JWT.
+
+    Ключи читаются с диска и разбираются один раз, после чего используются готовые объекты cryptography.
+    Алгоритм каждого ключа определяется по его типу, поэтому в связке одновременно могут быть RSA, EC и Ed25519
+    ключи. Токен проверяется только алгоритмом своего ключа и только если алгоритм входит в allowed_algorithms.
+    Каталог ключей перечитывается не чаще чем раз в reload_interval секунд и только если в нем что-то изменилось,
+    поэтому новые ключи подхватываются без перезапуска воркеров. Токен с неизвестным kid тоже вызывает проверку
+    каталога, но не чаще чем раз в unknown_kid_reload_interval секунд, иначе поток токенов со случайными kid
+    заставлял бы воркер проверять файлы на каждом запросе.
+    """
+
+    def __init__(
+        self,
+        keys_dir: Path,
+        algorithm: str,
+        allowed_algorithms: list[str] | None = None,
+        active_kid: str | None = None,
+        legacy_private_key_path: Path | None = None,
+        legacy_public_key_path: Path | None = None,
+        legacy_kid: str = "default",
+        reload_interval: float = 60,
+        unknown_kid_reload_interval: float = 5,
+    ) -> None:
+        """Настройки связки ключей."""
+        self.keys_dir: Path = keys_dir
+        self.algorithm: str = algorithm
+        self.allowed_algorithms: set[str] = set(allowed_algorithms or ()) | {algorithm}
+        self.active_kid: str | None = active_kid
+        self.legacy_private_key_path: Path | None = legacy_private_key_path
+        self.legacy_public_key_path: Path | None = legacy_public_key_path
+        self.legacy_kid: str = legacy_kid
+        self.reload_interval: float = reload_interval
+        self.unknown_kid_reload_interval: float = unknown_kid_reload_interval
+        self._next_unknown_kid_check: float = 0
+        self._keys: dict[str, JWTKey] = {}
+        self._signing_kid: str | None = None
+        self._fingerprint: tuple | None = None
+        self._next_check: float = 0
+
+    @property
+    def loaded(self) -> bool:
+        """Были ли ключи уже загружены."""
+        return self._fingerprint is not None
+
+    @property
+    def kids(self) -> list[str]:
+        """Идентификаторы загруженных ключей."""
+        self._maybe_reload()
+        return list(self._keys)
+
+    def load(self) -> None:
+        """Читает и разбирает все ключи."""
+        fingerprint = self._get_fingerprint()
+        keys: dict[str, JWTKey] = {}
+        newest: dict[str, int] = {}
+
+        candidates: list[tuple[str, Path | None, Path]] = []
+        if self.legacy_public_key_path is not None and (
+            self.legacy_public_key_path.exists()
+            or (self.legacy_private_key_path is not None and self.legacy_private_key_path.exists())
+        ):
+            candidates.append((self.legacy_kid, self.legacy_private_key_path, self.legacy_public_key_path))
+        if self.keys_dir.is_dir():
+            key_suffixes = (PRIVATE_KEY_SUFFIX, PUBLIC_KEY_SUFFIX)
+            kids = {path.stem for path in self.keys_dir.iterdir() if path.suffix in key_suffixes}
+            for kid in sorted(kids):
+                candidates.append(
+                    (kid, self.keys_dir / f"{kid}{PRIVATE_KEY_SUFFIX}", self.keys_dir / f"{kid}{PUBLIC_KEY_SUFFIX}")
+                )
+
+        for kid, private_key_path, public_key_path in candidates:
+            try:
+                keys[kid] = self._load_key(kid, private_key_path, public_key_path)
+            except (OSError, ValueError, TypeError) as e:
+                logger.error(f"Не удалось загрузить JWT ключ {kid}", exc_info=e)
+                continue
+            if keys[kid].algorithm not in self.allowed_algorithms:
+                logger.warning(f"JWT ключ {kid} пропущен: алгоритм {keys[kid].algorithm} не разрешен")
+                del keys[kid]
+                continue
+            if kid != self.legacy_kid and private_key_path.exists():
+                newest[kid] = private_key_path.stat().st_mtime_ns
+
+        signing_kid = self.active_kid
+        if signing_kid is None:
+            if newest:
+                signing_kid = max(newest, key=lambda kid: (newest[kid], kid))
+            elif self.legacy_kid in keys:
+                signing_kid = self.legacy_kid
+        if signing_kid is not None and (signing_kid not in keys or keys[signing_kid].private_key is None):
+            logger.error(f"Для подписи JWT выбран ключ {signing_kid}, но его приватная часть не найдена")
+            signing_kid = None
+
+        self._keys = keys
+        self._signing_kid = signing_kid
+        self._fingerprint = fingerprint
+        self._next_check = time.monotonic() + self.reload_interval
+        logger.debug(f"Загружены JWT ключи {list(keys)}, ключ подписи {signing_kid}")
+
+    def get_signing_key(self) -> JWTKey:
+        """Возвращает ключ для подписи новых токенов."""
+        self._maybe_reload()
+        if self._signing_kid is None:
+            raise RuntimeError("Не найден ключ для подписи JWT")
+        return self._keys[self._signing_kid]
+
+    def get_verification_key(self, kid: str | None) -> JWTKey | None:
+        """Возвращает ключ для проверки подписи токена с заданным kid."""
+        self._maybe_reload()
+        if kid is None:
+            kid = self.legacy_kid if self.legacy_kid in self._keys else self._signing_kid
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() >= self._next_unknown_kid_check:
+            self._next_unknown_kid_check = time.monotonic() + self.unknown_kid_reload_interval
+            if self._reload_if_changed():
+                key = self._keys.get(kid)
+        return key
+
+    def _maybe_reload(self) -> None:
+        """Загружает ключи при первом обращении и периодически проверяет каталог на изменения."""
+        if not self.loaded:
+            self.load()
+        elif time.monotonic() >= self._next_check:
+            self._reload_if_changed()
+
+    def _reload_if_changed(self) -> bool:
+        """Перечитывает ключи если файлы изменились."""
+        self._next_check = time.monotonic() + self.reload_interval
+        if self._get_fingerprint() == self._fingerprint:
+            return False
+        logger.info("Обнаружены изменения в JWT ключах, перечитываю")
+        self.load()
+        return True
+
+    def _get_fingerprint(self) -> tuple:
+        """Слепок имен, размеров и времени изменения файлов ключей."""
+        paths = [self.legacy_private_key_path, self.legacy_public_key_path]
+        if self.keys_dir.is_dir():
+            paths.extend(sorted(self.keys_dir.iterdir()))
+        fingerprint = []
+        for path in paths:
+            if path is None or not path.is_file():
+                continue
+            stat = path.stat()
+            fingerprint.append((str(path), stat.st_size, stat.st_mtime_ns))
+        return tuple(fingerprint)
+
+    def _load_key(self, kid: str, private_key_path: Path | None, public_key_path: Path) -> JWTKey:
+        """Читает и разбирает пару ключей."""
+        private_key = None
+        if private_key_path is not None and private_key_path.exists():
+            private_key = serialization.load_pem_private_key(private_key_path.read_bytes(), password=None)
+        if public_key_path.exists():
+            public_key = self._load_public_key(public_key_path.read_bytes())
+        elif private_key is not None:
+            public_key = private_key.public_key()
+        else:
+            raise FileNotFoundError(f"Не найден публичный ключ {public_key_path}")
+        rsa_algorithm = self.algorithm if self.algorithm in RSA_ALGORITHMS else "RS256"
+        algorithm = get_key_algorithm(public_key, rsa_algorithm)
+        if private_key is not None and get_key_algorithm(private_key, rsa_algorithm) != algorithm:
+            raise ValueError(f"Приватный и публичный ключи {kid} не совпадают по типу")
+        return JWTKey(kid=kid, algorithm=algorithm, private_key=private_key, public_key=public_key)
+
+    def _load_public_key(self, data: bytes) -> Any:
+        """Разбирает публичный ключ.
+
+        PEM ключи разбираются cryptography, остальные форматы, например OpenSSH ssh-rsa, через pyjwt
+        алгоритмом из настроек, как до поддержки нескольких алгоритмов.
+        """
+        if data.lstrip().startswith(PEM_PREFIX):
+            return serialization.load_pem_public_key(data)
+        return get_default_algorithms()[self.algorithm].prepare_key(data)
+
+
+key_ring = JWTKeyRing(
+    keys_dir=settings.jwt.keys_dir,
+    algorithm=settings.jwt.algorithm,
+    allowed_algorithms=settings.jwt.allowed_algorithms,
+    active_kid=settings.jwt.active_kid,
+    legacy_private_key_path=settings.jwt.private_key_path,
+    legacy_public_key_path=settings.jwt.public_key_path,
+    legacy_kid=settings.jwt.legacy_kid,
+    reload_interval=settings.jwt.keys_reload_interval,
+    unknown_kid_reload_interval=settings.jwt.keys_unknown_kid_reload_interval,
+)
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import math
+import time
+from datetime import datetime
+
+from redis.exceptions import RedisError
+
+from app.api.v1.auth.token_cache import VerifiedTokenCache, verified_token_cache
+from app.config import settings
+from app.db.pubsub import PubSubSyncedState, RedisPubSubListener
+from app.db.redis import pubsub_listener, redis_breaker, redis_client
+from app.db.redis_cluster import RedisClient, execute_and_publish, pipeline
+from app.logger import logger
+from app.metrics import metrics
+from app.utils.circuit_breaker import CircuitBreaker
+
+
+class BloomFilter:
+    """Фильтр Блума для строк.
+
+    Отвечает "точно нет" или "возможно да". Удалять элементы нельзя, поэтому фильтр периодически пересобирается.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        """Рассчитывает размер фильтра под ожидаемое количество элементов и долю ложных срабатываний."""
+        self.capacity: int = max(capacity, 1)
+        self.error_rate: float = error_rate
+        self.size: int = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count: int = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.count: int = 0
+        self._bits: bytearray = bytearray((self.size + 7) // 8)
+
+    def _indexes(self, item: str) -> list[int]:
+        """Номера битов элемента, двойное хеширование по sha256."""
+        digest = hashlib.sha256(item.encode("utf-8")).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:16], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str) -> None:
+        """Добавляет элемент."""
+        for index in self._indexes(item):
+            self._bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[index >> 3] & (1 << (index & 7)) for index in self._indexes(item))
+
+
+class TokenRevocationList(PubSubSyncedState):
+    """Список отозванных токенов.
+
+    Источник истины - sorted set в Redis, где элемент это jti, а score это exp токена.
+    Каждый воркер держит фильтр Блума по этому множеству и обновляет его через pub/sub, поэтому в Redis
+    обращение идет только когда фильтр говорит "возможно отозван" или когда подписка на обновления не работает.
+    Если Redis недоступен, а фильтр не может ответить "точно нет", проверка завершается RedisError: решение
+    принимает вызывающий, токен не считается действительным молча.
+    Отзывы, пришедшие пока фильтр пересобирается, запоминаются и добавляются в новый фильтр перед заменой,
+    иначе они попали бы только в старый фильтр и потерялись.
+    """
+
+    def __init__(
+        self,
+        redis: RedisClient,
+        listener: RedisPubSubListener,
+        key: str,
+        channel: str,
+        capacity: int,
+        error_rate: float,
+        rebuild_interval: float,
+        token_cache: VerifiedTokenCache | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """Настройки списка отзыва.
+
+        Проверки токенов в Redis выполняются через выключатель breaker, если он задан.
+        """
+        self.redis: RedisClient = redis
+        self.key: str = key
+        self.channel: str = channel
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.rebuild_interval: float = rebuild_interval
+        self.token_cache: VerifiedTokenCache | None = token_cache
+        self.breaker: CircuitBreaker | None = breaker
+        self._filter: BloomFilter = BloomFilter(capacity, error_rate)
+        self._pending: list[str] | None = None
+        self._rebuild_lock: asyncio.Lock = asyncio.Lock()
+        self._rebuild_task: asyncio.Task | None = None
+        self.subscribe(listener, channel, self._add)
+
+        self._checks = metrics.counter("token_revocation_checks_total", "Проверки токенов по списку отзыва")
+        metrics.gauge("token_revocation_filter_items", "Элементов в фильтре Блума отзыва", lambda: self._filter.count)
+
+    async def start(self) -> None:
+        """Запускает периодическую пересборку фильтра."""
+        if self._rebuild_task is None:
+            self._rebuild_task = asyncio.create_task(self._periodic_rebuild())
+
+    async def stop(self) -> None:
+        """Останавливает периодическую пересборку фильтра."""
+        if self._rebuild_task is not None:
+            self._rebuild_task.cancel()
+            try:
+                await self._rebuild_task
+            except asyncio.CancelledError:
+                pass
+            self._rebuild_task = None
+
+    async def revoke(self, jti: str, exp: int | float | datetime) -> None:
+        """Отзывает токен до момента его истечения."""
+        if isinstance(exp, datetime):
+            exp = exp.timestamp()
+        async with pipeline(self.redis, transaction=False) as pipe:
+            pipe.zadd(self.key, {jti: exp})
+            pipe.zremrangebyscore(self.key, "-inf", time.time())
+            await execute_and_publish(self.redis, pipe, [(self.channel, jti)])
+        self._add(jti)
+
+    async def is_revoked(self, payload: dict[str, str | datetime]) -> bool:
+        """Проверяет отозван ли токен. Если ответ требует Redis, а он недоступен, выбрасывает RedisError."""
+        jti = payload.get("jti")
+        if jti is None:
+            return False
+        if self._synced and jti not in self._filter:
+            self._checks.inc(result="filter_miss")
+            return False
+        try:
+            if self.breaker is not None:
+                score = await self.breaker.call(lambda: self.redis.zscore(self.key, jti))
+            else:
+                score = await self.redis.zscore(self.key, jti)
+        except RedisError:
+            self._checks.inc(result="unavailable")
+            raise
+        self._checks.inc(result="redis")
+        return score is not None
+
+    def _add(self, jti: str) -> None:
+        """Добавляет jti в локальный фильтр и убирает токен из кеша проверенных."""
+        self._filter.add(jti)
+        if self._pending is not None:
+            self._pending.append(jti)
+        if self.token_cache is not None:
+            self.token_cache.evict_where(lambda payload: payload.get("jti") == jti)
+
+    async def _resync(self) -> None:
+        """После подключения подписки фильтр собирается заново, пока подписки нет каждая проверка идет в Redis."""
+        await self._rebuild()
+
+    async def _rebuild(self) -> None:
+        """Пересобирает фильтр по актуальному содержимому Redis.
+
+        При ошибке Redis остается старый фильтр, а ошибка передается вызывающему.
+        """
+        async with self._rebuild_lock:
+            self._pending = []
+            try:
+                await self.redis.zremrangebyscore(self.key, "-inf", time.time())
+                revoked = await self.redis.zrange(self.key, 0, -1)
+                bloom = BloomFilter(max(self.capacity, (len(revoked) + len(self._pending)) * 2), self.error_rate)
+                for jti in revoked:
+                    bloom.add(jti)
+                # Между чтением из Redis и заменой фильтра нет await, поэтому после этого цикла отзывы не теряются.
+                for jti in self._pending:
+                    bloom.add(jti)
+                self._filter = bloom
+            finally:
+                self._pending = None
+        logger.debug(f"Фильтр отозванных токенов пересобран, элементов: {bloom.count}")
+
+    async def _periodic_rebuild(self) -> None:
+        """Периодическая пересборка фильтра, чтобы из него уходили истекшие токены."""
+        while True:
+            await asyncio.sleep(self.rebuild_interval)
+            if not self._synced:
+                continue
+            try:
+                await self._rebuild()
+            except RedisError as e:
+                logger.error("Не удалось пересобрать фильтр отозванных токенов", exc_info=e)
+            except Exception as e:
+                # Задача пересборки не должна завершаться, иначе истекшие токены навсегда останутся в фильтре.
+                logger.error("Ошибка пересборки фильтра отозванных токенов", exc_info=e)
+
+
+revocation_list = TokenRevocationList(
+    redis=redis_client,
+    listener=pubsub_listener,
+    key=settings.redis.revoked_tokens_key,
+    channel=settings.redis.revoked_tokens_channel,
+    capacity=settings.jwt.revocation_filter_capacity,
+    error_rate=settings.jwt.revocation_filter_error_rate,
+    rebuild_interval=settings.jwt.revocation_filter_rebuild_interval,
+    token_cache=verified_token_cache,
+    breaker=redis_breaker,
+)
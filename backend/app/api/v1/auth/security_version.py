@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict
+from uuid import UUID
+
+from app.config import settings
+from app.db.pubsub import PubSubSyncedState, RedisPubSubListener
+from app.db.redis import pubsub_listener, redis_breaker, redis_client
+from app.db.redis_cluster import RedisClient, execute_and_publish, pipeline
+from app.metrics import metrics
+from app.metrics.lookups import count_lookup
+from app.utils.circuit_breaker import CircuitBreaker
+
+
+class UserSecurityVersions(PubSubSyncedState):
+    """Версии безопасности пользователей.
+
+    Версия увеличивается при каждом изменении, после которого выданные access токены с вшитыми данными
+    пользователя должны перестать приниматься. Источник истины - счетчик в Redis, отсутствие ключа означает версию 0.
+    Каждый воркер держит LRU кеш версий, который обновляется сообщениями из pub/sub канала,
+    поэтому проверка токена в большинстве случаев обходится без обращений к Redis.
+    """
+
+    def __init__(
+        self,
+        redis: RedisClient,
+        listener: RedisPubSubListener,
+        prefix: str,
+        channel: str,
+        max_size: int,
+        ttl: float,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """Настройки хранилища версий.
+
+        Чтение версий из Redis выполняется через выключатель breaker, если он задан.
+        """
+        self.redis: RedisClient = redis
+        self.prefix: str = prefix
+        self.channel: str = channel
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self.breaker: CircuitBreaker | None = breaker
+        self._versions: OrderedDict[str, tuple[float, int]] = OrderedDict()
+        self.subscribe(listener, channel, self._on_message)
+
+        self._lookups = metrics.counter(
+            "user_security_version_lookups_total", "Получение версий безопасности по источнику"
+        )
+        metrics.gauge("user_security_version_cache_items", "Версий безопасности в кеше воркера", lambda: len(self))
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def _key(self, user_id: str) -> str:
+        """Ключ счетчика версии пользователя."""
+        return f"{self.prefix}:{user_id}"
+
+    def _remember(self, user_id: str, version: int, invalidations: int) -> None:
+        """Сохраняет версию в локальный кеш."""
+        if self.max_size <= 0 or not self._can_remember(invalidations):
+            return
+        self._versions[user_id] = (time.monotonic() + self.ttl, version)
+        self._versions.move_to_end(user_id)
+        while len(self._versions) > self.max_size:
+            self._versions.popitem(last=False)
+
+    async def get(self, user_id: UUID | str) -> int:
+        """Текущая версия безопасности пользователя.
+
+        Если Redis недоступен, выбрасывает RedisError.
+        """
+        user_id = str(user_id)
+        entry = self._versions.get(user_id)
+        if entry is not None:
+            expires_at, version = entry
+            if expires_at > time.monotonic():
+                self._versions.move_to_end(user_id)
+                self._lookups.inc(source="local")
+                return version
+            del self._versions[user_id]
+        self._lookups.inc(source="redis")
+        count_lookup("redis")
+        invalidations = self._invalidations
+        key = self._key(user_id)
+        if self.breaker is not None:
+            value = await self.breaker.call(lambda: self.redis.get(key))
+        else:
+            value = await self.redis.get(key)
+        version = int(value or 0)
+        self._remember(user_id, version, invalidations)
+        return version
+
+    async def bump(self, user_id: UUID | str) -> int:
+        """Увеличивает версию пользователя и рассылает ее воркерам. Возвращает новую версию."""
+        user_id = str(user_id)
+        async with pipeline(self.redis) as pipe:
+            pipe.incr(self._key(user_id))
+            (version,) = await execute_and_publish(self.redis, pipe, [(self.channel, user_id)])
+        self._on_message(user_id)
+        return version
+
+    def _on_message(self, user_id: str) -> None:
+        """Версия пользователя изменилась, значение будет перечитано из Redis при следующей проверке."""
+        self._invalidations += 1
+        self._versions.pop(user_id, None)
+
+    def _reset(self) -> None:
+        """Очищает кеш версий."""
+        self._versions.clear()
+
+
+security_versions = UserSecurityVersions(
+    redis=redis_client,
+    listener=pubsub_listener,
+    prefix=settings.redis.security_version_prefix,
+    channel=settings.redis.security_version_channel,
+    max_size=settings.jwt.security_version_cache_size,
+    ttl=settings.jwt.security_version_cache_ttl,
+    breaker=redis_breaker,
+)
@@ -0,0 +1,88 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable
+
+from app.config import settings
+
+
+class VerifiedTokenCache:
+    """Ограниченный LRU кеш payload уже проверенных токенов.
+
+    Ключом служит sha256 от токена, сам токен в памяти не хранится. Запись живет не дольше exp токена
+    и не дольше ttl секунд.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        """Настройки кеша."""
+        self.max_size: int = max_size
+        self.ttl: float = ttl
+        self._entries: OrderedDict[bytes, tuple[float, dict[str, str | datetime]]] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        """Ключ кеша для токена."""
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> dict[str, str | datetime] | None:
+        """Возвращает payload проверенного токена или None."""
+        if self.max_size <= 0:
+            return None
+        digest = self._digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.time():
+            del self._entries[digest]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return payload
+
+    def set(self, token: str, payload: dict[str, str | datetime]) -> None:
+        """Сохраняет payload проверенного токена."""
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        digest = self._digest(token)
+        self._entries[digest] = (expires_at, payload)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def evict(self, token: str) -> bool:
+        """Удаляет токен из кеша. Возвращает True если токен был в кеше."""
+        return self._entries.pop(self._digest(token), None) is not None
+
+    def evict_where(self, predicate: Callable[[dict[str, str | datetime]], bool]) -> int:
+        """Удаляет все записи payload которых удовлетворяет условию. Возвращает количество удаленных записей."""
+        digests = [digest for digest, (_, payload) in self._entries.items() if predicate(payload)]
+        for digest in digests:
+            del self._entries[digest]
+        return len(digests)
+
+    def evict_subject(self, sub: str) -> int:
+        """Удаляет все токены выданные пользователю."""
+        return self.evict_where(lambda payload: payload.get("sub") == sub)
+
+    def clear(self) -> None:
+        """Очищает кеш."""
+        self._entries.clear()
+
+
+verified_token_cache = VerifiedTokenCache(
+    max_size=settings.jwt.verified_tokens_cache_size,
+    ttl=settings.jwt.verified_tokens_cache_ttl,
+)
@@ -6,7 +6,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.v1.classifiers.schemas import TimezoneCacheSchema
 from app.config import settings
 from app.db.models import Timezone
-from app.db.redis import get_object_from_cache, update_object_cache
+from app.db.redis import CacheBatch, get_many_objects_from_cache
+from app.utils.cache_loader import cache_aside
 
 
 async def get_list_timezones(session: AsyncSession) -> Sequence[Timezone]:
@@ -26,6 +27,15 @@ async def _get_timezone_by_id_from_db(
     return result.scalar()
 
 
+@cache_aside(settings.redis.timezone_prefix, TimezoneCacheSchema)
+async def _get_timezone_by_id_from_cache(session: AsyncSession, id: int) -> TimezoneCacheSchema | None:
+    """Получение информации о таймзоне из кеша, при промахе таймзона загружается из бд."""
+    tz = await _get_timezone_by_id_from_db(session, id)
+    if tz is None:
+        return None
+    return TimezoneCacheSchema.model_validate(tz)
+
+
 async def get_timezone_by_id(
     session: AsyncSession, id: int | None, cache: bool = True
 ) -> Timezone | TimezoneCacheSchema | None:
@@ -37,11 +47,22 @@ async def get_timezone_by_id(
         tz: Timezone = await _get_timezone_by_id_from_db(session, id)
         return tz
 
-    tz_cache: TimezoneCacheSchema = await get_object_from_cache(settings.redis.timezone_prefix, id, TimezoneCacheSchema)
-    if tz_cache is None:
-        tz: Timezone = await _get_timezone_by_id_from_db(session, id)
-        if tz is None:
-            return None
-        tz_cache = TimezoneCacheSchema.model_validate(tz)
-        await update_object_cache(settings.redis.timezone_prefix, tz_cache)
-    return tz_cache
+    return await _get_timezone_by_id_from_cache(session, id)
+
+
+async def warm_up_timezones_cache(session: AsyncSession) -> int:
+    """Загружает в кеш отсутствующие в нем таймзоны и возвращает количество таймзон.
+
+    Таймзоны, которые уже есть в Redis, при проверке попадают и в локальный кеш воркера. Записанные таймзоны
+    попадут в него при первом чтении, потому что запись инвалидирует их в локальных кешах.
+    """
+    prefix = settings.redis.timezone_prefix
+    timezones = [TimezoneCacheSchema.model_validate(tz) for tz in await get_list_timezones(session)]
+    cached = await get_many_objects_from_cache(prefix, [tz.id for tz in timezones], TimezoneCacheSchema)
+    missing = [tz for tz, cached_tz in zip(timezones, cached) if cached_tz is None]
+    if missing:
+        batch = CacheBatch()
+        for tz in missing:
+            batch.set_object(prefix, tz)
+        await batch.execute()
+    return len(timezones)
@@ -4,10 +4,13 @@ from uuid import UUID
 from fastapi import HTTPException, status
 from fastapi.params import Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from redis.exceptions import RedisError
 from typing_extensions import Annotated
 
 from app.api.v1.auth.jwt import decode_token
+from app.api.v1.auth.revocation import revocation_list
 from app.api.v1.users.schemas import RefreshTokenSchema
+from app.logger import logger
 
 http_bearer = HTTPBearer()
 
@@ -17,18 +20,50 @@ def get_payload_from_refresh_token_from_json(token: RefreshTokenSchema) -> dict[
     return decode_token(token.refresh_token)
 
 
-def get_user_id_from_refresh_token(payload: Annotated[dict, Depends(get_payload_from_refresh_token_from_json)]) -> UUID:
+async def is_token_revoked(payload: dict[str, datetime | str]) -> bool:
+    """Проверяет отозван ли токен.
+
+    Если проверить токен нельзя из-за недоступности Redis, запрос отклоняется с 503: принять возможно
+    отозванный токен хуже, чем временно не обслуживать запросы.
+    """
+    try:
+        return await revocation_list.is_revoked(payload)
+    except RedisError as e:
+        logger.error("Список отзыва токенов недоступен, запрос отклонен", exc_info=e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Проверка токена временно недоступна"
+        ) from e
+
+
+async def validate_not_revoked(payload: dict[str, datetime | str]) -> None:
+    """Проверяет что токен не отозван."""
+    if await is_token_revoked(payload):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Токен отозван")
+
+
+async def get_user_id_from_refresh_token(
+    payload: Annotated[dict, Depends(get_payload_from_refresh_token_from_json)],
+) -> UUID:
     """Получает user_id из refresh токена."""
     if payload.get("token_type") != "refresh":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Тип токена должен быть 'refresh'")
+    await validate_not_revoked(payload)
     return UUID(payload["sub"])
 
 
-async def get_current_user_id(credentials: Annotated[HTTPAuthorizationCredentials, Depends(http_bearer)]) -> UUID:
-    """Получает User_id из токена."""
+async def get_access_token_payload(
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(http_bearer)],
+) -> dict[str, datetime | str]:
+    """Получает payload проверенного access токена."""
     payload = decode_token(credentials.credentials)
     if not payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный токен")
     if payload["token_type"] != "access":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Тип токена должен быть 'access'")
+    await validate_not_revoked(payload)
+    return payload
+
+
+async def get_current_user_id(payload: Annotated[dict, Depends(get_access_token_payload)]) -> UUID:
+    """Получает User_id из токена."""
     return UUID(payload["sub"])
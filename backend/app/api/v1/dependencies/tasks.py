@@ -6,16 +6,16 @@ from fastapi.params import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from app.api.v1.dependencies.users import get_current_user
+from app.api.v1.dependencies.users import get_current_user_identity, get_current_user_session
 from app.api.v1.tasks import crud
-from app.db import db_helper
-from app.db.models import Task, User
+from app.api.v1.users.schemas import UserIdentitySchema
+from app.db.models import Task
 
 
 async def get_task_by_id_for_current_user(
     task_id: UUID,
-    session: Annotated[AsyncSession, Depends(db_helper.get_session)],
-    user: Annotated[User, Depends(get_current_user)],
+    session: Annotated[AsyncSession, Depends(get_current_user_session)],
+    user: Annotated[UserIdentitySchema, Depends(get_current_user_identity)],
 ) -> Task:
     """Получение задачи по id для текущего пользователя."""
     task = await crud.get_task_by_id_repo(session, task_id, joinedload(Task.task_status))
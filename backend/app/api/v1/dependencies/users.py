@@ -1,17 +1,27 @@
+import functools
+from collections.abc import AsyncGenerator
+from datetime import datetime
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.v1.dependencies.jwt import get_current_user_id, get_user_id_from_refresh_token
+from app.api.v1.auth.security_version import security_versions
+from app.api.v1.dependencies.jwt import get_access_token_payload, get_current_user_id, get_user_id_from_refresh_token
 from app.api.v1.users import crud
-from app.api.v1.users.schemas import UserCacheSchema, UserLoginSchema, UserReadTZSchema
+from app.api.v1.users.schemas import UserCacheSchema, UserIdentitySchema, UserLoginSchema, UserReadTZSchema
+from app.api.v1.users.tools import add_tz_to_user
+from app.config import settings
 from app.db import db_helper
 from app.db.models import User
+from app.db.read_your_writes import read_your_writes
+from app.logger import logger
+from app.utils.rate_limiter import get_client_ip, login_rate_limiter
 
 
-def validate_user(user: User | UserCacheSchema | UserReadTZSchema | None) -> bool:
+def validate_user(user: User | UserCacheSchema | UserReadTZSchema | UserIdentitySchema | None) -> bool:
     """Валидирует пользователя."""
     if user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пользователь не найден")
@@ -21,39 +31,172 @@ def validate_user(user: User | UserCacheSchema | UserReadTZSchema | None) -> boo
 
 
 async def auth_user(
-    user_credentials: UserLoginSchema, session: Annotated[AsyncSession, Depends(db_helper.get_session)]
+    user_credentials: UserLoginSchema,
+    request: Request,
+    session: Annotated[AsyncSession, Depends(db_helper.get_lazy_session)],
 ) -> User:
     """Возвращает авторизованного пользователя."""
+    if settings.rate_limit.login_enabled:
+        await login_rate_limiter.check(email=user_credentials.email.lower(), ip=get_client_ip(request))
     user = await crud.get_user_by_email(session, user_credentials.email)
     validate_user(user)
-    if not user.verify_password(user_credentials.password):
+    if not await user.verify_password_async(user_credentials.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный email или пароль")
+    await crud.rehash_password_if_needed(session, user, user_credentials.password)
     return user
 
 
-async def get_current_user(
+async def get_identity_from_access_token(payload: dict) -> UserIdentitySchema | None:
+    """Получает данные пользователя, вшитые в access токен.
+
+    Возвращает None, если токен их не содержит. Версия безопасности сверяется с кешем воркера,
+    поэтому токен выданный до изменения пользователя не принимается. Если версия недоступна из-за Redis,
+    тоже возвращается None, и данные пользователя загружаются из кеша или базы, как для токенов без них.
+    """
+    if not settings.jwt.self_contained_access_tokens or "sv" not in payload:
+        return None
+    try:
+        version = await security_versions.get(payload["sub"])
+    except RedisError as e:
+        logger.warning(f"Версия безопасности недоступна, данные пользователя загружаются из базы: {e}")
+        return None
+    if payload["sv"] != version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Данные пользователя изменились, обновите токен"
+        )
+    return UserIdentitySchema(id=payload["sub"], active=payload["act"], timezone_id=payload["tz"])
+
+
+class CurrentUserContext:
+    """Текущий пользователь запроса.
+
+    Создается один раз на запрос и запоминает загруженного пользователя, поэтому зависимости и обработчики
+    одного запроса получают пользователя не больше одного раза. Пользователь с таймзоной подходит и для
+    запросов без таймзоны, а пользователь без таймзоны дополняется ей без повторной загрузки.
+    """
+
+    def __init__(self, payload: dict[str, datetime | str], session: AsyncSession) -> None:
+        """Контекст по payload проверенного access токена."""
+        self.payload: dict[str, datetime | str] = payload
+        self.user_id: UUID = UUID(payload["sub"])
+        self.session: AsyncSession = session
+        self._user: UserCacheSchema | None = None
+        self._user_with_tz: UserReadTZSchema | None = None
+        self._identity: UserIdentitySchema | None = None
+
+    async def get_user(self) -> UserCacheSchema:
+        """Текущий активный пользователь."""
+        if self._user is None:
+            if self._user_with_tz is not None:
+                self._user = UserCacheSchema.model_validate(self._user_with_tz)
+            else:
+                user = await crud.get_user_by_id(self.session, self.user_id)
+                validate_user(user)
+                self._user = user
+        return self._user
+
+    async def get_user_with_tz(self) -> UserReadTZSchema:
+        """Текущий активный пользователь с информацией о таймзоне."""
+        if self._user_with_tz is None:
+            if self._user is not None:
+                self._user_with_tz = await add_tz_to_user(self._user, self.session)
+            else:
+                user = await crud.get_user_by_id(self.session, self.user_id, with_tz=True)
+                validate_user(user)
+                self._user_with_tz = user
+        return self._user_with_tz
+
+    async def get_identity(self) -> UserIdentitySchema:
+        """Данные пользователя для авторизации запроса.
+
+        Для токенов с вшитыми данными пользователя обходится без обращения к кешу и базе, иначе из кеша
+        читаются только нужные поля, если пользователь еще не загружен целиком.
+        """
+        if self._identity is None:
+            identity = await get_identity_from_access_token(self.payload)
+            if identity is None:
+                user = self._user_with_tz or self._user
+                if user is not None:
+                    identity = UserIdentitySchema.model_validate(user)
+                else:
+                    identity = await crud.get_user_identity_by_id(self.session, self.user_id)
+            validate_user(identity)
+            self._identity = identity
+        return self._identity
+
+
+async def get_current_user_session(
     user_id: Annotated[UUID, Depends(get_current_user_id)],
-    session: Annotated[AsyncSession, Depends(db_helper.get_session)],
+) -> AsyncGenerator[AsyncSession, None]:
+    """Сессия к основной базе для запросов текущего пользователя.
+
+    После каждой фиксации транзакции чтения пользователя на время read_your_writes_window идут
+    в основную базу, чтобы он видел свои изменения.
+    """
+    on_commit = functools.partial(read_your_writes.mark, user_id) if db_helper.has_replicas else None
+    async with db_helper.lazy_session(on_commit) as session:
+        yield session
+
+
+async def get_current_user_read_session(
+    user_id: Annotated[UUID, Depends(get_current_user_id)],
+) -> AsyncGenerator[AsyncSession, None]:
+    """Сессия только для чтения для запросов текущего пользователя.
+
+    Открывается к реплике, а если пользователь недавно записывал в базу - к основной базе.
+    """
+    primary = db_helper.has_replicas and await read_your_writes.is_recent(user_id)
+    async with db_helper.read_session(primary=primary) as session:
+        yield session
+
+
+async def get_current_user_context(
+    payload: Annotated[dict, Depends(get_access_token_payload)],
+    session: Annotated[AsyncSession, Depends(get_current_user_session)],
+) -> CurrentUserContext:
+    """Контекст текущего пользователя, общий для всех зависимостей запроса."""
+    return CurrentUserContext(payload, session)
+
+
+async def get_current_user_read_context(
+    payload: Annotated[dict, Depends(get_access_token_payload)],
+    session: Annotated[AsyncSession, Depends(get_current_user_read_session)],
+) -> CurrentUserContext:
+    """Контекст текущего пользователя для обработчиков, которые только читают данные."""
+    return CurrentUserContext(payload, session)
+
+
+async def get_current_user(
+    context: Annotated[CurrentUserContext, Depends(get_current_user_context)],
 ) -> UserCacheSchema:
     """Получает текущего пользователя."""
-    user = await crud.get_user_by_id(session, user_id)
-    validate_user(user)
-    return user
+    return await context.get_user()
 
 
 async def get_current_user_with_tz(
-    user_id: Annotated[UUID, Depends(get_current_user_id)],
-    session: Annotated[AsyncSession, Depends(db_helper.get_session)],
+    context: Annotated[CurrentUserContext, Depends(get_current_user_context)],
 ) -> UserReadTZSchema:
     """Получает текущего пользователя с информацией о таймзоне."""
-    user = await crud.get_user_by_id(session, user_id, with_tz=True)
-    validate_user(user)
-    return user
+    return await context.get_user_with_tz()
+
+
+async def get_current_user_with_tz_for_read(
+    context: Annotated[CurrentUserContext, Depends(get_current_user_read_context)],
+) -> UserReadTZSchema:
+    """Получает текущего пользователя с информацией о таймзоне через сессию только для чтения."""
+    return await context.get_user_with_tz()
+
+
+async def get_current_user_identity(
+    context: Annotated[CurrentUserContext, Depends(get_current_user_context)],
+) -> UserIdentitySchema:
+    """Получает данные текущего активного пользователя."""
+    return await context.get_identity()
 
 
 async def get_user_from_refresh_token(
     user_id: Annotated[UUID, Depends(get_user_id_from_refresh_token)],
-    session: Annotated[AsyncSession, Depends(db_helper.get_session)],
+    session: Annotated[AsyncSession, Depends(db_helper.get_lazy_session)],
 ) -> UserCacheSchema:
     """Получает объект пользователя из рефреш токена."""
     user = await crud.get_user_by_id(session, user_id)
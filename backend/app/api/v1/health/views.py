@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Response, status
+
+from app.api.v1.core.schemas import ConfirmSchema
+from app.utils.warmup import warmup
+
+router = APIRouter(tags=["Health"])
+
+
+@router.get("/live", include_in_schema=False)
+async def liveness() -> ConfirmSchema:
+    """Воркер запущен и обрабатывает запросы."""
+    return ConfirmSchema(success=True)
+
+
+@router.get("/ready", include_in_schema=False)
+async def readiness(response: Response) -> ConfirmSchema:
+    """Готов ли воркер принимать запросы. До завершения прогрева и при остановке отвечает 503."""
+    if not warmup.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return ConfirmSchema(success=warmup.ready)
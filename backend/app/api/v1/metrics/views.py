@@ -0,0 +1,30 @@
+import ipaddress
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.metrics import metrics
+
+ALLOWED_NETWORKS: list[ipaddress.IPv4Network | ipaddress.IPv6Network] = [
+    ipaddress.ip_network(network) for network in settings.metrics.allowed_networks
+]
+
+
+def check_metrics_access(request: Request) -> None:
+    """Пропускает только запросы с адресов из settings.metrics.allowed_networks."""
+    try:
+        address = ipaddress.ip_address(request.client.host) if request.client is not None else None
+    except ValueError:
+        address = None
+    if address is None or not any(address in network for network in ALLOWED_NETWORKS):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Доступ к метрикам запрещен")
+
+
+router = APIRouter(tags=["Metrics"], dependencies=[Depends(check_metrics_access)])
+
+
+@router.get("/", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics() -> str:
+    """Метрики текущего воркера в текстовом формате Prometheus."""
+    return metrics.render()
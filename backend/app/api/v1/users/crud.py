@@ -2,21 +2,33 @@ import uuid
 from datetime import datetime, timezone
 from uuid import UUID
 
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
 from pydantic import EmailStr
+from redis.exceptions import RedisError
 from sqlalchemy import or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 import app.api.v1.classifiers.crud as classifiers_crud
-from app.api.v1.users.schemas import UserCacheSchema, UserReadTZSchema
+from app.api.v1.auth.security_version import security_versions
+from app.api.v1.users.schemas import UserCacheSchema, UserIdentitySchema, UserReadTZSchema
 from app.config import settings
 from app.constants import FileTypes
 from app.db.models import User
-from app.db.redis import delete_from_cache, get_raw_data_from_cache, update_object_cache, update_raw_data_cache
+from app.db.redis import CacheBatch, get_object_fields_from_cache, update_object_fields_cache
+from app.utils.cache_loader import cache_aside
 from app.utils.file_utils import delete_file, save_file, validate_file_extension, validate_file_size
 
 
+async def _cache_user(user_cache: UserCacheSchema, cache_batch: CacheBatch | None = None) -> None:
+    """Записывает пользователя и его username в кеш за одно обращение к Redis."""
+    if cache_batch is None:
+        cache_batch = CacheBatch()
+    cache_batch.set_object(settings.redis.user_prefix, user_cache)
+    cache_batch.set_raw_data(settings.redis.username_prefix, user_cache.username, str(user_cache.id))
+    await cache_batch.execute()
+
+
 async def create_user(
     session: AsyncSession,
     email: str,
@@ -35,7 +47,7 @@ async def create_user(
         phone=phone,
         timezone_id=timezone_id,
     )
-    user.password = password
+    await user.set_password(password)
     if image is not None:
         validate_file_size(image, FileTypes.USER_IMAGE)
         validate_file_extension(image, FileTypes.USER_IMAGE)
@@ -43,8 +55,7 @@ async def create_user(
     session.add(user)
     await session.commit()
     user_cache = UserCacheSchema.model_validate(user)
-    await update_object_cache(settings.redis.user_prefix, user_cache)
-    await update_raw_data_cache(settings.redis.username_prefix, user_cache.username, str(user_cache.id))
+    await _cache_user(user_cache)
     return user_cache
 
 
@@ -83,6 +94,15 @@ async def _get_user_by_id_from_db(session: AsyncSession, user_id: UUID, with_tz:
     return results.scalar()
 
 
+@cache_aside(settings.redis.user_prefix, UserCacheSchema, store=_cache_user)
+async def _get_user_by_id_from_cache(session: AsyncSession, user_id: UUID) -> UserCacheSchema | None:
+    """Получение пользователя из кеша, при промахе пользователь загружается из бд."""
+    user = await _get_user_by_id_from_db(session, user_id)
+    if user is None:
+        return None
+    return UserCacheSchema.model_validate(user)
+
+
 async def get_user_by_id(
     session: AsyncSession, user_id: UUID, cache: bool = True, with_tz: bool = False
 ) -> User | UserCacheSchema | UserReadTZSchema | None:
@@ -90,25 +110,34 @@ async def get_user_by_id(
     if not cache:
         return await _get_user_by_id_from_db(session, user_id, with_tz)
 
-    user_raw_cache = await get_raw_data_from_cache(settings.redis.user_prefix, user_id)
-    if user_raw_cache is not None:
-        if with_tz:
-            user_raw_cache["timezone"] = await classifiers_crud.get_timezone_by_id(
-                session, user_raw_cache["timezone_id"]
-            )
-            user_cache = UserReadTZSchema(**user_raw_cache)
-        else:
-            user_cache = UserCacheSchema(**user_raw_cache)
+    user_cache = await _get_user_by_id_from_cache(session, user_id)
+    if user_cache is None or not with_tz:
         return user_cache
+    return UserReadTZSchema(
+        **user_cache.model_dump(),
+        timezone=await classifiers_crud.get_timezone_by_id(session, user_cache.timezone_id),
+    )
 
-    user = await _get_user_by_id_from_db(session, user_id, with_tz)
-    await update_object_cache(settings.redis.user_prefix, UserCacheSchema.model_validate(user))
-    await update_raw_data_cache(settings.redis.username_prefix, user.username, str(user.id))
-    if with_tz:
-        user_cache = UserReadTZSchema.model_validate(user)
+
+async def get_user_identity_by_id(session: AsyncSession, user_id: UUID) -> UserIdentitySchema | None:
+    """Возвращает данные пользователя для авторизации запроса.
+
+    Если пользователь хранится в кеше по полям, читаются только нужные поля. Если кеш недоступен,
+    пользователь загружается из базы.
+    """
+    try:
+        cached = await get_object_fields_from_cache(
+            settings.redis.user_prefix, user_id, UserIdentitySchema, UserCacheSchema
+        )
+    except RedisError:
+        pass
     else:
-        user_cache = UserCacheSchema.model_validate(user)
-    return user_cache
+        if cached.found:
+            return cached.value
+    user_cache = await _get_user_by_id_from_cache(session, user_id)
+    if user_cache is None:
+        return None
+    return UserIdentitySchema.model_validate(user_cache)
 
 
 async def schedule_user_deletion(session: AsyncSession, user_id: uuid.UUID) -> UserCacheSchema:
@@ -123,7 +152,8 @@ async def schedule_user_deletion(session: AsyncSession, user_id: uuid.UUID) -> U
     updated_user = result.scalar_one()
     await session.commit()
     user_cache = UserCacheSchema.model_validate(updated_user)
-    await update_object_cache(settings.redis.user_prefix, user_cache)
+    await update_object_fields_cache(settings.redis.user_prefix, user_cache, ["scheduled_deletion_date"])
+    await security_versions.bump(user_id)
     return user_cache
 
 
@@ -138,30 +168,41 @@ async def update_user_repo(
     timezone_id: int | None = None,
 ) -> UserCacheSchema:
     """Частичное обновление информации о пользователе."""
+    changed = set()
     if email is not None:
         user.email = email
+        changed.add("email")
+    cache_batch = CacheBatch()
     if username is not None:
-        await delete_from_cache(settings.redis.username_prefix, user.username)
-        await update_raw_data_cache(settings.redis.username_prefix, username, str(user.id))
+        cache_batch.delete(settings.redis.username_prefix, user.username)
         user.username = username
+        changed.add("username")
     if display_name is not None:
         user.display_name = display_name
+        changed.add("display_name")
     if phone is not None:
         user.phone = phone
+        changed.add("phone")
     if image is not None:
         validate_file_size(image, FileTypes.USER_IMAGE)
         validate_file_extension(image, FileTypes.USER_IMAGE)
         if user.image is not None:
             delete_file(user.image, settings.files.users_images_path)
         user.image = await save_file(image, settings.files.users_images_path)
+        changed.add("image")
     if timezone_id is not None:
         if timezone_id == 0:
             user.timezone_id = None
         else:
             user.timezone_id = timezone_id
+        changed.add("timezone_id")
     await session.commit()
     user_cache = UserCacheSchema.model_validate(user)
-    await update_object_cache(settings.redis.user_prefix, user_cache)
+    cache_batch.update_fields(settings.redis.user_prefix, user_cache, changed)
+    if username is not None:
+        cache_batch.set_raw_data(settings.redis.username_prefix, user_cache.username, str(user_cache.id))
+    await cache_batch.execute()
+    await security_versions.bump(user.id)
     return user_cache
 
 
@@ -172,12 +213,26 @@ async def cancel_user_deletion(session: AsyncSession, user_id: uuid.UUID) -> Use
     updated_user = result.scalar_one()
     await session.commit()
     user_cache = UserCacheSchema.model_validate(updated_user)
-    await update_object_cache(settings.redis.user_prefix, user_cache)
+    await update_object_fields_cache(settings.redis.user_prefix, user_cache, ["scheduled_deletion_date"])
     return user_cache
 
 
+async def rehash_password_if_needed(session: AsyncSession, user: User, plain_password: str) -> bool:
+    """Пересчитывает хеш проверенного пароля, если он сохранен с устаревшей стоимостью bcrypt."""
+    if not user.password_needs_rehash():
+        return False
+    try:
+        await user.rehash_password(plain_password)
+    except HTTPException:
+        # Пул bcrypt перегружен, хеш будет пересчитан при следующем входе.
+        return False
+    await session.commit()
+    return True
+
+
 async def change_user_password(session: AsyncSession, user: User, new_password: str) -> bool:
     """Меняет пароль пользователя."""
-    user.password = new_password
+    await user.set_password(new_password)
     await session.commit()
+    await security_versions.bump(user.id)
     return True
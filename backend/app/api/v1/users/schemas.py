@@ -58,6 +58,16 @@ class UserCacheSchema(BaseUserSchema):
     id: UUID
 
 
+class UserIdentitySchema(BaseModel):
+    """Данные пользователя, необходимые для авторизации запроса."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    active: bool
+    timezone_id: int | None
+
+
 class UserReadTZSchema(UserWithoutTZSchema):
     """Сериализатор пользователя для операций чтения с информацией о таймзоне."""
 
@@ -3,14 +3,18 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
 from pydantic import EmailStr
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.v1.auth.jwt import create_access_token, create_refresh_token, decode_token
+from app.api.v1.auth.revocation import revocation_list
+from app.api.v1.auth.security_version import security_versions
 from app.api.v1.core.schemas import ConfirmSchema
-from app.api.v1.dependencies.jwt import get_current_user_id
+from app.api.v1.dependencies.jwt import get_current_user_id, is_token_revoked
 from app.api.v1.dependencies.users import (
     auth_user,
-    get_current_user_with_tz,
+    get_current_user_session,
+    get_current_user_with_tz_for_read,
     get_user_from_refresh_token,
     validate_user,
 )
@@ -24,27 +28,46 @@ from app.api.v1.users.schemas import (
     UserReadTZSchema,
 )
 from app.api.v1.users.tools import add_tz_to_user
+from app.config import settings
 from app.constants import DEFAULT_RESPONSES
 from app.db import db_helper
 from app.db.models import User
+from app.logger import logger
 
 router = APIRouter(tags=["Users"])
 
 
+async def _create_tokens_pair(user: User | UserCacheSchema) -> JWTTokensPairWithTokenTypeSchema:
+    """Создает пару токенов для пользователя.
+
+    Если версия безопасности недоступна, access токен выдается без вшитых данных пользователя:
+    такой токен проверяется по кешу и базе, а вход не зависит от доступности Redis.
+    """
+    claims = None
+    if settings.jwt.self_contained_access_tokens:
+        try:
+            claims = {"act": user.active, "tz": user.timezone_id, "sv": await security_versions.get(user.id)}
+        except RedisError as e:
+            logger.warning(f"Версия безопасности недоступна, токен выдан без данных пользователя: {e}")
+    return JWTTokensPairWithTokenTypeSchema(
+        access_token=create_access_token(user.id, claims),
+        refresh_token=create_refresh_token(user.id),
+    )
+
+
 @router.post(
     "/jwt/create/",
     status_code=status.HTTP_201_CREATED,
     responses={
         status.HTTP_401_UNAUTHORIZED: {"description": "Ошибка авторизации"},
         status.HTTP_403_FORBIDDEN: {"description": "Аккаунт пользователя не активен"},
+        status.HTTP_429_TOO_MANY_REQUESTS: {"description": "Слишком много попыток входа"},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "Сервер перегружен"},
     },
 )
 async def create_tokens(user: Annotated[User, Depends(auth_user)]) -> JWTTokensPairWithTokenTypeSchema:
     """Логин пользователя для получения JWT токенов."""
-    return JWTTokensPairWithTokenTypeSchema(
-        access_token=create_access_token(user.id),
-        refresh_token=create_refresh_token(user.id),
-    )
+    return await _create_tokens_pair(user)
 
 
 @router.post(
@@ -55,24 +78,47 @@ async def create_tokens(user: Annotated[User, Depends(auth_user)]) -> JWTTokensP
     },
 )
 async def tokens_refresh(
-    user: Annotated[User | UserCacheSchema, Depends(get_user_from_refresh_token)]
+    user: Annotated[User | UserCacheSchema, Depends(get_user_from_refresh_token)],
 ) -> JWTTokensPairWithTokenTypeSchema:
     """Обновление токенов по refresh токену."""
-    return JWTTokensPairWithTokenTypeSchema(
-        access_token=create_access_token(user.id),
-        refresh_token=create_refresh_token(user.id),
-    )
+    return await _create_tokens_pair(user)
 
 
-@router.post("/jwt/validate/")
+@router.post(
+    "/jwt/validate/",
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "Список отзыва токенов недоступен"}},
+)
 async def token_validate(token: JWTTokenForValidationSchema) -> TokenValidationResultSchema:
     """Валидирует токен."""
     try:
-        decode_token(token.token)
+        payload = decode_token(token.token)
     except HTTPException:
         return TokenValidationResultSchema(validation_result=False)
-    else:
-        return TokenValidationResultSchema(validation_result=True)
+    return TokenValidationResultSchema(validation_result=not await is_token_revoked(payload))
+
+
+@router.post(
+    "/jwt/revoke/",
+    response_model=ConfirmSchema,
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"description": "Токен не поддерживает отзыв"},
+        status.HTTP_401_UNAUTHORIZED: {"description": "Некорректный токен"},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {"description": "Список отзыва токенов недоступен"},
+    },
+)
+async def token_revoke(token: JWTTokenForValidationSchema) -> ConfirmSchema:
+    """Отзывает access или refresh токен до истечения его срока действия."""
+    payload = decode_token(token.token)
+    if payload.get("jti") is None or payload.get("exp") is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Токен без jti не может быть отозван")
+    try:
+        await revocation_list.revoke(payload["jti"], payload["exp"])
+    except RedisError as e:
+        logger.error("Список отзыва токенов недоступен, токен не отозван", exc_info=e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Отзыв токена временно недоступен"
+        ) from e
+    return ConfirmSchema(success=True)
 
 
 @router.post(
@@ -83,7 +129,7 @@ async def token_validate(token: JWTTokenForValidationSchema) -> TokenValidationR
     },
 )
 async def user_register(
-    session: Annotated[AsyncSession, Depends(db_helper.get_session)],
+    session: Annotated[AsyncSession, Depends(db_helper.get_lazy_session)],
     email: Annotated[EmailStr, Form()],
     username: Annotated[str, Form()],
     password: Annotated[str, Form()],
@@ -113,14 +159,16 @@ async def user_register(
 
 
 @router.get("/me/", response_model=UserReadTZSchema, responses=DEFAULT_RESPONSES)
-async def get_user_me(user: Annotated[UserReadTZSchema, Depends(get_current_user_with_tz)]) -> UserReadTZSchema:
+async def get_user_me(
+    user: Annotated[UserReadTZSchema, Depends(get_current_user_with_tz_for_read)],
+) -> UserReadTZSchema:
     """Получение информации о текущем пользователе."""
     return user
 
 
 @router.delete("/me/", response_model=UserReadTZSchema, responses=DEFAULT_RESPONSES)
 async def schedule_deletion_user_me(
-    session: Annotated[AsyncSession, Depends(db_helper.get_session)],
+    session: Annotated[AsyncSession, Depends(get_current_user_session)],
     user_id: Annotated[UUID, Depends(get_current_user_id)],
 ) -> UserReadTZSchema:
     """Удаление текущего авторизированного пользователя."""
@@ -130,7 +178,7 @@ async def schedule_deletion_user_me(
 
 @router.post("/cancel_deletion_me/", response_model=UserReadTZSchema, responses=DEFAULT_RESPONSES)
 async def cancel_deletion_user_me(
-    session: Annotated[AsyncSession, Depends(db_helper.get_session)],
+    session: Annotated[AsyncSession, Depends(get_current_user_session)],
     user_id: Annotated[UUID, Depends(get_current_user_id)],
 ) -> UserReadTZSchema:
     """Отменяет запланированное удаление пользователя."""
@@ -140,7 +188,7 @@ async def cancel_deletion_user_me(
 
 @router.patch("/me/", response_model=UserReadTZSchema, responses=DEFAULT_RESPONSES)
 async def partial_update_user_me(
-    session: Annotated[AsyncSession, Depends(db_helper.get_session)],
+    session: Annotated[AsyncSession, Depends(get_current_user_session)],
     user_id: Annotated[UUID, Depends(get_current_user_id)],
     email: Annotated[EmailStr | None, Form()] = None,
     username: Annotated[str | None, Form()] = None,
@@ -174,14 +222,14 @@ async def partial_update_user_me(
 
 @router.post("/change_password/", response_model=ConfirmSchema, responses=DEFAULT_RESPONSES)
 async def change_password_me(
-    session: Annotated[AsyncSession, Depends(db_helper.get_session)],
+    session: Annotated[AsyncSession, Depends(get_current_user_session)],
     user_id: Annotated[UUID, Depends(get_current_user_id)],
     passwords: ChangePasswordSchema,
 ) -> ConfirmSchema:
     """Смена пароля текущего пользователя."""
     user = await crud.get_user_by_id(session, user_id, with_tz=False, cache=False)
     validate_user(user)
-    if not user.verify_password(passwords.old_password):
+    if not await user.verify_password_async(passwords.old_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный старый пароль")
 
     return ConfirmSchema(success=await crud.change_user_password(session, user, passwords.new_password))
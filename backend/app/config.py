@@ -1,7 +1,8 @@
 from datetime import timedelta
 from pathlib import Path
+from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from app.constants import BASE_DIR
@@ -13,6 +14,8 @@ class ApiV1Endpoints(BaseModel):
     users: str = "/users"
     ui: str = "/ui"
     websocket: str = "/ws"
+    metrics: str = "/metrics"
+    health: str = "/health"
 
 
 class ApiV1(BaseModel):
@@ -40,6 +43,32 @@ class DataBaseSettings(BaseModel):
 
     echo: bool = False
 
+    # Пул соединений воркера: постоянные соединения, дополнительные соединения под нагрузкой, ожидание свободного
+    # соединения в секундах, пересоздание соединений старше pool_recycle секунд (-1 - не пересоздавать)
+    # и проверка соединения перед выдачей из пула.
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = -1
+    pool_pre_ping: bool = False
+    # Подготовленных выражений в кеше каждого соединения, 0 - не кешировать.
+    statement_cache_size: int = 100
+    # Ограничение времени выполнения запроса на сервере в миллисекундах, 0 - без ограничения.
+    statement_timeout: int = 0
+    # Подключение через PgBouncer в режиме transaction pooling. Подготовленные выражения отключаются,
+    # а statement_timeout задается в начале каждой транзакции, потому что PgBouncer не принимает его
+    # в параметрах подключения.
+    pgbouncer: bool = False
+
+    # Реплики для чтения: строки подключения SQLAlchemy (postgresql+asyncpg://...), параметры пула как у основной
+    # базы. Без реплик сессии для чтения открываются к основной базе в режиме только для чтения.
+    replica_uris: list[str] = []
+    # Выбор реплики для сессии: "round_robin" - по очереди, "least_latency" - с наименьшим средним временем запроса.
+    replica_selection: Literal["round_robin", "least_latency"] = "round_robin"
+    # Сколько секунд после записи пользователя его чтения идут в основную базу, чтобы он видел свои изменения,
+    # пока реплики их догоняют.
+    read_your_writes_window: float = 5
+
     @property
     def database_uri(self):
         """Свойство для получение db uri."""
@@ -54,18 +83,93 @@ class RedisSettings(BaseModel):
 
     host: str
     port: str
+    # Redis Cluster: host и port - адрес любого узла кластера. Ключи, которые используются вместе в одной
+    # команде или скрипте, получают общий hash tag, pub/sub работает через узел host:port.
+    cluster: bool = False
 
-    default_ttl: int = None
+    # Время жизни ключей кеша по умолчанию. Ключи старых поколений префикса удаляются только по его истечении.
+    default_ttl: int | None = 24 * 60 * 60
 
     user_prefix: str = "user"
     username_prefix: str = "username"
     timezone_prefix: str = "timezone"
 
+    # Sorted set отозванных токенов (jti -> exp) и канал для рассылки отзывов воркерам.
+    revoked_tokens_key: str = "revoked_tokens"
+    revoked_tokens_channel: str = "revoked_tokens"
+    # Счетчики версий безопасности пользователей и канал для рассылки их изменений воркерам.
+    security_version_prefix: str = "security_version"
+    security_version_channel: str = "security_versions"
+    # Счетчики поколений префиксов кеша и канал для рассылки их изменений воркерам.
+    cache_generation_prefix: str = "cache_generation"
+    cache_generation_channel: str = "cache_generations"
+    # Отметки о недавних записях пользователей в базу, пока они есть чтения пользователя не идут на реплики.
+    read_your_writes_prefix: str = "read_your_writes"
+    # Блокировка обслуживания секций таблиц, чтобы его выполнял один воркер.
+    partitions_lock_key: str = "lock:partitions"
+
     ttl_override: dict[str, int | None] = {
         user_prefix: None,
         timezone_prefix: None,
     }
 
+    # Локальный кеш воркера перед Redis: префикс -> (максимум записей, время жизни в секундах).
+    # Префиксы без записи кешируются только в Redis. Префикс не должен содержать двоеточие.
+    local_cache: dict[str, tuple[int, int]] = {
+        user_prefix: (10000, 60),
+        timezone_prefix: (1000, 3600),
+    }
+    # Время жизни в секундах отметки об отсутствии записи в базе: префикс -> время жизни.
+    # Префиксы без записи не запоминают отсутствующие записи.
+    negative_ttl: dict[str, int] = {
+        user_prefix: 30,
+        timezone_prefix: 300,
+    }
+    # Префиксы объектов, которые хранятся в hash по полям: измененные поля записываются без перезаписи всего
+    # объекта, а часть полей читается без чтения всего объекта. Остальные объекты хранятся строкой в cache_codec.
+    hash_prefixes: set[str] = {user_prefix}
+    # Формат хранения объектов в кеше: "orjson" - с версией схемы и созданием объектов без повторной валидации,
+    # "json" - JSON от pydantic с полной валидацией при чтении. Смена формата приводит к перезагрузке ключей из базы.
+    cache_codec: Literal["json", "orjson"] = "orjson"
+    # Примерный предел памяти локального кеша воркера в байтах на все префиксы, 0 - без ограничения.
+    local_cache_max_bytes: int = 64 * 1024 * 1024
+    # Канал для рассылки инвалидаций локальных кешей воркерам.
+    local_cache_channel: str = "cache_invalidation"
+    # Инвалидация локальных кешей средствами Redis (CLIENT TRACKING) вместо рассылки через local_cache_channel:
+    # Redis сам сообщает воркеру об изменении любого ключа с префиксами локального кеша, в том числе
+    # сделанном в обход приложения.
+    client_tracking: bool = False
+
+    # Блокировка в Redis на загрузку отсутствующего в кеше значения, чтобы при промахе в базу шел
+    # только один воркер со всех узлов. Внутри воркера одновременные загрузки объединяются всегда.
+    loader_lock: bool = False
+    # Время жизни блокировки и максимальное время ожидания значения от другого воркера в секундах.
+    loader_lock_timeout: float = 5
+    # Коэффициент вероятностного досрочного обновления ключей со сроком жизни. 0 отключает досрочное обновление,
+    # больше 1 - обновление раньше.
+    early_refresh_beta: float = 1.0
+
+    # Таймауты подключения к Redis и ответа на команду в секундах.
+    socket_connect_timeout: float = 1.0
+    socket_timeout: float = 1.0
+    # Выключатель обращений к кешу: после breaker_failure_threshold ошибок или обращений дольше
+    # breaker_slow_call_threshold секунд подряд кеш считается недоступным на breaker_reset_timeout секунд.
+    # Каждое обращение к кешу ограничено breaker_timeout секундами.
+    breaker_failure_threshold: int = 5
+    breaker_slow_call_threshold: float = 0.25
+    breaker_reset_timeout: float = 5.0
+    breaker_timeout: float = 1.0
+    # Пока кеш недоступен, значения читаются из базы напрямую, но не больше стольких загрузок одновременно
+    # на воркер, чтобы не перегрузить базу.
+    degraded_max_concurrency: int = 10
+
+    @model_validator(mode="after")
+    def check_client_tracking(self) -> "RedisSettings":
+        """Client tracking в режиме BCAST сообщает только об изменениях ключей на узле подписки."""
+        if self.cluster and self.client_tracking:
+            raise ValueError("client_tracking не поддерживается в режиме Redis Cluster")
+        return self
+
 
 class RabbitMQSettings(BaseModel):
     """Настройки RabbitMQ."""
@@ -105,7 +209,42 @@ class JWTSettings(BaseModel):
     # Пути к приват и паблик ключам
     private_key_path: Path = BASE_DIR / "certs" / "private_key"
     public_key_path: Path = BASE_DIR / "certs" / "public_key.pub"
+    # Алгоритм для новых ключей (RS256, PS256, ES256, ES384, ES512, EdDSA). Для RSA ключей также задает вариант подписи.
+    # Алгоритм существующих ключей определяется по их типу.
     algorithm: str = "RS256"
+    # Алгоритмы, токены которых принимаются. На время миграции на другой алгоритм здесь должны быть оба.
+    allowed_algorithms: list[str] = ["RS256", "ES256", "EdDSA"]
+    # Размер генерируемых RSA ключей.
+    rsa_key_size: int = 2048
+
+    # Каталог с ключами для ротации. Пара ключей хранится в файлах <kid>.pem (приватный) и <kid>.pub (публичный).
+    keys_dir: Path = BASE_DIR / "certs" / "keys"
+    # kid ключа которым подписываются новые токены. Если не задан, используется самый новый приватный ключ.
+    active_kid: str | None = None
+    # kid под которым в связку попадает пара ключей из private_key_path и public_key_path.
+    legacy_kid: str = "default"
+    # Минимальный интервал в секундах между проверками каталога ключей на изменения.
+    keys_reload_interval: int = 60
+    # Минимальный интервал в секундах между проверками каталога ключей из-за токенов с неизвестным kid.
+    keys_unknown_kid_reload_interval: int = 5
+    # Максимальное количество проверенных токенов в кеше воркера. 0 отключает кеш.
+    verified_tokens_cache_size: int = 10000
+    # Максимальное время в секундах, которое проверенный токен хранится в кеше.
+    verified_tokens_cache_ttl: int = 300
+    # Ожидаемое количество одновременно отозванных токенов и доля ложных срабатываний фильтра Блума.
+    revocation_filter_capacity: int = 100000
+    revocation_filter_error_rate: float = 0.001
+    # Интервал в секундах между пересборками фильтра, чтобы из него уходили истекшие токены.
+    revocation_filter_rebuild_interval: int = 3600
+    # Вшивать ли в access токен active, timezone_id и версию безопасности пользователя.
+    # Такой токен проверяется без получения пользователя из кеша или базы и перестает приниматься
+    # после изменения профиля, пароля или постановки пользователя на удаление.
+    self_contained_access_tokens: bool = False
+    # Максимальное количество версий безопасности в кеше воркера и время их хранения в секундах.
+    # Время хранения ограничивает устаревание кеша, если сообщение об изменении версии было потеряно.
+    security_version_cache_size: int = 100000
+    security_version_cache_ttl: int = 60
+
     access_token_expires_delta: timedelta = timedelta(days=365)
     refresh_token_expires_delta: timedelta = timedelta(days=7)
 
@@ -127,6 +266,80 @@ class FilesUrlsSettings(BaseModel):
     icons_url: str
 
 
+class PasswordsSettings(BaseModel):
+    """Настройки хеширования паролей."""
+
+    # Количество потоков, в которых считается bcrypt. bcrypt отпускает GIL, поэтому потоки работают параллельно.
+    hash_workers: int = 2
+    # Сколько операций может ждать свободного потока. При переполнении запрос получает 503.
+    hash_queue_size: int = 32
+    # Стоимость bcrypt для новых хешей. Подбирается под железо командой python calibrate_bcrypt.py.
+    # Хеши с другой стоимостью пересчитываются при успешном входе пользователя.
+    bcrypt_rounds: int = 12
+    # Минимальная стоимость bcrypt, ниже которой калибровка не опускается.
+    bcrypt_min_rounds: int = 10
+    # Максимальная стоимость bcrypt при калибровке.
+    bcrypt_max_rounds: int = 16
+    # Целевое время одного хеширования в миллисекундах для калибровки.
+    bcrypt_target_time_ms: int = 250
+
+
+class RateLimitSettings(BaseModel):
+    """Настройки ограничения частоты запросов."""
+
+    # Ограничивать ли попытки входа.
+    login_enabled: bool = True
+    # Префикс ключей Redis для корзин ограничителя входа.
+    login_prefix: str = "rate_limit:login"
+    # Попыток входа на один email за период в секундах.
+    login_email_limit: int = 10
+    login_email_period: int = 60
+    # Попыток входа с одного IP за период в секундах.
+    login_ip_limit: int = 30
+    login_ip_period: int = 60
+    # Брать ли IP клиента из X-Forwarded-For. Включать только за доверенным прокси.
+    trust_forwarded_for: bool = False
+    # Сколько доверенных прокси стоит перед воркером. Каждый прокси дописывает в конец X-Forwarded-For адрес
+    # того, кто к нему подключился, поэтому адрес клиента - это trusted_proxy_hops-я запись с конца,
+    # а все записи левее задает сам клиент.
+    trusted_proxy_hops: int = 1
+
+
+class MetricsSettings(BaseModel):
+    """Настройки метрик."""
+
+    # Отдавать ли метрики воркера по эндпоинту api.v1.endpoints.metrics.
+    enabled: bool = False
+    # Сети, из которых разрешено читать метрики. Проверяется адрес соединения, а не X-Forwarded-For,
+    # поэтому сборщик метрик должен ходить в воркер напрямую, минуя публичный прокси.
+    allowed_networks: list[str] = ["127.0.0.1/32", "::1/128"]
+
+
+class WarmupSettings(BaseModel):
+    """Настройки прогрева воркера при запуске."""
+
+    # Соединений с основной базой и с каждой репликой, которые открываются заранее. Больше db.pool_size
+    # не имеет смысла: лишние соединения закрываются при возврате в пул.
+    db_connections: int = 5
+    # Загружать ли в кеш классификатор таймзон.
+    timezones: bool = True
+    # Максимальное время прогрева в секундах, по его истечении воркер сообщает о готовности без завершения прогрева.
+    timeout: float = 30
+
+
+class MessagesSettings(BaseModel):
+    """Настройки хранения сообщений чатов."""
+
+    # Таблица сообщений разбита на секции по месяцам. Секции создаются заранее на столько месяцев вперед.
+    partitions_ahead: int = 3
+    # Секции старше стольких полных месяцев отсоединяются от таблицы и переносятся в схему archive_schema,
+    # 0 - не архивировать. Секция, на строки которой есть ссылки из других строк, не архивируется.
+    retention_months: int = 0
+    archive_schema: str = "archive"
+    # Интервал обслуживания секций в секундах, 0 - обслуживание только через maintain_partitions.py.
+    maintenance_interval: int = 60 * 60
+
+
 class UsersSettings(BaseModel):
     """Настройки пользователей."""
 
@@ -164,6 +377,21 @@ class Settings(BaseSettings):
     # Настройка компаний
     companies: CompaniesSettings = CompaniesSettings()
 
+    # Настройки хеширования паролей
+    passwords: PasswordsSettings = PasswordsSettings()
+
+    # Ограничение частоты запросов
+    rate_limit: RateLimitSettings = RateLimitSettings()
+
+    # Настройки метрик
+    metrics: MetricsSettings = MetricsSettings()
+
+    # Прогрев воркера при запуске
+    warmup: WarmupSettings = WarmupSettings()
+
+    # Хранение сообщений чатов
+    messages: MessagesSettings = MessagesSettings()
+
     # Настройки websocket.
     websocket: WebSocketsSettings = WebSocketsSettings()
 
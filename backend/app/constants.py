@@ -1,6 +1,6 @@
 import enum
 import re
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import AnyStr
 
@@ -33,6 +33,9 @@ DEFAULT_TASK_TYPE_ICON_ID: int = 3
 # ID удаленного сообщения.
 # TODO Заменить на id удаленного сообщения
 DELETED_MESSAGE_ID: int = 1
+# Время создания удаленного сообщения. Таблица сообщений разбита на секции по времени создания, поэтому ссылки
+# на сообщение состоят из id и времени создания.
+DELETED_MESSAGE_CREATED_AT: datetime = datetime(2000, 1, 1, tzinfo=timezone.utc)
 
 # Интервал по умолчанию для удаления компании.
 # TODO Написать задачу для Celery для удаления компании
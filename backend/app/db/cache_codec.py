@@ -0,0 +1,212 @@
+import abc
+import datetime
+import struct
+import types
+import typing
+import uuid
+import zlib
+from typing import Any, Callable, Iterable, Type
+
+import orjson
+from pydantic import BaseModel, EmailStr
+
+# Преобразования значений из JSON в типы полей для создания объекта без валидации.
+# Модели с полями других типов всегда проходят полную валидацию.
+_FIELD_CONVERTERS: dict[Any, Callable[[Any], Any] | None] = {
+    str: None,
+    int: None,
+    float: None,
+    bool: None,
+    EmailStr: None,
+    uuid.UUID: uuid.UUID,
+    datetime.datetime: datetime.datetime.fromisoformat,
+    datetime.date: datetime.date.fromisoformat,
+}
+
+# Типы, которые проверяются python кодом, а не pydantic-core. Только для моделей с такими полями
+# создание объекта без валидации быстрее валидации.
+_SLOW_VALIDATION_TYPES: set[Any] = {EmailStr}
+
+_VERSION_HEADER = struct.Struct(">I")
+
+
+def _get_field_type(annotation: Any) -> Any:
+    """Тип поля без None. None если тип поля не из простых."""
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            return None
+        annotation = args[0]
+    return annotation if annotation in _FIELD_CONVERTERS else None
+
+
+def _nullable(converter: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Преобразование, пропускающее None."""
+    return lambda value: None if value is None else converter(value)
+
+
+class ModelDecoder:
+    """Создание объекта модели из JSON, прочитанного из кеша.
+
+    В кеш попадают только уже проверенные объекты. Если в модели есть поля, которые долго проверяются
+    (например, EmailStr), а остальные поля простых типов, валидация пропускается: строки приводятся
+    к UUID и датам, а объект создается через model_construct. Остальные модели быстрее проходят валидацию
+    в pydantic-core, чем создаются без нее.
+    """
+
+    def __init__(self, model: Type[BaseModel]) -> None:
+        """Разбирает поля модели."""
+        self.model: Type[BaseModel] = model
+        # Версия схемы меняется при изменении состава или типов полей модели.
+        fields = [(name, str(field.annotation)) for name, field in model.model_fields.items()]
+        self.version: int = zlib.crc32(repr((model.__name__, fields)).encode())
+        self._converters: dict[str, Callable[[Any], Any]] | None = None
+        decorators = model.__pydantic_decorators__
+        if decorators.field_validators or decorators.model_validators or decorators.validators:
+            return
+        field_types = {name: _get_field_type(field.annotation) for name, field in model.model_fields.items()}
+        if any(field_type is None for field_type in field_types.values()) or any(
+            field.alias is not None for field in model.model_fields.values()
+        ):
+            return
+        if not _SLOW_VALIDATION_TYPES.intersection(field_types.values()):
+            return
+        self._converters = {
+            name: _nullable(_FIELD_CONVERTERS[field_type])
+            for name, field_type in field_types.items()
+            if _FIELD_CONVERTERS[field_type] is not None
+        }
+
+    @property
+    def fast(self) -> bool:
+        """Создается ли объект без валидации."""
+        return self._converters is not None
+
+    def __call__(self, payload: bytes) -> BaseModel:
+        """Создает объект из JSON."""
+        if self._converters is None:
+            return self.model.model_validate_json(payload)
+        return self.from_dict(orjson.loads(payload))
+
+    def from_dict(self, data: dict[str, Any]) -> BaseModel:
+        """Создает объект из словаря значений, разобранных из JSON."""
+        if self._converters is None:
+            return self.model.model_validate(data)
+        for name, converter in self._converters.items():
+            if name in data:
+                data[name] = converter(data[name])
+        return self.model.model_construct(**data)
+
+
+_decoders: dict[Type[BaseModel], ModelDecoder] = {}
+
+
+def get_decoder(model: Type[BaseModel]) -> ModelDecoder:
+    """Декодер модели, создается один раз на модель."""
+    decoder = _decoders.get(model)
+    if decoder is None:
+        decoder = _decoders[model] = ModelDecoder(model)
+    return decoder
+
+
+class CacheCodec(abc.ABC):
+    """Формат хранения объектов в кеше.
+
+    decode возвращает None, если данные записаны в другом формате или для другой версии схемы,
+    такое значение считается отсутствующим в кеше и перезаписывается после загрузки из базы.
+    """
+
+    name: str
+
+    @abc.abstractmethod
+    def encode(self, schema: BaseModel) -> bytes:
+        """Сериализует объект."""
+
+    @abc.abstractmethod
+    def decode(self, data: bytes, model: Type[BaseModel]) -> BaseModel | None:
+        """Создает объект из данных кеша."""
+
+
+class JsonCodec(CacheCodec):
+    """JSON от pydantic с полной валидацией при чтении."""
+
+    name = "json"
+
+    def encode(self, schema: BaseModel) -> bytes:
+        """Сериализует объект."""
+        return schema.model_dump_json().encode()
+
+    def decode(self, data: bytes, model: Type[BaseModel]) -> BaseModel | None:
+        """Создает объект из данных кеша."""
+        try:
+            return model.model_validate_json(data)
+        except ValueError:
+            return None
+
+
+class OrjsonCodec(CacheCodec):
+    """JSON от orjson с версией схемы в первых 4 байтах и созданием объекта без валидации, где это быстрее."""
+
+    name = "orjson"
+
+    def encode(self, schema: BaseModel) -> bytes:
+        """Сериализует объект."""
+        return _VERSION_HEADER.pack(get_decoder(type(schema)).version) + orjson.dumps(schema.model_dump())
+
+    def decode(self, data: bytes, model: Type[BaseModel]) -> BaseModel | None:
+        """Создает объект из данных кеша."""
+        decoder = get_decoder(model)
+        if len(data) < _VERSION_HEADER.size or _VERSION_HEADER.unpack_from(data)[0] != decoder.version:
+            return None
+        try:
+            return decoder(data[_VERSION_HEADER.size :])
+        except (ValueError, TypeError):
+            return None
+
+
+CODECS: dict[str, CacheCodec] = {codec.name: codec for codec in (JsonCodec(), OrjsonCodec())}
+
+
+# Поле hash, в котором хранится версия схемы объекта или отметка об отсутствии записи.
+HASH_VERSION_FIELD = "_v"
+_HASH_VERSION_KEY = HASH_VERSION_FIELD.encode()
+
+
+def get_hash_version(model: Type[BaseModel]) -> bytes:
+    """Значение поля версии в hash, записанном для текущей схемы модели."""
+    return str(get_decoder(model).version).encode()
+
+
+def encode_fields(schema: BaseModel, fields: Iterable[str] | None = None) -> dict[str, bytes]:
+    """Сериализует поля объекта для хранения в hash, каждое поле отдельно.
+
+    Без списка полей сериализуются все поля и версия схемы.
+    """
+    data = schema.model_dump(include=set(fields) if fields is not None else None)
+    mapping = {name: orjson.dumps(value) for name, value in data.items()}
+    if fields is None:
+        mapping[HASH_VERSION_FIELD] = get_hash_version(type(schema))
+    return mapping
+
+
+def decode_fields(values: dict[bytes, bytes], model: Type[BaseModel]) -> BaseModel | None:
+    """Создает объект из всех полей hash. None для hash другой версии схемы."""
+    decoder = get_decoder(model)
+    if values.get(_HASH_VERSION_KEY) != get_hash_version(model):
+        return None
+    try:
+        return decoder.from_dict(
+            {field.decode(): orjson.loads(value) for field, value in values.items() if field != _HASH_VERSION_KEY}
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def decode_partial(values: dict[str, bytes | None], model: Type[BaseModel]) -> BaseModel | None:
+    """Создает объект из части полей hash с полной валидацией. None если полей не хватает или они другого типа."""
+    try:
+        return model.model_validate(
+            {field: orjson.loads(value) for field, value in values.items() if value is not None}
+        )
+    except ValueError:
+        return None
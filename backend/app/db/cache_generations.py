@@ -0,0 +1,89 @@
+from typing import Callable, Iterable
+
+from app.db.pubsub import PubSubSyncedState, RedisPubSubListener
+from app.db.redis_cluster import RedisClient, execute_and_publish, pipeline
+from app.metrics import metrics
+from app.metrics.lookups import count_lookup
+from app.utils.circuit_breaker import CircuitBreaker
+
+
+class CacheGenerations(PubSubSyncedState):
+    """Поколения префиксов ключей кеша.
+
+    Номер поколения входит в имя каждого ключа префикса, поэтому сброс всех ключей префикса - это один INCR
+    счетчика поколения: ключи старого поколения больше не читаются и удаляются по истечении времени жизни.
+    Источник истины - счетчики в Redis, отсутствие ключа означает поколение 0. Воркеры держат поколения в памяти
+    и узнают об их смене из pub/sub канала. Пока подписка не работает, поколение читается из Redis при каждом обращении.
+    """
+
+    def __init__(
+        self,
+        redis: RedisClient,
+        listener: RedisPubSubListener,
+        key_prefix: str,
+        channel: str,
+        on_change: Callable[[str], None] | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        """Настройки хранилища поколений.
+
+        on_change вызывается с префиксом, поколение которого сменилось. Чтение поколений из Redis выполняется
+        через выключатель breaker, если он задан.
+        """
+        self.redis: RedisClient = redis
+        self.key_prefix: str = key_prefix
+        self.channel: str = channel
+        self.on_change: Callable[[str], None] | None = on_change
+        self.breaker: CircuitBreaker | None = breaker
+        self._generations: dict[str, int] = {}
+        self.subscribe(listener, channel, self._on_message)
+        self._bumps = metrics.counter("cache_namespace_invalidations_total", "Сбросы всех ключей префикса кеша")
+
+    def _key(self, prefix: str) -> str:
+        """Ключ счетчика поколения префикса."""
+        return f"{self.key_prefix}:{prefix}"
+
+    async def get(self, prefix: str) -> int:
+        """Текущее поколение префикса."""
+        generation = self._generations.get(prefix)
+        if generation is not None:
+            return generation
+        return (await self.get_many([prefix]))[prefix]
+
+    async def get_many(self, prefixes: Iterable[str]) -> dict[str, int]:
+        """Текущие поколения нескольких префиксов, отсутствующие в памяти читаются одним MGET."""
+        generations = {prefix: self._generations.get(prefix) for prefix in prefixes}
+        missing = [prefix for prefix, generation in generations.items() if generation is None]
+        if missing:
+            count_lookup("redis")
+            invalidations = self._invalidations
+            keys = [self._key(prefix) for prefix in missing]
+            if self.breaker is not None:
+                values = await self.breaker.call(lambda: self.redis.mget(keys))
+            else:
+                values = await self.redis.mget(keys)
+            for prefix, value in zip(missing, values):
+                generations[prefix] = int(value or 0)
+                if self._can_remember(invalidations):
+                    self._generations[prefix] = generations[prefix]
+        return generations
+
+    async def bump(self, prefix: str) -> int:
+        """Сбрасывает все ключи префикса, увеличивая его поколение. Возвращает новое поколение."""
+        async with pipeline(self.redis) as pipe:
+            pipe.incr(self._key(prefix))
+            (generation,) = await execute_and_publish(self.redis, pipe, [(self.channel, prefix)])
+        self._bumps.inc(prefix=prefix)
+        self._on_message(prefix)
+        return generation
+
+    def _on_message(self, prefix: str) -> None:
+        """Поколение префикса изменилось, значение будет перечитано из Redis при следующем обращении."""
+        self._invalidations += 1
+        self._generations.pop(prefix, None)
+        if self.on_change is not None:
+            self.on_change(prefix)
+
+    def _reset(self) -> None:
+        """Забывает поколения, они будут перечитаны из Redis."""
+        self._generations.clear()
@@ -1,32 +1,329 @@
-from collections.abc import AsyncGenerator
+import asyncio
+import itertools
+import time
+import uuid
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
 
+from sqlalchemy import event, exc
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
+from app.metrics import metrics
+from app.metrics.lookups import count_lookup
+
+_pool_wait = metrics.histogram(
+    "db_pool_wait_seconds", "Время получения соединения из пула с учетом ожидания и нового подключения"
+)
+_pool_timeouts = metrics.counter("db_pool_timeouts_total", "Запросы соединения, не дождавшиеся свободного в пуле")
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений, который измеряет время получения соединения."""
+
+    def connect(self) -> Any:
+        """Выдает соединение из пула."""
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            _pool_timeouts.inc()
+            raise
+        finally:
+            _pool_wait.observe(time.perf_counter() - started_at)
+
+
+class DataBaseSession(Session):
+    """Синхронная часть сессий DataBaseHelper.
+
+    Если в info сессии задан statement_timeout, он устанавливается в начале каждой транзакции.
+    """
+
+
+@event.listens_for(DataBaseSession, "after_begin")
+def _set_statement_timeout(session: Session, transaction, connection) -> None:
+    """Ограничивает время запросов до конца транзакции."""
+    statement_timeout = session.info.get("statement_timeout")
+    if statement_timeout:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(statement_timeout)}")
+
+
+class LazySession:
+    """Сессия, которая создается при первом обращении к ней.
+
+    Проксирует все атрибуты AsyncSession. Если обработчик получил все данные из кеша и ни разу не обратился
+    к сессии, то ни сессия, ни соединение из пула не создаются.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        on_commit: Callable[[], Awaitable[None]] | None = None,
+    ) -> None:
+        """Запоминает фабрику сессий и обработчик, который вызывается после каждой фиксации транзакции."""
+        self._session_factory: Callable[[], AsyncSession] = session_factory
+        self._on_commit: Callable[[], Awaitable[None]] | None = on_commit
+        self._session: AsyncSession | None = None
+
+    @property
+    def started(self) -> bool:
+        """Была ли создана сессия."""
+        return self._session is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._session_factory()
+        return getattr(self._session, name)
+
+    async def commit(self) -> None:
+        """Фиксирует транзакцию."""
+        await self.__getattr__("commit")()
+        if self._on_commit is not None:
+            await self._on_commit()
+
+    async def close(self) -> None:
+        """Закрывает сессию, если она была создана."""
+        if self._session is not None:
+            await self._session.close()
+
+
+class ReplicaSelector:
+    """Выбор реплики для очередной сессии чтения.
+
+    round_robin - реплики по очереди. least_latency - реплика с наименьшим скользящим средним времени запроса,
+    при этом каждая EXPLORE_EVERY-я сессия выбирается по очереди, чтобы время ответа остальных реплик
+    оставалось актуальным.
+    """
+
+    EXPLORE_EVERY: int = 20
+    # Вес нового замера в скользящем среднем.
+    ALPHA: float = 0.2
+
+    def __init__(self, count: int, strategy: str) -> None:
+        """Выбор из count реплик."""
+        self.strategy: str = strategy
+        self.latencies: list[float] = [0.0] * count
+        self._counter = itertools.count()
+
+    def choose(self) -> int:
+        """Номер реплики для сессии."""
+        n = next(self._counter)
+        if self.strategy == "least_latency" and n % self.EXPLORE_EVERY:
+            return min(range(len(self.latencies)), key=self.latencies.__getitem__)
+        return n % len(self.latencies)
+
+    def observe(self, index: int, seconds: float) -> None:
+        """Учитывает время запроса к реплике."""
+        latency = self.latencies[index]
+        self.latencies[index] = seconds if not latency else latency + self.ALPHA * (seconds - latency)
 
 
 class DataBaseHelper:
-    """Менеджер сессии к базе данных."""
+    """Менеджер сессии к базе данных.
+
+    Сессии для записи открываются к основной базе, сессии для чтения - к репликам, если они заданы.
+    """
 
     def __init__(
         self,
         db_uri,
         echo: bool = False,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30,
+        pool_recycle: int = -1,
+        pool_pre_ping: bool = False,
+        statement_cache_size: int = 100,
+        statement_timeout: int = 0,
+        pgbouncer: bool = False,
+        replica_uris: list[str] | None = None,
+        replica_selection: str = "round_robin",
     ) -> None:
-        """Инициализирует асинхронный engine и создает фабрику сессий."""
-        self.engine: AsyncEngine = create_async_engine(url=db_uri, echo=echo)
-        self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
-            bind=self.engine, expire_on_commit=False, autocommit=False, autoflush=False
+        """Инициализирует асинхронные engine основной базы и реплик и создает фабрики сессий.
+
+        Параметры пула, соединений и реплик описаны в DataBaseSettings.
+        """
+        connect_args: dict[str, Any] = {}
+        if pgbouncer:
+            # PgBouncer отдает каждой транзакции любое серверное соединение, поэтому подготовленные выражения
+            # не кешируются, а их имена уникальны, чтобы не совпасть с выражениями других клиентов.
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        else:
+            # Выражения кеширует SQLAlchemy, кеш asyncpg используется только при прямых запросах через драйвер.
+            connect_args["statement_cache_size"] = statement_cache_size
+            connect_args["prepared_statement_cache_size"] = statement_cache_size
+            if statement_timeout:
+                connect_args["server_settings"] = {"statement_timeout": str(statement_timeout)}
+        engine_options: dict[str, Any] = {
+            "echo": echo,
+            "poolclass": InstrumentedPool,
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+            "pool_recycle": pool_recycle,
+            "pool_pre_ping": pool_pre_ping,
+            "connect_args": connect_args,
+        }
+        session_options: dict[str, Any] = {
+            "expire_on_commit": False,
+            "autocommit": False,
+            "autoflush": False,
+            "sync_session_class": DataBaseSession,
+            "info": {"statement_timeout": statement_timeout} if pgbouncer and statement_timeout else {},
+        }
+        self.engine: AsyncEngine = create_async_engine(url=db_uri, **engine_options)
+        self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(bind=self.engine, **session_options)
+        # Чтение из основной базы: тот же пул, но транзакции только для чтения.
+        self.primary_read_session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
+            bind=self.engine.execution_options(postgresql_readonly=True), **session_options
         )
+        self.replica_engines: list[AsyncEngine] = [
+            create_async_engine(url=uri, **engine_options) for uri in replica_uris or []
+        ]
+        self.replica_session_factories: list[async_sessionmaker[AsyncSession]] = [
+            async_sessionmaker(bind=engine.execution_options(postgresql_readonly=True), **session_options)
+            for engine in self.replica_engines
+        ]
+        self.replica_selector: ReplicaSelector = ReplicaSelector(len(self.replica_engines), replica_selection)
+        self._sessions = metrics.counter("db_sessions_total", "Сессии к базе данных по факту их использования")
+        self._register_pool_metrics()
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self._count_query)
+        for index, engine in enumerate(self.replica_engines):
+            event.listen(engine.sync_engine, "before_cursor_execute", self._count_query)
+            self._register_replica_metrics(index, engine)
+
+    @property
+    def has_replicas(self) -> bool:
+        """Заданы ли реплики для чтения."""
+        return bool(self.replica_engines)
+
+    def _register_pool_metrics(self) -> None:
+        """Метрики пула соединений."""
+        pool = self.engine.sync_engine.pool
+        checkouts = metrics.counter("db_pool_checkouts_total", "Выдачи соединений из пула")
+        connects = metrics.counter("db_pool_connects_total", "Новые соединения с базой данных")
+        hold_time = metrics.histogram("db_pool_checkout_duration_seconds", "Время удержания соединения из пула")
+        metrics.gauge("db_pool_checked_out", "Соединений выдано из пула", pool.checkedout)
+        metrics.gauge("db_pool_size", "Размер пула соединений", pool.size)
+        metrics.gauge("db_pool_overflow", "Соединений сверх размера пула", pool.overflow)
+        metrics.gauge("db_pool_checked_in", "Свободных соединений в пуле", pool.checkedin)
+
+        @event.listens_for(pool, "connect")
+        def on_connect(dbapi_connection, connection_record) -> None:
+            connects.inc()
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+            checkouts.inc()
+            connection_record.info["checked_out_at"] = time.perf_counter()
+
+        @event.listens_for(pool, "checkin")
+        def on_checkin(dbapi_connection, connection_record) -> None:
+            checked_out_at = connection_record.info.pop("checked_out_at", None)
+            if checked_out_at is not None:
+                hold_time.observe(time.perf_counter() - checked_out_at)
+
+    def _register_replica_metrics(self, index: int, engine: AsyncEngine) -> None:
+        """Метрики реплики и замер времени запросов для выбора реплики."""
+        queries = metrics.counter("db_replica_queries_total", "Запросы к репликам")
+        latency = metrics.gauge("db_replica_latency_seconds", "Скользящее среднее времени запроса к реплике")
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+            conn.info["query_started_at"] = time.perf_counter()
+
+        @event.listens_for(engine.sync_engine, "after_cursor_execute")
+        def after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+            started_at = conn.info.pop("query_started_at", None)
+            if started_at is not None:
+                self.replica_selector.observe(index, time.perf_counter() - started_at)
+                queries.inc(replica=index)
+                latency.set(self.replica_selector.latencies[index], replica=index)
+
+    @staticmethod
+    def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+        """Учитывает запрос к базе в счетчике обращений текущего http запроса."""
+        count_lookup("db")
 
     async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
         """Получение асинхронной сессии."""
         async with self.session_factory() as session:
             yield session
 
+    @asynccontextmanager
+    async def lazy_session(self, on_commit: Callable[[], Awaitable[None]] | None = None) -> AsyncIterator[AsyncSession]:
+        """Сессия к основной базе, которая создается только при первом обращении к ней.
+
+        on_commit вызывается после каждой фиксации транзакции.
+        """
+        session = LazySession(self.session_factory, on_commit)
+        try:
+            yield session
+        finally:
+            await session.close()
+            self._sessions.inc(mode="lazy", used="true" if session.started else "false")
+
+    @asynccontextmanager
+    async def read_session(self, primary: bool = False) -> AsyncIterator[AsyncSession]:
+        """Ленивая сессия только для чтения.
+
+        Открывается к реплике, а если реплик нет или задан primary - к основной базе. Данные реплик могут
+        отставать от основной базы, поэтому значения, по которым затем делается запись, читаются из основной базы.
+        """
+        if primary or not self.has_replicas:
+            session_factory = self.primary_read_session_factory
+        else:
+            session_factory = self.replica_session_factories[self.replica_selector.choose()]
+        session = LazySession(session_factory)
+        try:
+            yield session
+        finally:
+            await session.close()
+            self._sessions.inc(mode="read", used="true" if session.started else "false")
+
+    async def get_lazy_session(self) -> AsyncGenerator[AsyncSession, None]:
+        """Получение сессии, которая создается только при первом обращении к ней."""
+        async with self.lazy_session() as session:
+            yield session
+
+    async def warm_up(self, connections: int) -> None:
+        """Открывает заранее до connections соединений с основной базой и с каждой репликой.
+
+        Соединения открываются одновременно и возвращаются в пул, в котором остается не больше pool_size из них.
+        """
+        for engine in (self.engine, *self.replica_engines):
+            pending = [engine.connect() for _ in range(min(connections, engine.sync_engine.pool.size()))]
+            results = await asyncio.gather(*(connection.start() for connection in pending), return_exceptions=True)
+            for connection, result in zip(pending, results):
+                if not isinstance(result, BaseException):
+                    await connection.close()
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
     async def dispose(self) -> None:
         """Утилизация Engine при завершении работы приложения."""
         await self.engine.dispose()
+        for engine in self.replica_engines:
+            await engine.dispose()
 
 
-db_helper = DataBaseHelper(settings.db.database_uri, echo=settings.db.echo)
+db_helper = DataBaseHelper(
+    settings.db.database_uri,
+    echo=settings.db.echo,
+    pool_size=settings.db.pool_size,
+    max_overflow=settings.db.max_overflow,
+    pool_timeout=settings.db.pool_timeout,
+    pool_recycle=settings.db.pool_recycle,
+    pool_pre_ping=settings.db.pool_pre_ping,
+    statement_cache_size=settings.db.statement_cache_size,
+    statement_timeout=settings.db.statement_timeout,
+    pgbouncer=settings.db.pgbouncer,
+    replica_uris=settings.db.replica_uris,
+    replica_selection=settings.db.replica_selection,
+)
@@ -0,0 +1,69 @@
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import Column, MetaData, Table, UniqueConstraint
+
+# Справочники, строки которых не удаляются и не меняют id: внешним ключам на них индекс не нужен,
+# он только замедлил бы запись.
+STATIC_TABLES: set[str] = {"timezones", "event_types", "context_types", "task_link_types", "project_types"}
+
+# Колонки, по которым фильтруют выборки помимо внешних ключей. Индекс считается подходящим, если колонка
+# входит в него на любой позиции, например после внешнего ключа в составном индексе.
+FILTER_COLUMNS: set[str] = {"scheduled_deletion_date", "deadline"}
+
+
+class MissingIndex(NamedTuple):
+    """Колонки таблицы, для которых нет подходящего индекса."""
+
+    table: str
+    columns: tuple[str, ...]
+    reason: str
+
+
+def _indexed_column_lists(table: Table) -> list[list[str]]:
+    """Колонки индексов таблицы по порядку, включая индексы первичного ключа и ограничений уникальности."""
+    column_lists = [[column.name for column in table.primary_key.columns]]
+    column_lists += [
+        [column.name for column in constraint.columns]
+        for constraint in table.constraints
+        if isinstance(constraint, UniqueConstraint)
+    ]
+    column_lists += [[column.name] for column in table.columns if column.unique]
+    column_lists += [[column.name for column in index.columns] for index in table.indexes]
+    return [columns for columns in column_lists if columns]
+
+
+def _has_leading_index(column_lists: Iterable[list[str]], columns: set[str]) -> bool:
+    """Есть ли индекс, который начинается с этих колонок в любом порядке."""
+    return any(set(indexed[: len(columns)]) == columns for indexed in column_lists)
+
+
+def _is_reference_column(column: Column) -> bool:
+    """Колонка *_id без внешнего ключа, которая ссылается на строки разных таблиц в зависимости от типа объекта."""
+    return column.name.endswith("_id") and not column.primary_key and not column.foreign_keys
+
+
+def find_missing_indexes(metadata: MetaData) -> list[MissingIndex]:
+    """Внешние ключи и колонки частых выборок без подходящего индекса.
+
+    Внешнему ключу нужен индекс, который начинается с его колонок: без него удаление или изменение строки,
+    на которую он ссылается, проверяет всю таблицу, а выборки по ключу читают ее целиком. То же относится
+    к ссылкам без внешнего ключа. Частичный индекс считается подходящим, поэтому его условие должно
+    пропускать все строки, где колонки ключа заполнены.
+    """
+    missing = []
+    for table in sorted(metadata.tables.values(), key=lambda table: table.name):
+        column_lists = _indexed_column_lists(table)
+        for foreign_key in table.foreign_key_constraints:
+            if foreign_key.referred_table.name in STATIC_TABLES:
+                continue
+            columns = [column.name for column in foreign_key.columns]
+            if not _has_leading_index(column_lists, set(columns)):
+                referred = ", ".join(element.target_fullname for element in foreign_key.elements)
+                missing.append(MissingIndex(table.name, tuple(columns), f"внешний ключ на {referred}"))
+        for column in table.columns:
+            if _is_reference_column(column):
+                if not _has_leading_index(column_lists, {column.name}):
+                    missing.append(MissingIndex(table.name, (column.name,), "ссылка без внешнего ключа"))
+            elif column.name in FILTER_COLUMNS and not any(column.name in indexed for indexed in column_lists):
+                missing.append(MissingIndex(table.name, (column.name,), "колонка частых выборок"))
+    return missing
@@ -0,0 +1,166 @@
+import time
+from collections import OrderedDict
+
+from app.db.pubsub import PubSubSyncedState
+from app.metrics import metrics
+
+# Примерные накладные расходы python на одну запись кеша в байтах, учитываются в ограничении по памяти.
+ENTRY_OVERHEAD: int = 200
+
+
+def _get_size(key: str, value: bytes | dict[bytes, bytes]) -> int:
+    """Примерный размер записи в байтах."""
+    if isinstance(value, dict):
+        value_size = sum(len(field) + len(field_value) + ENTRY_OVERHEAD // 2 for field, field_value in value.items())
+    else:
+        value_size = len(value)
+    return len(key) + value_size + ENTRY_OVERHEAD
+
+
+class LocalCache(PubSubSyncedState):
+    """Кеш воркера перед Redis.
+
+    Для каждого префикса ключей свой LRU с ограничением по количеству записей и времени жизни, а общий размер
+    записей всех префиксов может быть ограничен по памяти. Хранятся значения в том виде, в каком они прочитаны
+    из Redis (байты строки или поля hash), и объекты создаются из них заново при каждом чтении, поэтому
+    вызывающий код каждый раз получает свою копию данных. Записи инвалидируются сообщениями из pub/sub,
+    пока подписка не работает кеш отключен.
+    """
+
+    def __init__(self, limits: dict[str, tuple[int, float]], max_bytes: int = 0) -> None:
+        """Лимиты задаются как префикс -> (максимум записей, время жизни в секундах).
+
+        max_bytes - примерный предел памяти под записи всех префиксов, 0 - без ограничения.
+        """
+        self.limits: dict[str, tuple[int, float]] = {
+            prefix: (max_size, ttl) for prefix, (max_size, ttl) in limits.items() if max_size > 0 and ttl > 0
+        }
+        self.max_bytes: int = max_bytes
+        self._entries: dict[str, OrderedDict[str, tuple[float, bytes | dict[bytes, bytes], int]]] = {
+            prefix: OrderedDict() for prefix in self.limits
+        }
+        # Примерный размер записей каждого префикса в байтах.
+        self._sizes: dict[str, int] = {prefix: 0 for prefix in self.limits}
+        self._requests = metrics.counter("cache_requests_total", "Обращения к кешу по уровню и результату")
+        self._evictions = metrics.counter("local_cache_evictions_total", "Вытеснения из локального кеша по причине")
+        metrics.gauge("local_cache_items", "Записей в локальном кеше воркера", lambda: len(self))
+        metrics.gauge("local_cache_bytes", "Примерный размер локального кеша воркера в байтах", lambda: self.size)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    @property
+    def generation(self) -> int:
+        """Текущее значение счетчика инвалидаций."""
+        return self._invalidations
+
+    @property
+    def size(self) -> int:
+        """Примерный размер записей в байтах."""
+        return sum(self._sizes.values())
+
+    def enabled(self, prefix: str) -> bool:
+        """Кешируются ли локально ключи с этим префиксом."""
+        return prefix in self.limits
+
+    def get(self, prefix: str, key: str) -> bytes | dict[bytes, bytes] | None:
+        """Значение из локального кеша или None."""
+        entries = self._entries.get(prefix)
+        if entries is None:
+            return None
+        entry = entries.get(key)
+        if entry is not None:
+            expires_at, value, _ = entry
+            if expires_at > time.monotonic():
+                entries.move_to_end(key)
+                self._requests.inc(tier="local", prefix=prefix, result="hit")
+                return value
+            self._pop(prefix, key)
+        self._requests.inc(tier="local", prefix=prefix, result="miss")
+        return None
+
+    def set(
+        self, prefix: str, key: str, value: bytes | dict[bytes, bytes], generation: int, ttl: float | None = None
+    ) -> None:
+        """Сохраняет значение, прочитанное из Redis при заданном значении счетчика инвалидаций.
+
+        Время жизни ttl не может превышать время жизни записей префикса.
+        """
+        entries = self._entries.get(prefix)
+        if entries is None or not self._can_remember(generation):
+            return
+        size = _get_size(key, value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        self._pop(prefix, key)
+        max_size, prefix_ttl = self.limits[prefix]
+        entries[key] = (time.monotonic() + min(ttl or prefix_ttl, prefix_ttl), value, size)
+        self._sizes[prefix] += size
+        while len(entries) > max_size:
+            self._pop(prefix, next(iter(entries)))
+            self._evictions.inc(reason="items")
+        if self.max_bytes:
+            self._evict_to_max_bytes(key)
+
+    def _pop(self, prefix: str, key: str) -> None:
+        """Удаляет запись, если она есть."""
+        entry = self._entries[prefix].pop(key, None)
+        if entry is not None:
+            self._sizes[prefix] -= entry[2]
+
+    def _evict_to_max_bytes(self, new_key: str) -> None:
+        """Вытесняет записи, пока кеш не уложится в предел памяти.
+
+        Вытесняются самые давние записи префикса, который занимает больше всего памяти.
+        Только что добавленная запись new_key остается в кеше.
+        """
+        while self.size > self.max_bytes:
+            candidates = [
+                (size, prefix)
+                for prefix, size in self._sizes.items()
+                if len(self._entries[prefix]) > (new_key in self._entries[prefix])
+            ]
+            if not candidates:
+                return
+            _, prefix = max(candidates)
+            self._pop(prefix, next(iter(self._entries[prefix])))
+            self._evictions.inc(reason="bytes")
+
+    def record_remote(self, prefix: str, hit: bool) -> None:
+        """Учитывает результат обращения к Redis."""
+        self._requests.inc(tier="redis", prefix=prefix, result="hit" if hit else "miss")
+
+    def invalidate(self, key: str) -> None:
+        """Удаляет ключ из локального кеша."""
+        self._invalidations += 1
+        prefix = key.partition(":")[0]
+        entries = self._entries.get(prefix)
+        if entries is not None:
+            self._pop(prefix, key)
+
+    def invalidate_keys(self, keys: list[str] | None) -> None:
+        """Удаляет ключи из сообщения об инвалидации Redis client tracking. None означает очистку базы Redis."""
+        if keys is None:
+            self.clear()
+            return
+        for key in keys:
+            self.invalidate(key)
+
+    def clear_prefix(self, prefix: str) -> None:
+        """Удаляет все ключи префикса из локального кеша."""
+        self._invalidations += 1
+        entries = self._entries.get(prefix)
+        if entries is not None:
+            entries.clear()
+            self._sizes[prefix] = 0
+
+    def clear(self) -> None:
+        """Очищает локальный кеш."""
+        self._invalidations += 1
+        for entries in self._entries.values():
+            entries.clear()
+        self._sizes = dict.fromkeys(self._sizes, 0)
+
+    def _reset(self) -> None:
+        """Очищает кеш."""
+        self.clear()
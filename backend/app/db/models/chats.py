@@ -2,16 +2,45 @@ import datetime
 import uuid
 from typing import TYPE_CHECKING
 
-from sqlalchemy import BIGINT, SMALLINT, TIMESTAMP, CheckConstraint, ForeignKey, String, UniqueConstraint, func, text
+from sqlalchemy import (
+    BIGINT,
+    SMALLINT,
+    TIMESTAMP,
+    CheckConstraint,
+    ForeignKey,
+    ForeignKeyConstraint,
+    Index,
+    Sequence,
+    String,
+    UniqueConstraint,
+    func,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.constants import DELETED_MESSAGE_ID, DELETED_USER_ID
+from app.constants import DELETED_MESSAGE_CREATED_AT, DELETED_MESSAGE_ID, DELETED_USER_ID
 from app.db.models.base import Base
 from app.db.models.mixins import BigIntPrimaryKeyMixin, UUIDPrimaryKeyMixin
 
 if TYPE_CHECKING:
     from app.db.models import Project
 
+# Значения по умолчанию для ссылок на удаленное сообщение, нужны базе для ON DELETE SET DEFAULT.
+DELETED_MESSAGE_ID_DEFAULT = text(str(DELETED_MESSAGE_ID))
+DELETED_MESSAGE_CREATED_AT_DEFAULT = text(f"'{DELETED_MESSAGE_CREATED_AT.isoformat()}'")
+
+
+def _deleted_message_reference_check(id_column: str, created_at_column: str) -> str:
+    """Условие, что ссылка на сообщение либо целиком указывает на удаленное сообщение, либо целиком на другое.
+
+    Время создания не заполняется в python, поэтому ссылка с id без времени создания получает время удаленного
+    сообщения из значения по умолчанию и отклоняется базой, а не указывает на несуществующую пару.
+    """
+    return (
+        f"({id_column} = {DELETED_MESSAGE_ID_DEFAULT.text}) = "
+        f"({created_at_column} = {DELETED_MESSAGE_CREATED_AT_DEFAULT.text})"
+    )
+
 
 class ChannelsGroup(Base, UUIDPrimaryKeyMixin):
     """Группы каналов."""
@@ -19,6 +48,18 @@ class ChannelsGroup(Base, UUIDPrimaryKeyMixin):
     __tablename__ = "channels_groups"
     __table_args__ = (
         UniqueConstraint("name", "company_id", name="uq_channels_group_name"),
+        Index("ix_channels_groups_company_id", "company_id"),
+        Index("ix_channels_groups_project_id", "project_id", postgresql_where=text("project_id IS NOT NULL")),
+        Index(
+            "ix_channels_groups_parent_channel_group_id",
+            "parent_channel_group_id",
+            postgresql_where=text("parent_channel_group_id IS NOT NULL"),
+        ),
+        Index(
+            "ix_channels_groups_permissions_parent_channel_group_id",
+            "permissions_parent_channel_group_id",
+            postgresql_where=text("permissions_parent_channel_group_id IS NOT NULL"),
+        ),
         {"comment": "Группы каналов"},
     )
 
@@ -60,6 +101,12 @@ class Channel(Base, UUIDPrimaryKeyMixin):
             ''',
             name="check_channel_group_project_xor",
         ),
+        Index("ix_channels_company_id", "company_id"),
+        Index(
+            "ix_channels_channel_group_id", "channel_group_id", postgresql_where=text("channel_group_id IS NOT NULL")
+        ),
+        Index("ix_channels_project_id", "project_id", postgresql_where=text("project_id IS NOT NULL")),
+        Index("ix_channels_permissions_parent_channel_group_id", "permissions_parent_channel_group_id"),
         {"comment": "Каналы"},
     )
 
@@ -86,11 +133,40 @@ class Channel(Base, UUIDPrimaryKeyMixin):
         return f"<Channel {self.name}>"
 
 
-class Message(Base, BigIntPrimaryKeyMixin):
-    """Модель сообщения."""
+class Message(Base):
+    """Модель сообщения.
+
+    Таблица разбита на секции по месяцам времени создания (app.db.partitions), поэтому время создания входит
+    в первичный ключ, а ссылки на сообщение состоят из id и времени создания. Выборки с условием на created_at
+    читают только секции за нужный период.
+    """
 
     __tablename__ = "messages"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["quoted_message_id", "quoted_message_created_at"],
+            ["messages.id", "messages.created_at"],
+            ondelete="SET DEFAULT",
+        ),
+        CheckConstraint(
+            _deleted_message_reference_check("quoted_message_id", "quoted_message_created_at"),
+            name="check_message_quoted_message_reference",
+        ),
+        Index("ix_messages_channel_id_created_at", "channel_id", "created_at"),
+        Index(
+            "ix_messages_thread_id_created_at",
+            "thread_id",
+            "created_at",
+            postgresql_where=text("thread_id IS NOT NULL"),
+        ),
+        Index("ix_messages_user_id", "user_id"),
+        Index(
+            "ix_messages_quoted_message_id_quoted_message_created_at", "quoted_message_id", "quoted_message_created_at"
+        ),
+        {"comment": "Модель сообщения.", "postgresql_partition_by": "RANGE (created_at)"},
+    )
 
+    id: Mapped[int] = mapped_column(BIGINT, Sequence("messages_id_seq"), primary_key=True, comment="Идентификатор")
     content: Mapped[str] = mapped_column(comment="Содержимое сообщения")
     channel_id: Mapped[uuid.UUID | None] = mapped_column(
         ForeignKey("channels.id", ondelete="CASCADE"), comment="Идентификатор канала"
@@ -104,17 +180,25 @@ class Message(Base, BigIntPrimaryKeyMixin):
         default=DELETED_USER_ID,
     )
     created_at: Mapped[datetime.datetime] = mapped_column(
-        TIMESTAMP(timezone=True), server_default=func.now(), comment="Время создания сообщения"
+        TIMESTAMP(timezone=True),
+        primary_key=True,
+        server_default=func.now(),
+        comment="Время создания сообщения",
     )
     updated_at: Mapped[datetime.datetime | None] = mapped_column(
         TIMESTAMP(timezone=True), comment="Время последнего изменения сообщения"
     )
     quoted_message_id: Mapped[int] = mapped_column(
         BIGINT,
-        ForeignKey("messages.id", ondelete="SET DEFAULT"),
         default=DELETED_MESSAGE_ID,
+        server_default=DELETED_MESSAGE_ID_DEFAULT,
         comment="Идентификатор цитируемого сообщения",
     )
+    quoted_message_created_at: Mapped[datetime.datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        server_default=DELETED_MESSAGE_CREATED_AT_DEFAULT,
+        comment="Время создания цитируемого сообщения",
+    )
     is_deleted: Mapped[bool] = mapped_column(
         comment="Сообщение помечено как удаленное",
         default=False,
@@ -131,11 +215,18 @@ class LastReadMessageByUser(Base, BigIntPrimaryKeyMixin):
     __tablename__ = "last_read_message_by_user"
     __table_args__ = (
         UniqueConstraint("user_id", "channel_id", name="uq_last_read_message_by_user_chanel"),
+        ForeignKeyConstraint(
+            ["message_id", "message_created_at"], ["messages.id", "messages.created_at"], ondelete="CASCADE"
+        ),
+        Index("ix_last_read_message_by_user_message_id_message_created_at", "message_id", "message_created_at"),
+        Index("ix_last_read_message_by_user_channel_id", "channel_id", postgresql_where=text("channel_id IS NOT NULL")),
+        Index("ix_last_read_message_by_user_thread_id", "thread_id", postgresql_where=text("thread_id IS NOT NULL")),
         {"comment": "Таблица хранящая последнее прочитанное сообщение в чате для пользователя."},
     )
 
-    message_id: Mapped[int] = mapped_column(
-        BIGINT, ForeignKey("messages.id", ondelete="CASCADE"), comment="Идентификатор сообщения"
+    message_id: Mapped[int] = mapped_column(BIGINT, comment="Идентификатор сообщения")
+    message_created_at: Mapped[datetime.datetime] = mapped_column(
+        TIMESTAMP(timezone=True), comment="Время создания сообщения"
     )
     user_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"), comment="Идентификатор пользователя"
@@ -155,10 +246,31 @@ class Thread(Base, BigIntPrimaryKeyMixin):
     """Модель для хранения тредов."""
 
     __tablename__ = "threads"
+    __table_args__ = (
+        Index("ix_threads_channel_id_created_at", "channel_id", "created_at"),
+        ForeignKeyConstraint(
+            ["parent_message_id", "parent_message_created_at"],
+            ["messages.id", "messages.created_at"],
+            ondelete="SET DEFAULT",
+        ),
+        CheckConstraint(
+            _deleted_message_reference_check("parent_message_id", "parent_message_created_at"),
+            name="check_thread_parent_message_reference",
+        ),
+        Index(
+            "ix_threads_parent_message_id_parent_message_created_at", "parent_message_id", "parent_message_created_at"
+        ),
+        {"comment": "Модель для хранения тредов."},
+    )
     parent_message_id: Mapped[int] = mapped_column(
         BIGINT,
-        ForeignKey("messages.id", ondelete="SET DEFAULT"),
         default=DELETED_MESSAGE_ID,  # TODO подумать где будет выводится тред если родительское сообщение удалено.
+        server_default=DELETED_MESSAGE_ID_DEFAULT,
+    )
+    parent_message_created_at: Mapped[datetime.datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        server_default=DELETED_MESSAGE_CREATED_AT_DEFAULT,
+        comment="Время создания родительского сообщения",
     )
     title: Mapped[str] = mapped_column(comment="Заголовок треда")
     created_at: Mapped[datetime.datetime] = mapped_column(
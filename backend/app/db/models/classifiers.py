@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import BIGINT, SMALLINT, CheckConstraint, ForeignKey, String, UniqueConstraint
+from sqlalchemy import BIGINT, SMALLINT, CheckConstraint, ForeignKey, Index, String, UniqueConstraint, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.constants import DEFAULT_TASK_TYPE_ICON_ID, DELETED_COMPANY_ID
@@ -54,6 +54,9 @@ class TaskType(Base, BigIntPrimaryKeyMixin):
             "(company_id IS NOT NULL AND project_id IS NULL) OR (company_id IS NULL AND project_id IS NOT NULL)",
             name="chk_company_or_project",
         ),
+        Index("ix_task_types_company_id", "company_id", postgresql_where=text("company_id IS NOT NULL")),
+        Index("ix_task_types_project_id", "project_id", postgresql_where=text("project_id IS NOT NULL")),
+        Index("ix_task_types_icon_id", "icon_id"),
         {"comment": "Пополняемый классификатор типов задач"},
     )
 
@@ -80,6 +83,10 @@ class Icon(Base, BigIntPrimaryKeyMixin):
     """Пополняемый классификатор для хранения ссылок на иконки."""
 
     __tablename__ = "icons"
+    __table_args__ = (
+        Index("ix_icons_company_id", "company_id", postgresql_where=text("company_id IS NOT NULL")),
+        {"comment": "Пополняемый классификатор для хранения ссылок на иконки."},
+    )
 
     company_id: Mapped[uuid.UUID | None] = mapped_column(
         ForeignKey("companies.id", ondelete="SET DEFAULT"),
@@ -163,6 +170,10 @@ class Smile(Base, BigIntPrimaryKeyMixin):
     """Модель для хранения смайлов."""
 
     __tablename__ = "smiles"
+    __table_args__ = (
+        Index("ix_smiles_company_id", "company_id", postgresql_where=text("company_id IS NOT NULL")),
+        {"comment": "Модель для хранения смайлов."},
+    )
 
     company_id: Mapped[uuid.UUID | None] = mapped_column(
         ForeignKey("companies.id", ondelete="CASCADE"), comment="Идентификатор компании"
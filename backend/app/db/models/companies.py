@@ -1,7 +1,7 @@
 import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import SMALLINT, TIMESTAMP, ForeignKey, String, text
+from sqlalchemy import SMALLINT, TIMESTAMP, ForeignKey, Index, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.models.base import Base
@@ -15,6 +15,14 @@ class Company(Base, UUIDPrimaryKeyMixin):
     """Модель компании."""
 
     __tablename__ = "companies"
+    __table_args__ = (
+        Index(
+            "ix_companies_scheduled_deletion_date",
+            "scheduled_deletion_date",
+            postgresql_where=text("scheduled_deletion_date IS NOT NULL"),
+        ),
+        {"comment": "Модель компании."},
+    )
 
     name: Mapped[str] = mapped_column(comment="Наименование организации")
     description: Mapped[str | None] = mapped_column(comment="Описание организации")
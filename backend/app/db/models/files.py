@@ -1,7 +1,7 @@
 import datetime
 import uuid
 
-from sqlalchemy import BIGINT, TIMESTAMP, ForeignKey, String, UniqueConstraint, func
+from sqlalchemy import BIGINT, TIMESTAMP, ForeignKey, ForeignKeyConstraint, Index, String, UniqueConstraint, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.constants import DEFAULT_FILE_GROUP_ICON_ID, DELETED_COMPANY_ID, DELETED_USER_ID
@@ -15,6 +15,18 @@ class FilesGroup(Base, UUIDPrimaryKeyMixin):
     __tablename__ = "files_groups"
     __table_args__ = (
         UniqueConstraint("name", "company_id", name="uq_file_group_name"),
+        Index("ix_files_groups_company_id", "company_id"),
+        Index("ix_files_groups_icon_id", "icon_id"),
+        Index(
+            "ix_files_groups_parent_file_group_id",
+            "parent_file_group_id",
+            postgresql_where=text("parent_file_group_id IS NOT NULL"),
+        ),
+        Index(
+            "ix_files_groups_permissions_parent_file_group_id",
+            "permissions_parent_file_group_id",
+            postgresql_where=text("permissions_parent_file_group_id IS NOT NULL"),
+        ),
         {"comment": "Группы файлов"},
     )
 
@@ -46,6 +58,11 @@ class File(Base, UUIDPrimaryKeyMixin):
     """Файлы."""
 
     __tablename__ = "files"
+    __table_args__ = (
+        Index("ix_files_company_id_created_at", "company_id", "created_at"),
+        Index("ix_files_author_id", "author_id"),
+        {"comment": "Файлы."},
+    )
 
     company_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("companies.id", ondelete="SET DEFAULT"), default=DELETED_COMPANY_ID, comment="Идентификатор компании"
@@ -72,6 +89,7 @@ class FileInGroup(Base, BigIntPrimaryKeyMixin):
     __tablename__ = "files_in_groups"
     __table_args__ = (
         UniqueConstraint("file_id", "files_group_id", name="uq_file_in_group"),
+        Index("ix_files_in_groups_files_group_id_created_at", "files_group_id", "created_at"),
         {"comment": "Привязка файла к группе"},
     )
 
@@ -96,6 +114,7 @@ class TaskAttachment(Base, BigIntPrimaryKeyMixin):
     __tablename__ = "task_attachments"
     __table_args__ = (
         UniqueConstraint("task_id", "file_id", name="uq_task_attachment"),
+        Index("ix_task_attachments_file_id", "file_id"),
         {"comment": "Файлы прикрепленные к задаче"},
     )
 
@@ -116,6 +135,7 @@ class CommentAttachment(Base, BigIntPrimaryKeyMixin):
     __tablename__ = "comment_attachments"
     __table_args__ = (
         UniqueConstraint("task_comment_id", "file_id", name="uq_comment_attachment"),
+        Index("ix_comment_attachments_file_id", "file_id"),
         {"comment": "Файлы прикрепленные к комментариям"},
     )
 
@@ -135,12 +155,17 @@ class MessageAttachment(Base, BigIntPrimaryKeyMixin):
 
     __tablename__ = "message_attachments"
     __table_args__ = (
-        UniqueConstraint("message_id", "file_id", name="uq_message_attachment"),
+        UniqueConstraint("message_id", "message_created_at", "file_id", name="uq_message_attachment"),
+        ForeignKeyConstraint(
+            ["message_id", "message_created_at"], ["messages.id", "messages.created_at"], ondelete="CASCADE"
+        ),
+        Index("ix_message_attachments_file_id", "file_id"),
         {"comment": "Файлы прикрепленные к сообщению в чате"},
     )
 
-    message_id: Mapped[uuid.UUID] = mapped_column(
-        ForeignKey("messages.id", ondelete="CASCADE"), comment="Идентификатор сообщения"
+    message_id: Mapped[int] = mapped_column(BIGINT, comment="Идентификатор сообщения")
+    message_created_at: Mapped[datetime.datetime] = mapped_column(
+        TIMESTAMP(timezone=True), comment="Время создания сообщения"
     )
     file_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("files.id", ondelete="CASCADE"), comment="Идентификатор файла"
@@ -1,7 +1,7 @@
 import datetime
 import uuid
 
-from sqlalchemy import SMALLINT, ForeignKey, func
+from sqlalchemy import SMALLINT, ForeignKey, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.constants import DELETED_USER_ID
@@ -13,6 +13,12 @@ class Log(Base, BigIntPrimaryKeyMixin):
     """Модель для хранения логов приложения."""
 
     __tablename__ = "logs"
+    __table_args__ = (
+        Index("ix_logs_company_id_created_at", "company_id", "created_at"),
+        Index("ix_logs_object_id_context_type_id_created_at", "object_id", "context_type_id", "created_at"),
+        Index("ix_logs_user_id", "user_id"),
+        {"comment": "Модель для хранения логов приложения."},
+    )
 
     user_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("users.id", ondelete="SET DEFAULT"),
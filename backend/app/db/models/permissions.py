@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import SMALLINT, ForeignKey, UniqueConstraint
+from sqlalchemy import SMALLINT, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.models.base import Base
@@ -14,6 +14,8 @@ class CompanyUserRole(Base, BigIntPrimaryKeyMixin):
     __tablename__ = "company_users_roles"
     __table_args__ = (
         UniqueConstraint("company_id", "user_id", "role_id", name="uq_company_user_role"),
+        Index("ix_company_users_roles_user_id_company_id", "user_id", "company_id"),
+        Index("ix_company_users_roles_role_id", "role_id"),
         {"comment": "Роли пользователей в компании"},
     )
 
@@ -39,6 +41,8 @@ class SubjectPermissionToObject(Base, BigIntPrimaryKeyMixin):
 
     __table_args__ = (
         UniqueConstraint("permission_id", "subject_id", "object_id", name="uq_subject_permission_to_object"),
+        Index("ix_subject_permissions_to_object_subject_id_object_id", "subject_id", "object_id"),
+        Index("ix_subject_permissions_to_object_object_id", "object_id"),
         {"comment": "Права субъекта на объект"},
     )
 
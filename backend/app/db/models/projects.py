@@ -1,7 +1,7 @@
 import uuid
 from typing import TYPE_CHECKING
 
-from sqlalchemy import BIGINT, ForeignKey, String, UniqueConstraint
+from sqlalchemy import BIGINT, ForeignKey, Index, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.constants import DEFAULT_PROJECT_ICON_ID
@@ -22,6 +22,8 @@ class Project(Base, UUIDPrimaryKeyMixin):
     __table_args__ = (
         UniqueConstraint("name", "company_id", name="uq_project_name"),
         UniqueConstraint("prefix", "company_id", name="uq_project_prefix"),
+        Index("ix_projects_company_id", "company_id"),
+        Index("ix_projects_icon_id", "icon_id"),
         {"comment": "Таблица проектов"},
     )
 
@@ -1,7 +1,7 @@
 import datetime
 import uuid
 
-from sqlalchemy import BIGINT, TIMESTAMP, ForeignKey, String
+from sqlalchemy import BIGINT, TIMESTAMP, ForeignKey, Index, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.models import Base
@@ -13,6 +13,10 @@ class Sprint(Base, BigIntPrimaryKeyMixin):
     """Модель спринта."""
 
     __tablename__ = "sprints"
+    __table_args__ = (
+        Index("ix_sprints_project_id_start_date", "project_id", "start_date"),
+        {"comment": "Модель спринта."},
+    )
 
     name: Mapped[str] = mapped_column(String(100), comment="Название спринта")
     description: Mapped[str] = mapped_column(comment="Описание/цель спринта")
@@ -36,6 +40,11 @@ class TasksSprint(Base, BigIntPrimaryKeyMixin):
     """Задачи спринта."""
 
     __tablename__ = "tasks_sprints"
+    __table_args__ = (
+        Index("ix_tasks_sprints_sprint_id_task_id", "sprint_id", "task_id"),
+        Index("ix_tasks_sprints_task_id", "task_id"),
+        {"comment": "Задачи спринта."},
+    )
 
     sprint_id: Mapped[int] = mapped_column(
         BIGINT, ForeignKey("sprints.id", ondelete="CASCADE"), comment="Идентификатор спринта"
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import BIGINT, CheckConstraint, ForeignKey, String, UniqueConstraint
+from sqlalchemy import BIGINT, CheckConstraint, ForeignKey, Index, String, UniqueConstraint, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.models.base import Base
@@ -18,6 +18,8 @@ class Tag(Base, BigIntPrimaryKeyMixin):
             "(company_id IS NOT NULL AND project_id IS NULL) OR (company_id IS NULL AND project_id IS NOT NULL)",
             name="chk_project_or_company",
         ),
+        Index("ix_tags_company_id", "company_id", postgresql_where=text("company_id IS NOT NULL")),
+        Index("ix_tags_project_id", "project_id", postgresql_where=text("project_id IS NOT NULL")),
         {"comment": "Теги"},
     )
 
@@ -41,6 +43,7 @@ class TaskTag(Base, BigIntPrimaryKeyMixin):
     __tablename__ = "tasks_tags"
     __table_args__ = (
         UniqueConstraint("tag_id", "task_id", name="uq_task_tag"),
+        Index("ix_tasks_tags_task_id", "task_id"),
         {"comment": "Теги на задачах"},
     )
 
@@ -59,6 +62,7 @@ class FileTag(Base, BigIntPrimaryKeyMixin):
     __tablename__ = "files_tags"
     __table_args__ = (
         UniqueConstraint("tag_id", "file_id", name="uq_file_tag"),
+        Index("ix_files_tags_file_id", "file_id"),
         {"comment": "Теги на файлах"},
     )
 
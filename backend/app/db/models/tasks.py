@@ -1,7 +1,7 @@
 import datetime
 import uuid
 
-from sqlalchemy import BIGINT, TIMESTAMP, ForeignKey, String, UniqueConstraint, func
+from sqlalchemy import BIGINT, TIMESTAMP, ForeignKey, Index, String, UniqueConstraint, func, text
 from sqlalchemy.dialects.mysql import SMALLINT
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -16,6 +16,11 @@ class Task(Base, UUIDPrimaryKeyMixin):
     __tablename__ = "tasks"
     __table_args__ = (
         UniqueConstraint("project_id", "name", name="uq_task_name"),
+        Index("ix_tasks_column_id", "column_id", postgresql_where=text("column_id IS NOT NULL")),
+        Index("ix_tasks_assignee_id_deadline", "assignee_id", "deadline"),
+        Index("ix_tasks_creator_id", "creator_id"),
+        Index("ix_tasks_archived_by_id", "archived_by_id", postgresql_where=text("archived_by_id IS NOT NULL")),
+        Index("ix_tasks_task_type_id", "task_type_id"),
         {"comment": "Задача"},
     )
 
@@ -62,6 +67,11 @@ class ChildTask(Base, BigIntPrimaryKeyMixin):
     """Дочерние задачи."""
 
     __tablename__ = "child_tasks"
+    __table_args__ = (
+        Index("ix_child_tasks_parent_task_id_child_task_id", "parent_task_id", "child_task_id"),
+        Index("ix_child_tasks_child_task_id", "child_task_id"),
+        {"comment": "Дочерние задачи."},
+    )
 
     parent_task_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("tasks.id", ondelete="CASCADE"), comment="Идентификатор родительской задачи"
@@ -78,6 +88,11 @@ class TaskComment(Base, UUIDPrimaryKeyMixin):
     """Модель комментария к задаче."""
 
     __tablename__ = "task_comments"
+    __table_args__ = (
+        Index("ix_task_comments_task_id_created_at", "task_id", "created_at"),
+        Index("ix_task_comments_user_id", "user_id"),
+        {"comment": "Модель комментария к задаче."},
+    )
 
     task_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("tasks.id", ondelete="CASCADE"), comment="Идентификатор задачи"
@@ -103,6 +118,11 @@ class LinkedTask(Base, BigIntPrimaryKeyMixin):
     """Связанные задачи."""
 
     __tablename__ = "linked_tasks"
+    __table_args__ = (
+        Index("ix_linked_tasks_from_task_id", "from_task_id"),
+        Index("ix_linked_tasks_to_task_id", "to_task_id"),
+        {"comment": "Связанные задачи."},
+    )
 
     from_task_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("tasks.id", ondelete="CASCADE"), comment="Задача с которой стоит связь"
@@ -122,6 +142,10 @@ class TaskTimeSpend(Base, BigIntPrimaryKeyMixin):
     """Учет времени потраченного на задачу."""
 
     __tablename__ = "task_time_spend"
+    __table_args__ = (
+        Index("ix_task_time_spend_task_id", "task_id"),
+        {"comment": "Учет времени потраченного на задачу."},
+    )
     description: Mapped[str] = mapped_column(comment="Описание")
     task_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("tasks.id", ondelete="CASCADE"), comment="Идентификатор задачи"
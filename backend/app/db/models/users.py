@@ -2,13 +2,13 @@ import datetime
 import uuid
 from typing import TYPE_CHECKING
 
-import bcrypt
-from sqlalchemy import SMALLINT, TIMESTAMP, ForeignKey, String, UniqueConstraint, text
+from sqlalchemy import SMALLINT, TIMESTAMP, ForeignKey, Index, String, UniqueConstraint, text
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.models.base import Base
 from app.db.models.mixins import BigIntPrimaryKeyMixin, UUIDPrimaryKeyMixin
+from app.utils.passwords import check_password, hash_password, password_hasher, password_needs_rehash
 
 if TYPE_CHECKING:
     from app.db.models import Timezone
@@ -18,6 +18,14 @@ class User(Base, UUIDPrimaryKeyMixin):
     """Модель пользователя."""
 
     __tablename__ = "users"
+    __table_args__ = (
+        Index(
+            "ix_users_scheduled_deletion_date",
+            "scheduled_deletion_date",
+            postgresql_where=text("scheduled_deletion_date IS NOT NULL"),
+        ),
+        {"comment": "Модель пользователя."},
+    )
 
     email: Mapped[str] = mapped_column(String(100), comment="Почта", unique=True)
     username: Mapped[str] = mapped_column(String(30), comment="Имя пользователя", unique=True)
@@ -56,11 +64,27 @@ class User(Base, UUIDPrimaryKeyMixin):
 
     def _generate_password_hash(self, plain_password: str) -> str:
         """Генерация хеша пароля с использованием bcrypt."""
-        return bcrypt.hashpw(plain_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        return hash_password(plain_password)
 
     def verify_password(self, plain_password: str) -> bool:
         """Проверка пароля через сравнение хеша."""
-        return bcrypt.checkpw(plain_password.encode("utf-8"), self.hashed_password.encode("utf-8"))
+        return check_password(plain_password, self.hashed_password)
+
+    async def set_password(self, plain_password: str) -> None:
+        """Установка пароля без блокировки event loop, хеш считается в пуле bcrypt."""
+        self.hashed_password = await password_hasher.hash(plain_password)
+
+    def password_needs_rehash(self) -> bool:
+        """Сохранен ли хеш пароля с устаревшей стоимостью bcrypt."""
+        return password_needs_rehash(self.hashed_password)
+
+    async def rehash_password(self, plain_password: str) -> None:
+        """Пересчитывает хеш уже проверенного пароля под текущую стоимость bcrypt."""
+        self.hashed_password = await password_hasher.rehash(plain_password, self.hashed_password)
+
+    async def verify_password_async(self, plain_password: str) -> bool:
+        """Проверка пароля без блокировки event loop в пуле bcrypt."""
+        return await password_hasher.verify(plain_password, self.hashed_password)
 
 
 class UserCompanyMembership(Base, BigIntPrimaryKeyMixin):
@@ -69,6 +93,7 @@ class UserCompanyMembership(Base, BigIntPrimaryKeyMixin):
     __tablename__ = "user_company_membership"
     __table_args__ = (
         UniqueConstraint("user_id", "company_id", name="uq_user_company"),
+        Index("ix_user_company_membership_company_id", "company_id"),
         {"comment": "Членство пользователя в организации"},
     )
 
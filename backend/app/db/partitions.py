@@ -0,0 +1,286 @@
+import asyncio
+import datetime
+import re
+import uuid
+from typing import NamedTuple
+
+from redis.exceptions import LockError, RedisError
+from sqlalchemy import Table, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.config import settings
+from app.db import db_helper
+from app.db.models import Message
+from app.db.redis import redis_client
+from app.logger import logger
+from app.metrics import metrics
+
+# Имена секций: <таблица>_initial для данных до первой месячной секции и <таблица>_ГГГГ_ММ для месяцев.
+PARTITION_NAME_REGEX: re.Pattern[str] = re.compile(r"^(?P<table>\w+?)_(?:initial|(?P<year>\d{4})_(?P<month>\d{2}))$")
+
+# Сколько ждать блокировку таблицы при изменении секций, чтобы не останавливать запросы к ней надолго.
+LOCK_TIMEOUT: str = "5s"
+
+# Время жизни блокировки обслуживания в Redis в секундах, больше самого долгого обслуживания.
+MAINTENANCE_LOCK_TIMEOUT: int = 30 * 60
+
+
+def is_partition_name(name: str, tables: set[str] | None = None) -> bool:
+    """Является ли таблица секцией одной из таблиц."""
+    match = PARTITION_NAME_REGEX.match(name)
+    return match is not None and (tables is None or match["table"] in tables)
+
+
+def month_start(day: datetime.date, shift: int = 0) -> datetime.datetime:
+    """Начало месяца в UTC, сдвинутого на shift месяцев от месяца day."""
+    month = day.year * 12 + day.month - 1 + shift
+    return datetime.datetime(month // 12, month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Partition(NamedTuple):
+    """Месячная секция таблицы."""
+
+    name: str
+    month: datetime.datetime
+    detach_pending: bool
+
+
+class MonthlyPartitions:
+    """Секции таблицы по месяцам времени создания строк.
+
+    Секции на ahead месяцев вперед создаются заранее, чтобы вставка никогда не попадала в месяц
+    без секции. Новая секция создается отдельной таблицей и присоединяется через ATTACH PARTITION: он блокирует
+    только изменение секций, а CREATE TABLE ... PARTITION OF остановил бы на время создания все запросы
+    к таблице.
+
+    Секции старше retention_months полных месяцев архивируются: секция отсоединяется через DETACH PARTITION
+    CONCURRENTLY, без остановки запросов, и переносится в схему archive_schema без внешних ключей. Архивные
+    строки остаются доступны для выгрузки, но не попадают в выборки из таблицы.
+
+    Архивация ничего не удаляет и не меняет в других таблицах. Пока на строки секции ссылается хотя бы одна
+    строка по внешнему ключу (вложения, отметки о прочтении, треды, цитаты, в том числе из самой секции),
+    секция не архивируется: в лог пишется, какие ссылки мешают, а попытка повторяется при следующем
+    обслуживании. Зависимые строки должны быть удалены или перенесены до архивации.
+    """
+
+    def __init__(
+        self,
+        table: Table,
+        ahead: int,
+        retention_months: int,
+        archive_schema: str,
+        interval: int,
+    ) -> None:
+        """Настройки секций таблицы."""
+        self.table: Table = table
+        self.ahead: int = ahead
+        self.retention_months: int = retention_months
+        self.archive_schema: str = archive_schema
+        self.interval: int = interval
+        self._task: asyncio.Task | None = None
+        self._created = metrics.counter("partitions_created_total", "Созданные секции таблиц")
+        self._archived = metrics.counter("partitions_archived_total", "Отсоединенные и перенесенные в архив секции")
+        self._failures = metrics.counter("partition_maintenance_failures_total", "Ошибки обслуживания секций")
+        self._blocked = metrics.counter(
+            "partitions_archive_blocked_total", "Секции, не архивированные из-за ссылок на их строки"
+        )
+
+    def partition_name(self, month: datetime.datetime) -> str:
+        """Имя секции месяца."""
+        return f"{self.table.name}_{month:%Y_%m}"
+
+    async def start(self) -> None:
+        """Запускает периодическое обслуживание секций."""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._periodic_maintain())
+
+    async def stop(self) -> None:
+        """Останавливает периодическое обслуживание секций."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def maintain(self, engine: AsyncEngine, today: datetime.date | None = None) -> tuple[list[str], list[str]]:
+        """Создает будущие секции и архивирует старые под блокировкой в Redis.
+
+        Возвращает имена созданных и архивированных секций. Если обслуживание уже выполняет другой воркер
+        или Redis недоступен, ничего не делает.
+        """
+        today = today or datetime.datetime.now(datetime.timezone.utc).date()
+        lock = redis_client.lock(
+            f"{settings.redis.partitions_lock_key}:{self.table.name}",
+            timeout=MAINTENANCE_LOCK_TIMEOUT,
+            thread_local=False,
+        )
+        try:
+            if not await lock.acquire(blocking=False, token=uuid.uuid4().hex):
+                logger.debug(f"Секции {self.table.name} обслуживает другой воркер")
+                return [], []
+        except RedisError as e:
+            logger.warning(f"Обслуживание секций {self.table.name} пропущено, Redis недоступен: {e}")
+            return [], []
+        try:
+            created = await self.create_future(engine, today)
+            archived = await self.archive_old(engine, today) if self.retention_months > 0 else []
+            return created, archived
+        finally:
+            try:
+                await lock.release()
+            except (LockError, RedisError):
+                pass
+
+    async def create_future(self, engine: AsyncEngine, today: datetime.date) -> list[str]:
+        """Создает недостающие секции с текущего месяца на ahead месяцев вперед."""
+        async with engine.connect() as connection:
+            existing = {partition.name for partition in await self._partitions(connection)}
+        created = []
+        for shift in range(self.ahead + 1):
+            month = month_start(today, shift)
+            name = self.partition_name(month)
+            if name in existing:
+                continue
+            try:
+                async with engine.begin() as connection:
+                    await self._create(connection, name, month)
+            except SQLAlchemyError as e:
+                self._failures.inc(table=self.table.name, action="create")
+                logger.error(f"Не удалось создать секцию {name}", exc_info=e)
+                continue
+            self._created.inc(table=self.table.name)
+            created.append(name)
+            logger.info(f"Создана секция {name}")
+        return created
+
+    async def archive_old(self, engine: AsyncEngine, today: datetime.date) -> list[str]:
+        """Архивирует секции месяцев раньше retention_months полных месяцев до текущего."""
+        boundary = month_start(today, -self.retention_months)
+        async with engine.connect() as connection:
+            partitions = [partition for partition in await self._partitions(connection) if partition.month < boundary]
+        archived = []
+        for partition in sorted(partitions, key=lambda partition: partition.month):
+            try:
+                if not partition.detach_pending:
+                    async with engine.connect() as connection:
+                        references = await self._find_references(connection, partition.name)
+                    if references:
+                        self._blocked.inc(table=self.table.name)
+                        logger.warning(
+                            f"Секция {partition.name} не архивирована, на ее строки ссылаются: {', '.join(references)}"
+                        )
+                        continue
+                await self._archive(engine, partition)
+            except SQLAlchemyError as e:
+                self._failures.inc(table=self.table.name, action="archive")
+                logger.error(f"Не удалось архивировать секцию {partition.name}", exc_info=e)
+                continue
+            self._archived.inc(table=self.table.name)
+            archived.append(partition.name)
+            logger.info(f"Секция {partition.name} перенесена в схему {self.archive_schema}")
+        return archived
+
+    async def _partitions(self, connection: AsyncConnection) -> list[Partition]:
+        """Месячные секции таблицы."""
+        result = await connection.execute(
+            text(
+                '''
+                SELECT c.relname, i.inhdetachpending
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = CAST(:table AS regclass)
+                '''
+            ),
+            {"table": self.table.name},
+        )
+        partitions = []
+        for name, detach_pending in result:
+            match = PARTITION_NAME_REGEX.match(name)
+            if match is None or match["table"] != self.table.name or match["year"] is None:
+                continue
+            month = datetime.datetime(int(match["year"]), int(match["month"]), 1, tzinfo=datetime.timezone.utc)
+            partitions.append(Partition(name, month, detach_pending))
+        return partitions
+
+    async def _create(self, connection: AsyncConnection, name: str, month: datetime.datetime) -> None:
+        """Создает секцию месяца и присоединяет ее к таблице."""
+        quote = connection.dialect.identifier_preparer.quote
+        await connection.exec_driver_sql(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        await connection.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {quote(name)} "
+            f"(LIKE {quote(self.table.name)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        await connection.exec_driver_sql(
+            f"ALTER TABLE {quote(self.table.name)} ATTACH PARTITION {quote(name)} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_start(month, 1).isoformat()}')"
+        )
+
+    async def _archive(self, engine: AsyncEngine, partition: Partition) -> None:
+        """Отсоединяет секцию и переносит ее в архивную схему.
+
+        Если на строки секции появились ссылки после проверки, база не даст ее отсоединить. Прерванное
+        отсоединение оставляет секцию в состоянии ожидания, при следующем обслуживании оно завершается
+        через DETACH PARTITION ... FINALIZE.
+        """
+        quote = engine.dialect.identifier_preparer.quote
+        table, name, schema = quote(self.table.name), quote(partition.name), quote(self.archive_schema)
+        # DETACH PARTITION CONCURRENTLY не выполняется внутри транзакции.
+        async with engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            if partition.detach_pending:
+                await connection.exec_driver_sql(f"ALTER TABLE {table} DETACH PARTITION {name} FINALIZE")
+            else:
+                await connection.exec_driver_sql(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY")
+        async with engine.begin() as connection:
+            result = await connection.execute(
+                text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:name AS regclass) AND contype = 'f'"),
+                {"name": partition.name},
+            )
+            for (constraint,) in result.all():
+                await connection.exec_driver_sql(f"ALTER TABLE {name} DROP CONSTRAINT {quote(constraint)}")
+            await connection.exec_driver_sql(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+            await connection.exec_driver_sql(f"ALTER TABLE {name} SET SCHEMA {schema}")
+
+    def _reference_queries(self, partition_name: str) -> dict[str, str]:
+        """Запросы, проверяющие есть ли ссылки на строки секции, по внешним ключам на таблицу."""
+        queries = {}
+        for referring_table in sorted(self.table.metadata.tables.values(), key=lambda table: table.name):
+            for foreign_key in referring_table.foreign_key_constraints:
+                if foreign_key.referred_table is not self.table:
+                    continue
+                condition = " AND ".join(
+                    f"r.{element.parent.name} = p.{element.column.name}" for element in foreign_key.elements
+                )
+                reference = f"{referring_table.name}({', '.join(foreign_key.column_keys)})"
+                queries[reference] = (
+                    f"SELECT EXISTS (SELECT 1 FROM {referring_table.name} r JOIN {partition_name} p ON {condition})"
+                )
+        return queries
+
+    async def _find_references(self, connection: AsyncConnection, partition_name: str) -> list[str]:
+        """Внешние ключи, по которым есть ссылки на строки секции."""
+        references = []
+        for reference, query in self._reference_queries(partition_name).items():
+            if await connection.scalar(text(query)):
+                references.append(reference)
+        return references
+
+    async def _periodic_maintain(self) -> None:
+        """Обслуживание секций при запуске и затем каждые interval секунд."""
+        while True:
+            try:
+                await self.maintain(db_helper.engine)
+            except Exception as e:
+                logger.error(f"Ошибка обслуживания секций {self.table.name}", exc_info=e)
+            await asyncio.sleep(self.interval)
+
+
+messages_partitions = MonthlyPartitions(
+    table=Message.__table__,
+    ahead=settings.messages.partitions_ahead,
+    retention_months=settings.messages.retention_months,
+    archive_schema=settings.messages.archive_schema,
+    interval=settings.messages.maintenance_interval,
+)
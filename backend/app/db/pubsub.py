@@ -0,0 +1,167 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.asyncio.connection import Connection
+from redis.exceptions import RedisError
+
+from app.logger import logger
+
+
+class RedisPubSubListener:
+    """Одна подписка Redis pub/sub на воркер, раздающая сообщения обработчикам по каналам.
+
+    Сообщения, опубликованные пока подписка была разорвана, теряются. Поэтому после каждого подключения
+    вызываются on_connect обработчики, чтобы подписчики могли заново синхронизировать свое состояние,
+    а при разрыве вызываются on_disconnect обработчики.
+    """
+
+    def __init__(self, redis: Redis, reconnect_delay: float = 1) -> None:
+        """Настройки подписки."""
+        self.redis: Redis = redis
+        self.reconnect_delay: float = reconnect_delay
+        self._handlers: dict[str, list[Callable[[Any], None]]] = {}
+        self._connection_setups: list[Callable[[Connection], Awaitable[None]]] = []
+        self._on_connect: list[Callable[[], Awaitable[None]]] = []
+        self._on_disconnect: list[Callable[[], None]] = []
+        self._connected: bool = False
+        self._connected_event: asyncio.Event = asyncio.Event()
+        self._running: bool = False
+        self._task: asyncio.Task | None = None
+
+    @property
+    def connected(self) -> bool:
+        """Подписка активна."""
+        return self._connected
+
+    async def wait_connected(self) -> None:
+        """Дожидается активной подписки."""
+        await self._connected_event.wait()
+
+    def subscribe(
+        self,
+        channel: str,
+        handler: Callable[[Any], None],
+        on_connect: Callable[[], Awaitable[None]] | None = None,
+        on_disconnect: Callable[[], None] | None = None,
+    ) -> None:
+        """Регистрирует обработчик сообщений канала. Должен вызываться до start."""
+        self._handlers.setdefault(channel, []).append(handler)
+        if on_connect is not None:
+            self._on_connect.append(on_connect)
+        if on_disconnect is not None:
+            self._on_disconnect.append(on_disconnect)
+
+    def add_connection_setup(self, setup: Callable[[Connection], Awaitable[None]]) -> None:
+        """Регистрирует настройку соединения подписки, которая выполняется перед подпиской на каналы.
+
+        Должна вызываться до start. Настройка выполняется заново при каждом переподключении.
+        """
+        self._connection_setups.append(setup)
+
+    async def start(self) -> None:
+        """Запускает подписку в фоне."""
+        if self._task is None and self._handlers:
+            self._running = True
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Останавливает подписку."""
+        # Флаг завершает цикл, даже если отмена была поглощена внутри get_message.
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._set_disconnected()
+
+    def _set_disconnected(self) -> None:
+        """Оповещает подписчиков о разрыве подписки.
+
+        Вызывается и при ошибке во время подключения, потому что часть on_connect обработчиков
+        к этому моменту уже могла отработать.
+        """
+        self._connected = False
+        self._connected_event.clear()
+        for callback in self._on_disconnect:
+            callback()
+
+    async def _listen(self) -> None:
+        """Цикл подписки с переподключением."""
+        while self._running:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                if self._connection_setups:
+                    await pubsub.connect()
+                    for setup in self._connection_setups:
+                        await setup(pubsub.connection)
+                await pubsub.subscribe(*self._handlers)
+                # Состояние синхронизируется уже после подписки, чтобы не потерять сообщения между ними.
+                for callback in self._on_connect:
+                    await callback()
+                self._connected = True
+                self._connected_event.set()
+                while self._running:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is None or message["type"] != "message":
+                        continue
+                    for handler in self._handlers.get(message["channel"], ()):
+                        try:
+                            handler(message["data"])
+                        except Exception as e:
+                            logger.error(f"Ошибка обработки сообщения из канала {message['channel']}", exc_info=e)
+            except RedisError as e:
+                self._set_disconnected()
+                logger.error("Потеряна подписка Redis pub/sub, переподключение", exc_info=e)
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                await pubsub.aclose()
+
+
+class PubSubSyncedState:
+    """Локальное состояние воркера, которое поддерживается в актуальном виде сообщениями pub/sub.
+
+    Сообщения, опубликованные пока подписка была разорвана, теряются. Поэтому при подключении состояние
+    синхронизируется заново через _resync, а при разрыве сбрасывается через _reset и не используется, пока
+    synced ложно. Счетчик _invalidations увеличивается при каждом изменении: значение, прочитанное из Redis,
+    запоминается только если за время чтения счетчик не изменился, иначе в состояние могло бы попасть уже
+    устаревшее значение.
+    """
+
+    _synced: bool = False
+    _invalidations: int = 0
+
+    @property
+    def synced(self) -> bool:
+        """Состояние синхронизировано и получает обновления."""
+        return self._synced
+
+    def subscribe(self, listener: RedisPubSubListener, channel: str, handler: Callable[[Any], None]) -> None:
+        """Подписывает обработчик на канал и синхронизирует состояние с подпиской."""
+        listener.subscribe(channel, handler, on_connect=self._on_connect, on_disconnect=self._on_disconnect)
+
+    def _can_remember(self, invalidations: int) -> bool:
+        """Можно ли запомнить значение, прочитанное при заданном значении счетчика изменений."""
+        return self._synced and invalidations == self._invalidations
+
+    def _reset(self) -> None:
+        """Сбрасывает локальное состояние."""
+
+    async def _resync(self) -> None:
+        """Синхронизирует состояние после подключения подписки. По умолчанию начинает с чистого листа."""
+        self._reset()
+
+    async def _on_connect(self) -> None:
+        """Изменения за время разрыва подписки неизвестны, поэтому состояние синхронизируется заново."""
+        self._invalidations += 1
+        await self._resync()
+        self._synced = True
+
+    def _on_disconnect(self) -> None:
+        """Без подписки изменения не будут замечены, поэтому состояние сбрасывается и не используется."""
+        self._synced = False
+        self._invalidations += 1
+        self._reset()
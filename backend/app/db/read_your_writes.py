@@ -0,0 +1,59 @@
+from uuid import UUID
+
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.db.redis import redis_breaker, redis_client
+from app.db.redis_cluster import RedisClient
+from app.logger import logger
+from app.metrics import metrics
+
+
+class ReadYourWrites:
+    """Отметки о недавних записях пользователей в базу.
+
+    Реплики отстают от основной базы, поэтому пользователь, который только что изменил данные, мог бы не увидеть
+    свои изменения при чтении с реплики. После записи пользователя в Redis на window секунд ставится отметка,
+    и пока она есть, его чтения идут в основную базу. Отметка общая для всех воркеров, а если Redis недоступен,
+    чтения тоже идут в основную базу.
+    """
+
+    def __init__(self, redis: RedisClient, prefix: str, window: float) -> None:
+        """Настройки отметок."""
+        self.redis: RedisClient = redis
+        self.prefix: str = prefix
+        self.window: float = window
+        self._checks = metrics.counter("read_your_writes_checks_total", "Проверки отметок о записи по результату")
+
+    def _key(self, user_id: UUID | str) -> str:
+        """Ключ отметки пользователя."""
+        return f"{self.prefix}:{user_id}"
+
+    async def mark(self, user_id: UUID | str) -> None:
+        """Отмечает запись пользователя."""
+        if self.window <= 0:
+            return
+        try:
+            await redis_breaker.call(lambda: self.redis.set(self._key(user_id), 1, px=int(self.window * 1000)))
+        except RedisError as e:
+            logger.warning(f"Не удалось отметить запись пользователя {user_id}: {e}")
+
+    async def is_recent(self, user_id: UUID | str) -> bool:
+        """Была ли у пользователя запись за последние window секунд."""
+        if self.window <= 0:
+            return False
+        try:
+            recent = bool(await redis_breaker.call(lambda: self.redis.exists(self._key(user_id))))
+        except RedisError:
+            recent = True
+            self._checks.inc(result="unavailable")
+        else:
+            self._checks.inc(result="recent" if recent else "none")
+        return recent
+
+
+read_your_writes = ReadYourWrites(
+    redis=redis_client,
+    prefix=settings.redis.read_your_writes_prefix,
+    window=settings.db.read_your_writes_window,
+)
@@ -1,47 +1,497 @@
+import functools
 import uuid
-from typing import Any, Type
+from typing import Any, Iterable, NamedTuple, Sequence, Type
 
 import orjson
 from pydantic import BaseModel
 from redis.asyncio import Redis
+from redis.asyncio.connection import Connection
+from redis.exceptions import RedisError
 
 from app.config import settings
+from app.db.cache_codec import (
+    CODECS,
+    HASH_VERSION_FIELD,
+    decode_fields,
+    decode_partial,
+    encode_fields,
+    get_hash_version,
+)
+from app.db.cache_generations import CacheGenerations
+from app.db.local_cache import LocalCache
+from app.db.pubsub import RedisPubSubListener
+from app.db.redis_cluster import call_script_in_pipeline, create_client, execute_and_publish, hash_tag, mget, pipeline
+from app.logger import logger
+from app.metrics import metrics
+from app.metrics.lookups import count_lookup
+from app.utils.circuit_breaker import CircuitBreaker
 
-redis_client = Redis(host=settings.redis.host, port=settings.redis.port, decode_responses=True)
+redis_client = create_client(decode_responses=True)
+# Клиент для значений кеша, которые хранятся в бинарном виде и не декодируются в строки.
+redis_cache_client = create_client(decode_responses=False)
+
+cache_codec = CODECS[settings.redis.cache_codec]
+
+# Клиент кластера не поддерживает pub/sub, но PUBLISH в кластере доходит до подписчиков на любом узле,
+# поэтому подписка идет через отдельное соединение с узлом из настроек.
+pubsub_listener = RedisPubSubListener(
+    redis_client
+    if isinstance(redis_client, Redis)
+    else Redis(
+        host=settings.redis.host,
+        port=settings.redis.port,
+        decode_responses=True,
+        socket_connect_timeout=settings.redis.socket_connect_timeout,
+        socket_timeout=settings.redis.socket_timeout,
+    )
+)
+
+
+class CacheUnavailableError(RedisError):
+    """Кеш недоступен: выключатель разомкнут или Redis не ответил вовремя."""
+
+
+# Выключатель обращений к кешу. Пока он разомкнут, чтения кеша сразу завершаются CacheUnavailableError,
+# а значения загружаются из базы в обход кеша.
+redis_breaker = CircuitBreaker(
+    name="redis",
+    failure_threshold=settings.redis.breaker_failure_threshold,
+    reset_timeout=settings.redis.breaker_reset_timeout,
+    timeout=settings.redis.breaker_timeout,
+    slow_call_threshold=settings.redis.breaker_slow_call_threshold,
+    exceptions=(RedisError,),
+    error=CacheUnavailableError,
+)
+
+# Канал, в который Redis присылает инвалидации отслеживаемых ключей.
+TRACKING_CHANNEL = "__redis__:invalidate"
+
+local_cache = LocalCache(settings.redis.local_cache, max_bytes=settings.redis.local_cache_max_bytes)
+
+
+async def _enable_tracking(connection: Connection) -> None:
+    """Включает отслеживание ключей с префиксами локального кеша на соединении подписки.
+
+    Инвалидации приходят на это же соединение (REDIRECT на себя) в режиме BCAST, то есть об изменении
+    любого ключа с префиксом, кем бы он ни был прочитан. Поэтому они не зависят от соединений пула,
+    а при разрыве подписки пропадают вместе с ней, и локальный кеш отключается до переподключения.
+    """
+    await connection.send_command("CLIENT", "ID")
+    client_id = await connection.read_response()
+    prefixes = [item for prefix in local_cache.limits for item in ("PREFIX", f"{prefix}:")]
+    await connection.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", *prefixes)
+    await connection.read_response()
+
+
+if local_cache.limits:
+    if settings.redis.client_tracking:
+        pubsub_listener.add_connection_setup(_enable_tracking)
+        invalidation_channel, invalidation_handler = TRACKING_CHANNEL, local_cache.invalidate_keys
+    else:
+        invalidation_channel, invalidation_handler = settings.redis.local_cache_channel, local_cache.invalidate
+    local_cache.subscribe(pubsub_listener, invalidation_channel, invalidation_handler)
+
+cache_generations = CacheGenerations(
+    redis=redis_client,
+    listener=pubsub_listener,
+    # Поколения всех префиксов читаются одним MGET, поэтому их ключи хранятся в одном слоте кластера.
+    key_prefix=hash_tag(settings.redis.cache_generation_prefix),
+    channel=settings.redis.cache_generation_channel,
+    on_change=local_cache.clear_prefix,
+    breaker=redis_breaker,
+)
+
+# Записывает поля в hash, только если он уже есть в кеше, иначе в кеше остался бы объект без части полей.
+UPDATE_FIELDS_SCRIPT = '''
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], unpack(ARGV))
+end
+return 0
+'''
+_update_fields_script = redis_cache_client.register_script(UPDATE_FIELDS_SCRIPT)
+
+# Значение, которое хранится в кеше вместо отсутствующей в базе записи. Для объектов в hash
+# оно хранится в поле версии схемы.
+MISSING_MARKER = b"\x00"
+_MISSING_HASH = {HASH_VERSION_FIELD: MISSING_MARKER}
+
+# Значение ключа: строка или поля hash.
+CacheValue = bytes | dict[bytes, bytes]
+
+# Операция записи в кеш: команда, префикс, ключ, значение, время жизни.
+CacheOperation = tuple[str, str, Any, bytes | dict[str, bytes] | None, int | None]
+
+# Ключи, запись которых в кеш не удалась: префикс -> ключи. Они удаляются из кеша при следующей записи,
+# чтобы после восстановления Redis в нем не остались значения, устаревшие за время сбоя.
+_unsynced_keys: dict[str, set[Any]] = {}
+# Префиксы, у которых не удалось записать больше MAX_UNSYNCED_KEYS ключей, сбрасываются целиком.
+_unsynced_prefixes: set[str] = set()
+MAX_UNSYNCED_KEYS = 10000
+_write_failures = metrics.counter("cache_write_failures_total", "Записи в кеш, не выполненные из-за ошибки Redis")
+
+
+class CachedObject(NamedTuple):
+    """Результат чтения объекта из кеша."""
+
+    # Ключ найден в кеше, в том числе как отметка об отсутствии записи.
+    found: bool
+    value: BaseModel | None
+    # Оставшееся время жизни ключа в Redis в секундах, если оно известно.
+    ttl: float | None
+
+
+def get_negative_ttl(prefix: str) -> int | None:
+    """Время жизни отметки об отсутствии записи. None если для префикса такие отметки не хранятся."""
+    return settings.redis.negative_ttl.get(prefix) or None
+
+
+def stores_fields(prefix: str) -> bool:
+    """Хранятся ли объекты префикса в hash по полям."""
+    return prefix in settings.redis.hash_prefixes
+
+
+def _is_missing(value: CacheValue) -> bool:
+    """Является ли значение отметкой об отсутствии записи."""
+    if isinstance(value, dict):
+        return value.get(HASH_VERSION_FIELD.encode()) == MISSING_MARKER
+    return value == MISSING_MARKER
+
+
+def _read(client: Redis, prefix: str, key: str) -> Any:
+    """Добавляет в pipeline или выполняет чтение ключа с учетом способа хранения объектов префикса."""
+    if stores_fields(prefix):
+        return client.hgetall(key)
+    return client.get(key)
+
+
+def _remember(prefix: str, key: str, value: CacheValue | None, local_generation: int) -> CacheValue | None:
+    """Учитывает значение, прочитанное из Redis, и сохраняет его в локальный кеш.
+
+    Пустой hash означает отсутствующий ключ и заменяется на None.
+    """
+    if not value:
+        value = None
+    local_cache.record_remote(prefix, value is not None)
+    if value is not None:
+        ttl = get_negative_ttl(prefix) if _is_missing(value) else None
+        local_cache.set(prefix, key, value, local_generation, ttl)
+    return value
+
+
+def _make_key(prefix: str, generation: int, id: Any) -> str:
+    """Ключ кеша с номером поколения префикса."""
+    return f"{prefix}:{generation}:{id}"
+
+
+async def _get_values(prefix: str, ids: Sequence[str | uuid.UUID | int]) -> list[CacheValue | None]:
+    """Получение значений из локального кеша, а отсутствующих в нем одним MGET (или pipeline HGETALL) из Redis."""
+    cache_generation = await cache_generations.get(prefix)
+    keys = [_make_key(prefix, cache_generation, id) for id in ids]
+    values = [local_cache.get(prefix, key) for key in keys]
+    missing = [index for index, value in enumerate(values) if value is None]
+    if not missing:
+        return values
+    count_lookup("redis")
+    local_generation = local_cache.generation
+
+    async def fetch() -> list[CacheValue | None]:
+        """Чтение отсутствующих в локальном кеше ключей."""
+        if stores_fields(prefix):
+            async with redis_cache_client.pipeline(transaction=False) as pipe:
+                for index in missing:
+                    pipe.hgetall(keys[index])
+                return await pipe.execute()
+        return await mget(redis_cache_client, [keys[index] for index in missing])
+
+    fetched = await redis_breaker.call(fetch)
+    for index, value in zip(missing, fetched):
+        values[index] = _remember(prefix, keys[index], value, local_generation)
+    return values
+
+
+async def _get_value(prefix: str, id: str | uuid.UUID | int) -> CacheValue | None:
+    """Получение значения из локального кеша, а при его отсутствии из Redis."""
+    key = _make_key(prefix, await cache_generations.get(prefix), id)
+    value = local_cache.get(prefix, key)
+    if value is not None:
+        return value
+    count_lookup("redis")
+    local_generation = local_cache.generation
+    value = await redis_breaker.call(lambda: _read(redis_cache_client, prefix, key))
+    return _remember(prefix, key, value, local_generation)
+
+
+class CacheBatch:
+    """Набор записей в кеш, выполняемых за одно обращение к Redis.
+
+    Операции выполняются атомарно в транзакции MULTI/EXEC вместе с рассылкой инвалидаций локальных кешей,
+    а при включенном client tracking инвалидации рассылает сам Redis. В Redis Cluster транзакций нет: команды
+    выполняются по отдельности, и инвалидации рассылаются после них.
+    Время жизни по умолчанию берется по префиксу, но может быть задано для каждого ключа отдельно.
+    Ключи получают номер поколения префикса при выполнении.
+    """
+
+    def __init__(self) -> None:
+        """Пустой набор операций."""
+        self._operations: list[CacheOperation] = []
+
+    def __len__(self) -> int:
+        return len(self._operations)
+
+    def set_object(self, prefix: str, schema: BaseModel, ttl: int | None = None) -> "CacheBatch":
+        """Добавляет запись объекта."""
+        if stores_fields(prefix):
+            return self._add("hset", prefix, schema.id, encode_fields(schema), ttl)
+        return self._add("set", prefix, schema.id, cache_codec.encode(schema), ttl)
+
+    def update_fields(self, prefix: str, schema: BaseModel, fields: Iterable[str]) -> "CacheBatch":
+        """Добавляет запись измененных полей объекта.
+
+        Для объектов в hash записываются только эти поля и только если объект уже есть в кеше,
+        остальные объекты записываются целиком.
+        """
+        fields = set(fields)
+        if not fields:
+            return self
+        if stores_fields(prefix):
+            return self._add("hupdate", prefix, schema.id, encode_fields(schema, fields), None)
+        return self.set_object(prefix, schema)
+
+    def set_raw_data(self, prefix: str, key: Any, value: Any, ttl: int | None = None) -> "CacheBatch":
+        """Добавляет запись сырых данных."""
+        return self._add("set", prefix, key, orjson.dumps(value), ttl)
+
+    def set_missing(self, prefix: str, key: Any) -> "CacheBatch":
+        """Добавляет отметку об отсутствии записи, если для префикса такие отметки хранятся."""
+        ttl = get_negative_ttl(prefix)
+        if ttl is None:
+            return self
+        if stores_fields(prefix):
+            return self._add("hset", prefix, key, _MISSING_HASH, ttl)
+        return self._add("set", prefix, key, MISSING_MARKER, ttl)
+
+    def delete(self, prefix: str, key: Any) -> "CacheBatch":
+        """Добавляет удаление ключа."""
+        return self._add("delete", prefix, key, None, None)
+
+    def _add(
+        self, command: str, prefix: str, key: Any, value: bytes | dict[str, bytes] | None, ttl: int | None
+    ) -> "CacheBatch":
+        """Добавляет операцию."""
+        self._operations.append((command, prefix, key, value, ttl or get_ttl_by_prefix(prefix)))
+        return self
+
+    async def execute(self) -> None:
+        """Выполняет все операции и очищает набор.
+
+        Ошибка Redis не выбрасывается, потому что изменения, ради которых пишется кеш, уже сохранены в базе.
+        Ключи операций сразу сбрасываются в локальном кеше воркера, а в Redis удаляются при следующей записи.
+        """
+        if not self._operations:
+            return
+        operations, self._operations = self._operations, []
+        # Сначала удаляются ключи, которые не удалось записать раньше.
+        operations = [
+            ("delete", prefix, key, None, None) for prefix, keys in _unsynced_keys.items() for key in keys
+        ] + operations
+        resets = set(_unsynced_prefixes)
+        _unsynced_keys.clear()
+        _unsynced_prefixes.clear()
+        try:
+            for prefix in list(resets):
+                await redis_breaker.call(functools.partial(cache_generations.bump, prefix))
+                resets.discard(prefix)
+            await self._execute(operations)
+        except RedisError as e:
+            _unsynced_prefixes.update(resets)
+            for _, prefix, key, _, _ in operations:
+                _remember_unsynced(prefix, key)
+            for prefix in {prefix for _, prefix, _, _, _ in operations}:
+                local_cache.clear_prefix(prefix)
+            _write_failures.inc()
+            if not isinstance(e, CacheUnavailableError):
+                logger.error("Не удалось записать в кеш, ключи будут удалены при следующей записи", exc_info=e)
+
+    async def _execute(self, operations: list[CacheOperation]) -> None:
+        """Выполняет операции одним обращением к Redis."""
+        generations = await cache_generations.get_many({prefix for _, prefix, _, _, _ in operations})
+        operations = [
+            (command, prefix, _make_key(prefix, generations[prefix], key), value, ttl)
+            for command, prefix, key, value, ttl in operations
+        ]
+        invalidated = [key for _, prefix, key, _, _ in operations if local_cache.enabled(prefix)]
+        published = [] if settings.redis.client_tracking else invalidated
+
+        async def write() -> None:
+            """Запись операций и рассылка инвалидаций локальных кешей."""
+            transaction = len(operations) > 1 or operations[0][0] == "hset"
+            async with pipeline(redis_cache_client, transaction=transaction) as pipe:
+                for command, _, key, value, ttl in operations:
+                    if command == "delete":
+                        pipe.delete(key)
+                    elif command == "set":
+                        pipe.set(key, value, ex=ttl)
+                    elif command == "hset":
+                        pipe.delete(key)
+                        pipe.hset(key, mapping=value)
+                        if ttl:
+                            pipe.expire(key, ttl)
+                    else:
+                        await call_script_in_pipeline(
+                            pipe, _update_fields_script, [key], [item for field in value.items() for item in field]
+                        )
+                await execute_and_publish(
+                    redis_cache_client, pipe, [(settings.redis.local_cache_channel, key) for key in published]
+                )
+
+        await redis_breaker.call(write)
+        for key in invalidated:
+            local_cache.invalidate(key)
+
+
+def _remember_unsynced(prefix: str, key: Any) -> None:
+    """Запоминает ключ, запись которого в кеш не удалась."""
+    if prefix in _unsynced_prefixes:
+        return
+    keys = _unsynced_keys.setdefault(prefix, set())
+    keys.add(key)
+    if len(keys) > MAX_UNSYNCED_KEYS:
+        del _unsynced_keys[prefix]
+        _unsynced_prefixes.add(prefix)
+
+
+def _parse_object(redis_data: CacheValue | None, model: Type[BaseModel]) -> BaseModel | None:
+    """Создает объект из данных кеша.
+
+    Для отсутствующего ключа, отметки об отсутствии записи и данных в другом формате возвращается None.
+    """
+    if redis_data is None or _is_missing(redis_data):
+        return None
+    if isinstance(redis_data, dict):
+        return decode_fields(redis_data, model)
+    return cache_codec.decode(redis_data, model)
 
 
 async def update_object_cache(prefix: str, schema: BaseModel) -> None:
     """Обновляет кеш redis."""
-    await redis_client.set(f"{prefix}:{schema.id}", schema.model_dump_json(), ex=get_ttl_by_prefix(prefix))
+    await CacheBatch().set_object(prefix, schema).execute()
 
 
 async def get_object_from_cache(prefix: str, id: str | uuid.UUID | int, model: Type[BaseModel]) -> BaseModel | None:
     """Получение объекта из кеша Redis."""
-    redis_data = await redis_client.get(f"{prefix}:{id}")
-    if redis_data is None:
-        return None
-    data = orjson.loads(redis_data)
-    if isinstance(data["id"], str) and len(data["id"]) == 36:  # Длина uuid
-        data["id"] = uuid.UUID(data["id"])
-    return model(**data)
+    return _parse_object(await _get_value(prefix, id), model)
+
+
+async def get_object_with_ttl_from_cache(
+    prefix: str, id: str | uuid.UUID | int, model: Type[BaseModel]
+) -> CachedObject:
+    """Получение объекта из кеша вместе с оставшимся временем жизни ключа в Redis.
+
+    Для объекта из локального кеша и для ключа без срока жизни время не известно.
+    """
+    key = _make_key(prefix, await cache_generations.get(prefix), id)
+    value = local_cache.get(prefix, key)
+    ttl = None
+    if value is None:
+        count_lookup("redis")
+        local_generation = local_cache.generation
+
+        async def fetch() -> list[Any]:
+            """Чтение значения вместе с оставшимся временем жизни."""
+            async with redis_cache_client.pipeline(transaction=False) as pipe:
+                _read(pipe, prefix, key)
+                pipe.pttl(key)
+                return await pipe.execute()
+
+        value, pttl = await redis_breaker.call(fetch)
+        value = _remember(prefix, key, value, local_generation)
+        if value is None:
+            return CachedObject(found=False, value=None, ttl=None)
+        ttl = pttl / 1000 if pttl > 0 else None
+    if _is_missing(value):
+        return CachedObject(found=True, value=None, ttl=ttl)
+    obj = _parse_object(value, model)
+    return CachedObject(found=obj is not None, value=obj, ttl=ttl)
+
+
+async def get_object_fields_from_cache(
+    prefix: str, id: str | uuid.UUID | int, model: Type[BaseModel], schema: Type[BaseModel]
+) -> CachedObject:
+    """Получение части полей объекта, которые хранятся в hash. Набор полей и их проверка берутся из модели.
+
+    schema - модель, которой объекты префикса записываются в кеш целиком. Hash, записанный для другой версии
+    ее схемы, считается промахом: поля в нем могли поменять тип или смысл. Для префиксов, объекты которых
+    хранятся строкой, всегда возвращается промах без обращения к Redis.
+    """
+    if not stores_fields(prefix):
+        return CachedObject(found=False, value=None, ttl=None)
+    key = _make_key(prefix, await cache_generations.get(prefix), id)
+    fields = list(model.model_fields)
+    cached = local_cache.get(prefix, key)
+    if cached is not None:
+        version = cached.get(HASH_VERSION_FIELD.encode())
+        values = {field: cached.get(field.encode()) for field in fields}
+    else:
+        count_lookup("redis")
+        version, *fetched = await redis_breaker.call(
+            lambda: redis_cache_client.hmget(key, [HASH_VERSION_FIELD, *fields])
+        )
+        local_cache.record_remote(prefix, version is not None)
+        values = dict(zip(fields, fetched))
+    if version == MISSING_MARKER:
+        return CachedObject(found=True, value=None, ttl=None)
+    if version != get_hash_version(schema):
+        return CachedObject(found=False, value=None, ttl=None)
+    obj = decode_partial(values, model)
+    return CachedObject(found=obj is not None, value=obj, ttl=None)
+
+
+async def get_many_objects_from_cache(
+    prefix: str, ids: Sequence[str | uuid.UUID | int], model: Type[BaseModel]
+) -> list[BaseModel | None]:
+    """Получение объектов из кеша Redis за одно обращение. Для отсутствующих объектов возвращается None."""
+    return [_parse_object(redis_data, model) for redis_data in await _get_values(prefix, ids)]
+
+
+async def update_object_fields_cache(prefix: str, schema: BaseModel, fields: Iterable[str]) -> None:
+    """Обновляет в кеше измененные поля объекта."""
+    await CacheBatch().update_fields(prefix, schema, fields).execute()
 
 
 async def get_raw_data_from_cache(prefix: str, id: str | uuid.UUID | int) -> Any:
     """Получение сырых данных из кеша Redis."""
-    redis_data = await redis_client.get(f"{prefix}:{id}")
-    if redis_data is None:
+    redis_data = await _get_value(prefix, id)
+    if redis_data is None or redis_data == MISSING_MARKER:
         return None
     return orjson.loads(redis_data)
 
 
+async def get_many_raw_data_from_cache(prefix: str, ids: Sequence[str | uuid.UUID | int]) -> list[Any]:
+    """Получение сырых данных из кеша Redis за одно обращение. Для отсутствующих ключей возвращается None."""
+    return [
+        orjson.loads(redis_data) if redis_data is not None and redis_data != MISSING_MARKER else None
+        for redis_data in await _get_values(prefix, ids)
+    ]
+
+
 async def update_raw_data_cache(prefix: str, key: Any, value: Any) -> None:
     """Записывает сырые данные по ключу с префиксом."""
-    await redis_client.set(f"{prefix}:{key}", orjson.dumps(value), ex=get_ttl_by_prefix(prefix))
+    await CacheBatch().set_raw_data(prefix, key, value).execute()
+
+
+async def set_missing_in_cache(prefix: str, key: Any) -> None:
+    """Запоминает в кеше, что записи с таким ключом нет в базе."""
+    await CacheBatch().set_missing(prefix, key).execute()
 
 
 async def delete_from_cache(prefix: str, key: Any) -> None:
     """Удаляет значение из кеша Redis."""
-    await redis_client.delete(f"{prefix}:{key}")
+    await CacheBatch().delete(prefix, key).execute()
+
+
+async def invalidate_cache_prefix(prefix: str) -> int:
+    """Сбрасывает все ключи префикса во всех воркерах. Возвращает новое поколение префикса."""
+    return await cache_generations.bump(prefix)
 
 
 def get_ttl_by_prefix(prefix: str) -> int | None:
@@ -0,0 +1,80 @@
+from typing import Any, Sequence
+
+from redis.asyncio import Redis
+from redis.asyncio.cluster import ClusterPipeline, RedisCluster
+from redis.commands.core import AsyncScript
+
+from app.config import settings
+
+# Клиент одиночного Redis или Redis Cluster.
+RedisClient = Redis | RedisCluster
+
+
+def create_client(decode_responses: bool) -> RedisClient:
+    """Клиент Redis из настроек.
+
+    В режиме кластера host и port - адрес любого узла: остальные узлы и распределение слотов клиент узнает сам
+    и перечитывает при их изменении.
+    """
+    timeouts = {
+        "socket_connect_timeout": settings.redis.socket_connect_timeout,
+        "socket_timeout": settings.redis.socket_timeout,
+    }
+    if settings.redis.cluster:
+        return RedisCluster(
+            host=settings.redis.host, port=int(settings.redis.port), decode_responses=decode_responses, **timeouts
+        )
+    return Redis(host=settings.redis.host, port=settings.redis.port, decode_responses=decode_responses, **timeouts)
+
+
+def hash_tag(name: str) -> str:
+    """Имя в фигурных скобках - hash tag Redis Cluster, по которому выбирается слот ключа.
+
+    Ключи с одинаковым тегом хранятся в одном слоте и могут использоваться вместе в одной команде или скрипте.
+    Без кластера имя не меняется, чтобы не менять имена уже существующих ключей.
+    """
+    return f"{{{name}}}" if settings.redis.cluster else name
+
+
+def pipeline(client: RedisClient, transaction: bool = True) -> Any:
+    """Pipeline клиента.
+
+    В кластере транзакции недоступны: команды выполняются без MULTI/EXEC, сгруппированные по узлам,
+    и атомарны только отдельные команды и скрипты.
+    """
+    return client.pipeline(transaction=transaction and not isinstance(client, RedisCluster))
+
+
+async def execute_and_publish(client: RedisClient, pipe: Any, messages: Sequence[tuple[str, Any]]) -> list[Any]:
+    """Выполняет pipeline вместе с публикацией сообщений и возвращает результаты команд pipeline.
+
+    Без кластера сообщения публикуются в том же pipeline и в той же транзакции, если она есть. В кластере
+    pipeline не может содержать PUBLISH, поэтому сообщения публикуются сразу после его выполнения.
+    """
+    if isinstance(client, RedisCluster):
+        results = await pipe.execute()
+        for channel, message in messages:
+            await client.publish(channel, message)
+        return results
+    for channel, message in messages:
+        pipe.publish(channel, message)
+    results = await pipe.execute()
+    return results[: len(results) - len(messages)]
+
+
+async def call_script_in_pipeline(pipe: Any, script: AsyncScript, keys: list[Any], args: list[Any]) -> None:
+    """Добавляет вызов скрипта в pipeline.
+
+    В кластере EVALSHA в pipeline недоступен, поэтому скрипт передается целиком через EVAL.
+    """
+    if isinstance(pipe, ClusterPipeline):
+        pipe.eval(script.script, len(keys), *keys, *args)
+    else:
+        await script(keys=keys, args=args, client=pipe)
+
+
+async def mget(client: RedisClient, keys: list[Any]) -> list[Any]:
+    """Значения нескольких ключей. В кластере ключи из разных слотов читаются отдельным MGET на каждый слот."""
+    if isinstance(client, RedisCluster):
+        return await client.mget_nonatomic(keys)
+    return await client.mget(keys)
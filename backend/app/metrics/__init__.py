@@ -0,0 +1,5 @@
+from app.metrics.registry import Counter, Gauge, Histogram, MetricsRegistry
+
+metrics = MetricsRegistry(namespace="office")
+
+__all__ = ["metrics", "MetricsRegistry", "Counter", "Gauge", "Histogram"]
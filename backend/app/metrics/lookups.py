@@ -0,0 +1,58 @@
+from collections import Counter
+from contextvars import ContextVar
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.metrics.registry import MetricsRegistry
+
+# Источники данных, обращения к которым считаются за время запроса.
+LOOKUP_SOURCES: tuple[str, ...] = ("redis", "db")
+
+# Корзины гистограммы количества обращений за запрос.
+LOOKUP_BUCKETS: tuple[float, ...] = (0, 1, 2, 3, 4, 5, 8, 13, 21)
+
+_request_lookups: ContextVar[Counter | None] = ContextVar("request_lookups", default=None)
+
+
+def count_lookup(source: str, amount: int = 1) -> None:
+    """Учитывает обращение к источнику данных в текущем запросе."""
+    lookups = _request_lookups.get()
+    if lookups is not None:
+        lookups[source] += amount
+
+
+def get_request_lookups() -> Counter:
+    """Обращения к источникам данных в текущем запросе."""
+    lookups = _request_lookups.get()
+    return lookups if lookups is not None else Counter()
+
+
+class RequestLookupsMiddleware:
+    """Считает обращения к Redis и базе данных за время каждого http запроса.
+
+    Счетчик хранится в contextvar, поэтому он доступен в зависимостях и обработчиках запроса.
+    По завершении запроса количество обращений попадает в гистограмму по каждому источнику.
+    """
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry) -> None:
+        """Инициализация middleware."""
+        self.app: ASGIApp = app
+        self._lookups = registry.histogram(
+            "request_lookups", "Обращения к источникам данных за один запрос", buckets=LOOKUP_BUCKETS
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Выполняет запрос со своим счетчиком обращений."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        lookups = Counter()
+        token = _request_lookups.set(lookups)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_lookups.reset(token)
+            # Роутер записывает найденный маршрут в scope, шаблон пути не раздувает количество меток.
+            path = getattr(scope.get("route"), "path", "unmatched")
+            for source in LOOKUP_SOURCES:
+                self._lookups.observe(lookups[source], source=source, path=path)
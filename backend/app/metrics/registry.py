@@ -0,0 +1,182 @@
+from collections import defaultdict
+from typing import Callable
+
+LabelsKey = tuple[tuple[str, str], ...]
+
+# Границы корзин гистограмм по умолчанию в секундах.
+DEFAULT_BUCKETS: tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _labels_key(labels: dict[str, object]) -> LabelsKey:
+    """Ключ для набора меток."""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    """Экранирует значение метки."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelsKey, extra: dict[str, str] | None = None) -> str:
+    """Форматирует метки в формате Prometheus."""
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+class Counter:
+    """Монотонно растущий счетчик."""
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str) -> None:
+        """Инициализация счетчика."""
+        self.name: str = name
+        self.description: str = description
+        self.values: defaultdict[LabelsKey, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        """Увеличивает счетчик."""
+        self.values[_labels_key(labels)] += amount
+
+    def get(self, **labels: object) -> float:
+        """Текущее значение счетчика."""
+        return self.values.get(_labels_key(labels), 0)
+
+    def render(self) -> list[str]:
+        """Строки в формате Prometheus."""
+        return [f"{self.name}{_format_labels(labels)} {value}" for labels, value in self.values.items()]
+
+
+class Gauge:
+    """Значение которое может как расти так и уменьшаться.
+
+    Если задан callback, значение вычисляется в момент сбора метрик.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, callback: Callable[[], float] | None = None) -> None:
+        """Инициализация метрики."""
+        self.name: str = name
+        self.description: str = description
+        self.callback: Callable[[], float] | None = callback
+        self.values: defaultdict[LabelsKey, float] = defaultdict(float)
+
+    def set(self, value: float, **labels: object) -> None:
+        """Устанавливает значение."""
+        self.values[_labels_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        """Увеличивает значение."""
+        self.values[_labels_key(labels)] += amount
+
+    def dec(self, amount: float = 1, **labels: object) -> None:
+        """Уменьшает значение."""
+        self.values[_labels_key(labels)] -= amount
+
+    def get(self, **labels: object) -> float:
+        """Текущее значение."""
+        if self.callback is not None and not labels:
+            return self.callback()
+        return self.values.get(_labels_key(labels), 0)
+
+    def render(self) -> list[str]:
+        """Строки в формате Prometheus."""
+        if self.callback is not None:
+            return [f"{self.name} {self.callback()}"]
+        return [f"{self.name}{_format_labels(labels)} {value}" for labels, value in self.values.items()]
+
+
+class Histogram:
+    """Распределение значений по корзинам."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """Инициализация гистограммы."""
+        self.name: str = name
+        self.description: str = description
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+        self.counts: defaultdict[LabelsKey, list[int]] = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self.sums: defaultdict[LabelsKey, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: object) -> None:
+        """Добавляет наблюдение."""
+        key = _labels_key(labels)
+        counts = self.counts[key]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+        self.sums[key] += value
+
+    def count(self, **labels: object) -> int:
+        """Количество наблюдений."""
+        return sum(self.counts.get(_labels_key(labels), ()))
+
+    def sum(self, **labels: object) -> float:
+        """Сумма наблюдений."""
+        return self.sums.get(_labels_key(labels), 0)
+
+    def render(self) -> list[str]:
+        """Строки в формате Prometheus."""
+        lines = []
+        for labels, counts in self.counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(labels, {'le': str(bound)})} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(labels, {'le': '+Inf'})} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {self.sums[labels]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Реестр метрик воркера."""
+
+    def __init__(self, namespace: str = "") -> None:
+        """Инициализация реестра."""
+        self.namespace: str = namespace
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def _full_name(self, name: str) -> str:
+        """Имя метрики с пространством имен."""
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def counter(self, name: str, description: str) -> Counter:
+        """Возвращает счетчик, создавая его при необходимости."""
+        name = self._full_name(name)
+        if name not in self._metrics:
+            self._metrics[name] = Counter(name, description)
+        return self._metrics[name]
+
+    def gauge(self, name: str, description: str, callback: Callable[[], float] | None = None) -> Gauge:
+        """Возвращает gauge метрику, создавая ее при необходимости."""
+        name = self._full_name(name)
+        if name not in self._metrics:
+            self._metrics[name] = Gauge(name, description, callback)
+        elif callback is not None:
+            self._metrics[name].callback = callback
+        return self._metrics[name]
+
+    def histogram(self, name: str, description: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Возвращает гистограмму, создавая ее при необходимости."""
+        name = self._full_name(name)
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, description, buckets)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
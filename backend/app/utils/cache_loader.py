@@ -0,0 +1,218 @@
+import asyncio
+import functools
+import math
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Hashable, Type, TypeVar
+
+from pydantic import BaseModel
+from redis.exceptions import LockError, RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import redis
+from app.metrics import metrics
+
+T = TypeVar("T")
+M = TypeVar("M", bound=BaseModel)
+
+# Загрузчик значения по сессии и id.
+Loader = Callable[[AsyncSession, Any], Awaitable[M | None]]
+
+# Интервал опроса кеша при ожидании значения, которое загружает другой воркер.
+LOCK_POLL_INTERVAL: float = 0.05
+
+_loads = metrics.counter("cache_loads_total", "Загрузки значений в кеш по причине")
+_coalesced = metrics.counter("cache_loads_coalesced_total", "Запросы, получившие значение из чужой загрузки")
+_lock_waits = metrics.counter("cache_lock_waits_total", "Ожидания значения, загружаемого другим воркером")
+_degraded_loads = metrics.counter("cache_degraded_loads_total", "Загрузки из базы в обход недоступного кеша")
+
+# Пока кеш недоступен, все промахи идут в базу, поэтому число таких загрузок в воркере ограничено.
+_degraded_semaphore = asyncio.Semaphore(settings.redis.degraded_max_concurrency)
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом в один.
+
+    Первый вызов выполняет функцию, остальные ждут его результат. Если первый вызов был отменен,
+    ожидающие выполняют функцию сами.
+    """
+
+    def __init__(self) -> None:
+        """Пустой набор выполняющихся вызовов."""
+        self._flights: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Выполняет функцию или дожидается уже выполняющегося вызова.
+
+        Возвращает результат и признак того, что он получен из чужого вызова.
+        """
+        while (future := self._flights.get(key)) is not None:
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Ошибка передается ожидающим, а если их нет, не должна попадать в лог как не полученная.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._flights[key]
+
+
+def should_refresh_early(ttl: float, delta: float, beta: float) -> bool:
+    """Вероятностное досрочное обновление (XFetch).
+
+    Чем меньше осталось жить ключу и чем дольше загружается значение, тем выше вероятность обновления.
+    """
+    if beta <= 0 or delta <= 0:
+        return False
+    return -delta * beta * math.log(1 - random.random()) >= ttl
+
+
+def cache_aside(
+    prefix: str,
+    model: Type[M],
+    store: Callable[[M], Awaitable[None]] | None = None,
+    lock: bool | None = None,
+    lock_timeout: float | None = None,
+    beta: float | None = None,
+) -> Callable[[Loader[M]], Loader[M]]:
+    """Декоратор загрузчика значения из базы, превращающий его в чтение через кеш.
+
+    Загрузчик принимает сессию и id и возвращает схему для кеша или None. Декорированная функция сначала
+    ищет значение в кеше, а при промахе вызывает загрузчик и записывает результат в кеш функцией store.
+    Одновременные промахи по одному ключу в воркере объединяются в одну загрузку, при включенной блокировке
+    в Redis - и между воркерами. Ключи со сроком жизни с некоторой вероятностью обновляются до его истечения.
+    Если Redis недоступен, значение загружается из базы без кеша, при этом одновременных загрузок в воркере
+    не больше settings.redis.degraded_max_concurrency.
+    """
+
+    def decorator(load: Loader[M]) -> Loader[M]:
+        flights = SingleFlight()
+        # Среднее время загрузки, от него зависит насколько рано обновляются ключи.
+        load_time = 0.0
+
+        async def save(value: M) -> None:
+            """Записывает значение в кеш."""
+            if store is not None:
+                await store(value)
+            else:
+                await redis.update_object_cache(prefix, value)
+
+        async def load_and_save(session: AsyncSession, id: Any) -> M | None:
+            """Загружает значение из базы и записывает его в кеш."""
+            nonlocal load_time
+            started_at = time.perf_counter()
+            value = await load(session, id)
+            elapsed = time.perf_counter() - started_at
+            load_time = elapsed if load_time == 0 else load_time * 0.8 + elapsed * 0.2
+            if value is not None:
+                await save(value)
+            else:
+                await redis.set_missing_in_cache(prefix, id)
+            return value
+
+        async def wait_for_value(id: Any, timeout: float) -> redis.CachedObject:
+            """Ждет пока другой воркер загрузит значение или отметку об его отсутствии в кеш."""
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                cached = await redis.get_object_with_ttl_from_cache(prefix, id, model)
+                if cached.found:
+                    return cached
+            return redis.CachedObject(found=False, value=None, ttl=None)
+
+        async def load_locked(session: AsyncSession, id: Any, stale: M | None) -> M | None:
+            """Загрузка под блокировкой в Redis."""
+            timeout = lock_timeout if lock_timeout is not None else settings.redis.loader_lock_timeout
+            redis_lock = redis.redis_client.lock(f"lock:{prefix}:{id}", timeout=timeout, thread_local=False)
+            if not await redis_lock.acquire(blocking=False, token=uuid.uuid4().hex):
+                if stale is not None:
+                    # Значение уже обновляет другой воркер, пока можно отдать текущее.
+                    _lock_waits.inc(prefix=prefix, result="stale")
+                    return stale
+                cached = await wait_for_value(id, timeout)
+                if cached.found:
+                    _lock_waits.inc(prefix=prefix, result="loaded")
+                    return cached.value
+                _lock_waits.inc(prefix=prefix, result="timeout")
+                return await load_and_save(session, id)
+            try:
+                return await load_and_save(session, id)
+            finally:
+                try:
+                    await redis_lock.release()
+                except LockError:
+                    pass
+
+        async def load_degraded(session: AsyncSession, id: Any) -> M | None:
+            """Загрузка из базы в обход недоступного кеша."""
+
+            async def run() -> M | None:
+                _degraded_loads.inc(prefix=prefix)
+                async with _degraded_semaphore:
+                    return await load(session, id)
+
+            result, shared = await flights.run(id, run)
+            if shared:
+                _coalesced.inc(prefix=prefix)
+            return result
+
+        async def read_through(session: AsyncSession, id: Any) -> M | None:
+            """Чтение через кеш."""
+            found, value, ttl = await redis.get_object_with_ttl_from_cache(prefix, id, model)
+            if found and value is None:
+                # В кеше отметка, что записи нет в базе.
+                return None
+            if value is not None:
+                refresh_beta = beta if beta is not None else settings.redis.early_refresh_beta
+                if ttl is None or id in flights or not should_refresh_early(ttl, load_time, refresh_beta):
+                    return value
+                reason = "early"
+            else:
+                reason = "miss"
+
+            use_lock = lock if lock is not None else settings.redis.loader_lock
+
+            async def run() -> M | None:
+                _loads.inc(prefix=prefix, reason=reason)
+                if use_lock:
+                    return await load_locked(session, id, value)
+                return await load_and_save(session, id)
+
+            result, shared = await flights.run(id, run)
+            if shared:
+                _coalesced.inc(prefix=prefix)
+            return result
+
+        @functools.wraps(load)
+        async def wrapper(session: AsyncSession, id: Any) -> M | None:
+            try:
+                return await read_through(session, id)
+            except RedisError:
+                return await load_degraded(session, id)
+
+        return wrapper
+
+    return decorator
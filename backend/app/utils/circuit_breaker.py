@@ -0,0 +1,127 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from app.logger import logger
+from app.metrics import metrics
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Значения метрики состояния выключателя.
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Автоматический выключатель обращений к внешнему сервису.
+
+    В замкнутом состоянии обращения выполняются с таймаутом, а ошибки, таймауты и медленные обращения
+    считаются подряд. После failure_threshold таких обращений выключатель размыкается, и в течение reset_timeout
+    секунд обращения сразу завершаются ошибкой, не нагружая сервис и не дожидаясь таймаутов. Затем выключатель
+    пропускает одно пробное обращение: при успехе он замыкается, иначе снова размыкается.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        timeout: float,
+        slow_call_threshold: float,
+        exceptions: tuple[type[Exception], ...],
+        error: type[Exception],
+    ) -> None:
+        """Настройки выключателя.
+
+        exceptions - ошибки сервиса, которые учитываются выключателем, остальные пропускаются без учета.
+        error - исключение, которое выбрасывается при разомкнутом выключателе и по таймауту обращения.
+        """
+        self.name: str = name
+        self.failure_threshold: int = failure_threshold
+        self.reset_timeout: float = reset_timeout
+        self.timeout: float = timeout
+        self.slow_call_threshold: float = slow_call_threshold
+        self.exceptions: tuple[type[Exception], ...] = exceptions
+        self.error: type[Exception] = error
+        self._state: str = CLOSED
+        self._failures: int = 0
+        self._opened_at: float = 0.0
+        self._probing: bool = False
+
+        self._state_gauge = metrics.gauge(
+            "circuit_breaker_state", "Состояние выключателя: 0 - замкнут, 1 - пробное обращение, 2 - разомкнут"
+        )
+        self._transitions = metrics.counter("circuit_breaker_transitions_total", "Переходы выключателя по состояниям")
+        self._failures_total = metrics.counter("circuit_breaker_failures_total", "Неудачные обращения по причине")
+        self._rejected = metrics.counter("circuit_breaker_rejected_total", "Обращения, отклоненные выключателем")
+        self._state_gauge.set(_STATE_VALUES[CLOSED], breaker=name)
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние с учетом истекшего времени размыкания."""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    @property
+    def available(self) -> bool:
+        """Пропустит ли выключатель обращение прямо сейчас."""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Выполняет обращение через выключатель."""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probing):
+            self._rejected.inc(breaker=self.name)
+            raise self.error(f"Выключатель {self.name} разомкнут")
+        probe = state == HALF_OPEN
+        if probe:
+            self._probing = True
+            self._set_state(HALF_OPEN)
+        started_at = time.monotonic()
+        try:
+            async with asyncio.timeout(self.timeout):
+                result = await func()
+        except TimeoutError as e:
+            self._record_failure("timeout")
+            raise self.error(f"Обращение через выключатель {self.name} не уложилось в {self.timeout} с") from e
+        except self.exceptions:
+            self._record_failure("error")
+            raise
+        finally:
+            if probe:
+                self._probing = False
+        if time.monotonic() - started_at > self.slow_call_threshold:
+            self._record_failure("slow")
+        else:
+            self._record_success()
+        return result
+
+    def _record_success(self) -> None:
+        """Успешное обращение сбрасывает счетчик и замыкает выключатель."""
+        self._failures = 0
+        if self._state != CLOSED:
+            self._set_state(CLOSED)
+            logger.warning(f"Выключатель {self.name} замкнут, обращения восстановлены")
+
+    def _record_failure(self, reason: str) -> None:
+        """Неудачное обращение размыкает выключатель после failure_threshold неудач подряд или неудачной пробы."""
+        self._failures_total.inc(breaker=self.name, reason=reason)
+        self._failures += 1
+        if self._state != CLOSED or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            if self._state != OPEN:
+                logger.error(f"Выключатель {self.name} разомкнут на {self.reset_timeout} с: {reason}")
+            self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        """Меняет состояние и обновляет метрики."""
+        if state == self._state:
+            return
+        self._state = state
+        self._transitions.inc(breaker=self.name, state=state)
+        self._state_gauge.set(_STATE_VALUES[state], breaker=self.name)
@@ -0,0 +1,166 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.logger import logger
+from app.metrics import metrics
+
+T = TypeVar("T")
+
+
+def hash_password(plain_password: str, rounds: int | None = None) -> str:
+    """Генерация хеша пароля с использованием bcrypt."""
+    salt = bcrypt.gensalt(rounds=rounds or settings.passwords.bcrypt_rounds)
+    return bcrypt.hashpw(plain_password.encode("utf-8"), salt).decode("utf-8")
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля через сравнение хеша."""
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+def get_hash_rounds(hashed_password: str) -> int | None:
+    """Стоимость bcrypt из хеша вида $2b$12$..."""
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def password_needs_rehash(hashed_password: str | None) -> bool:
+    """Нужно ли пересчитать хеш под текущую стоимость bcrypt."""
+    if hashed_password is None:
+        return False
+    return get_hash_rounds(hashed_password) != settings.passwords.bcrypt_rounds
+
+
+def measure_hash_time(rounds: int, samples: int = 5) -> float:
+    """Медианное время хеширования в секундах при заданной стоимости."""
+    timings = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        hash_password("calibration-password", rounds)
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings)
+
+
+def calibrate_rounds(
+    target_time: float, min_rounds: int, max_rounds: int, samples: int = 5
+) -> tuple[int, dict[int, float]]:
+    """Подбирает максимальную стоимость bcrypt, при которой хеширование укладывается в target_time секунд.
+
+    Возвращает выбранную стоимость и замеренное время для каждой проверенной стоимости.
+    """
+    timings: dict[int, float] = {}
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        timings[rounds] = measure_hash_time(rounds, samples)
+        if timings[rounds] > target_time:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
+class PasswordHasher:
+    """Выполняет bcrypt в отдельном пуле потоков, не блокируя event loop.
+
+    Одновременно выполняется не больше max_workers операций, еще max_queue_size ждут в очереди.
+    Остальные запросы сразу получают 503.
+    """
+
+    def __init__(self, max_workers: int, max_queue_size: int) -> None:
+        """Настройки пула."""
+        self.max_workers: int = max_workers
+        self.max_queue_size: int = max_queue_size
+        self._executor: ThreadPoolExecutor | None = None
+        self._in_flight: int = 0
+
+        self._operations = metrics.counter("password_hash_operations_total", "Операции bcrypt по результату")
+        self._wait_time = metrics.histogram(
+            "password_hash_queue_wait_seconds", "Время ожидания свободного потока bcrypt"
+        )
+        self._duration = metrics.histogram("password_hash_duration_seconds", "Время выполнения операции bcrypt")
+        self._rehashes = metrics.counter("password_rehash_total", "Пересчеты хешей паролей под новую стоимость bcrypt")
+        metrics.gauge("password_hash_in_flight", "Операции bcrypt в работе и в очереди", lambda: self._in_flight)
+
+    @property
+    def in_flight(self) -> int:
+        """Количество операций в работе и в очереди."""
+        return self._in_flight
+
+    def _release(self) -> None:
+        """Освобождает слот после завершения операции."""
+        self._in_flight -= 1
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Пул потоков, создается при первом использовании."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, operation: str, func: Callable[..., T], *args) -> T:
+        """Выполняет функцию в пуле bcrypt с учетом лимита очереди."""
+        if self._in_flight >= self.max_workers + self.max_queue_size:
+            self._operations.inc(operation=operation, result="rejected")
+            logger.warning(f"Очередь bcrypt переполнена, операция {operation} отклонена")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите попытку позже",
+                headers={"Retry-After": "1"},
+            )
+
+        queued_at = time.perf_counter()
+
+        def timed() -> tuple[T, float, float]:
+            """Замер времени ожидания и выполнения внутри потока."""
+            started_at = time.perf_counter()
+            result = func(*args)
+            return result, started_at - queued_at, time.perf_counter() - started_at
+
+        loop = asyncio.get_running_loop()
+        future = self._get_executor().submit(timed)
+        # Слот освобождается когда поток действительно закончил работу, даже если запрос уже отменен.
+        self._in_flight += 1
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        try:
+            result, wait_time, duration = await asyncio.wrap_future(future)
+        except Exception:
+            self._operations.inc(operation=operation, result="error")
+            raise
+        self._operations.inc(operation=operation, result="ok")
+        self._wait_time.observe(wait_time, operation=operation)
+        self._duration.observe(duration, operation=operation)
+        return result
+
+    async def hash(self, plain_password: str) -> str:
+        """Асинхронно считает хеш пароля."""
+        return await self.run("hash", hash_password, plain_password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Асинхронно проверяет пароль."""
+        return await self.run("verify", check_password, plain_password, hashed_password)
+
+    async def rehash(self, plain_password: str, hashed_password: str) -> str:
+        """Асинхронно пересчитывает хеш под текущую стоимость bcrypt."""
+        new_hash = await self.run("rehash", hash_password, plain_password)
+        old_rounds = get_hash_rounds(hashed_password) or 0
+        self._rehashes.inc(direction="up" if settings.passwords.bcrypt_rounds > old_rounds else "down")
+        return new_hash
+
+    def shutdown(self) -> None:
+        """Останавливает пул потоков."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.passwords.hash_workers,
+    max_queue_size=settings.passwords.hash_queue_size,
+)
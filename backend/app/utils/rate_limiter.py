@@ -0,0 +1,124 @@
+import hashlib
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.db.redis import redis_client
+from app.db.redis_cluster import RedisClient, hash_tag
+from app.logger import logger
+from app.metrics import metrics
+
+# Token bucket сразу для нескольких ключей. Токен списывается из всех корзин только если он есть в каждой,
+# иначе возвращается время в секундах до появления токена. Время берется с сервера Redis, чтобы не зависеть
+# от часов воркеров.
+# KEYS - ключи корзин, ARGV - пары (емкость, скорость пополнения в токенах в секунду) для каждого ключа.
+TOKEN_BUCKET_SCRIPT = '''
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local levels = {}
+local wait = 0
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(now - ts, 0) * rate)
+    levels[i] = level
+    if level < 1 then
+        wait = math.max(wait, (1 - level) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', KEYS[i], 'tokens', tostring(levels[i] - 1), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+end
+return '0'
+'''
+
+
+class RateLimiter:
+    """Ограничитель частоты запросов по алгоритму token bucket с хранением состояния в Redis.
+
+    Каждое правило задается как (имя, лимит, период в секундах): корзина вмещает лимит токенов
+    и полностью пополняется за период.
+    """
+
+    def __init__(self, redis: RedisClient, prefix: str, rules: dict[str, tuple[int, float]]) -> None:
+        """Настройки ограничителя."""
+        self.redis: RedisClient = redis
+        self.prefix: str = prefix
+        self.rules: dict[str, tuple[int, float]] = rules
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self._hits = metrics.counter("rate_limit_hits_total", "Проверки ограничителя частоты по результату")
+
+    def _key(self, rule: str, value: str) -> str:
+        """Ключ корзины. Значение хешируется, чтобы не хранить email и ip в открытом виде."""
+        digest = hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]
+        return f"{self.prefix}:{rule}:{digest}"
+
+    async def hit(self, **values: str) -> float:
+        """Списывает токен из корзин всех переданных правил.
+
+        Возвращает 0 если запрос разрешен, иначе количество секунд до появления токена.
+        """
+        keys = []
+        args = []
+        for rule, value in values.items():
+            limit, period = self.rules[rule]
+            keys.append(self._key(rule, value))
+            args.extend((limit, limit / period))
+        return float(await self._script(keys=keys, args=args))
+
+    async def check(self, **values: str) -> None:
+        """Списывает токен и выбрасывает 429 если лимит исчерпан.
+
+        Если Redis недоступен запрос пропускается, чтобы ограничитель не блокировал вход.
+        """
+        try:
+            retry_after = await self.hit(**values)
+        except RedisError as e:
+            self._hits.inc(limiter=self.prefix, result="error")
+            logger.error("Ограничитель частоты недоступен, запрос пропущен", exc_info=e)
+            return
+        if retry_after > 0:
+            self._hits.inc(limiter=self.prefix, result="rejected")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много попыток, повторите позже",
+                headers={"Retry-After": str(max(int(retry_after + 0.999), 1))},
+            )
+        self._hits.inc(limiter=self.prefix, result="allowed")
+
+
+def get_client_ip(request: Request) -> str:
+    """IP адрес клиента с учетом X-Forwarded-For от доверенных прокси.
+
+    Берется запись, дописанная первым доверенным прокси, а не самая левая: ее клиент может подставить сам.
+    Если записей меньше чем прокси, запрос прошел не через все прокси и берется самая левая из записей.
+    """
+    if settings.rate_limit.trust_forwarded_for:
+        # Прокси может добавить свою запись и отдельным заголовком, поэтому учитываются все заголовки по порядку.
+        addresses = ",".join(request.headers.getlist("x-forwarded-for")).split(",")
+        forwarded_for = [address.strip() for address in addresses if address.strip()]
+        if forwarded_for:
+            hops = max(settings.rate_limit.trusted_proxy_hops, 1)
+            return forwarded_for[-min(hops, len(forwarded_for))]
+    return request.client.host if request.client is not None else "unknown"
+
+
+login_rate_limiter = RateLimiter(
+    redis=redis_client,
+    # Корзины всех правил проверяются одним скриптом, поэтому в кластере они хранятся в одном слоте.
+    prefix=hash_tag(settings.rate_limit.login_prefix),
+    rules={
+        "email": (settings.rate_limit.login_email_limit, settings.rate_limit.login_email_period),
+        "ip": (settings.rate_limit.login_ip_limit, settings.rate_limit.login_ip_period),
+    },
+)
@@ -0,0 +1,109 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from app.api.v1.classifiers.crud import warm_up_timezones_cache
+from app.config import settings
+from app.db import db_helper
+from app.db.redis import cache_generations, pubsub_listener, redis_cache_client, redis_client
+from app.logger import logger
+from app.metrics import metrics
+
+
+class Warmup:
+    """Прогрев воркера при запуске.
+
+    Заранее открывает соединения с базой и Redis и загружает горячие данные в кеш, чтобы первые запросы после
+    запуска не платили за это своей задержкой. Прогрев выполняется в фоне, и пока он не завершен, воркер
+    сообщает, что не готов принимать запросы. Ошибка шага прогрева не мешает запуску: шаг пропускается,
+    а его работа выполнится при первом запросе, как без прогрева.
+    """
+
+    def __init__(self) -> None:
+        """Прогрев еще не запущен."""
+        self._task: asyncio.Task | None = None
+        self._ready: bool = False
+        self._durations = metrics.gauge("warmup_step_duration_seconds", "Длительность шагов прогрева воркера")
+        self._failures = metrics.counter("warmup_step_failures_total", "Ошибки шагов прогрева воркера")
+        metrics.gauge("warmup_ready", "Завершен ли прогрев воркера", lambda: int(self._ready))
+
+    @property
+    def ready(self) -> bool:
+        """Готов ли воркер принимать запросы."""
+        return self._ready
+
+    def start(self) -> None:
+        """Запускает прогрев в фоне."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Снимает готовность перед завершением работы и прерывает незавершенный прогрев."""
+        self._ready = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        """Прогрев с ограничением по времени."""
+        started_at = time.perf_counter()
+        try:
+            async with asyncio.timeout(settings.warmup.timeout):
+                await asyncio.gather(self._step("db", self._warm_up_db), self._warm_up_cache())
+        except TimeoutError:
+            logger.warning(f"Прогрев не завершился за {settings.warmup.timeout} с, воркер готов без него")
+        self._ready = True
+        logger.info(f"Воркер прогрет за {time.perf_counter() - started_at:.2f} с")
+
+    async def _step(self, name: str, func: Callable[[], Awaitable[None]]) -> None:
+        """Выполняет шаг прогрева и учитывает его длительность и ошибки."""
+        started_at = time.perf_counter()
+        try:
+            await func()
+        except Exception as e:
+            self._failures.inc(step=name)
+            logger.warning(f"Шаг прогрева {name} не выполнен: {e!r}")
+        finally:
+            self._durations.set(time.perf_counter() - started_at, step=name)
+
+    @staticmethod
+    async def _warm_up_db() -> None:
+        """Соединения с базой."""
+        await db_helper.warm_up(settings.warmup.db_connections)
+
+    async def _warm_up_cache(self) -> None:
+        """Соединения с Redis, затем горячие данные кеша.
+
+        Данные загружаются после подключения pub/sub, без которого не работает локальный кеш воркера.
+        """
+        await self._step("redis", self._warm_up_redis)
+        await self._step("generations", self._warm_up_generations)
+        if settings.warmup.timezones:
+            await self._step("timezones", self._warm_up_timezones)
+
+    @staticmethod
+    async def _warm_up_redis() -> None:
+        """Соединения клиентов Redis и подписка pub/sub."""
+        await asyncio.gather(redis_client.ping(), redis_cache_client.ping())
+        await pubsub_listener.wait_connected()
+
+    @staticmethod
+    async def _warm_up_generations() -> None:
+        """Поколения префиксов кеша."""
+        await cache_generations.get_many(
+            [settings.redis.user_prefix, settings.redis.username_prefix, settings.redis.timezone_prefix]
+        )
+
+    @staticmethod
+    async def _warm_up_timezones() -> None:
+        """Классификатор таймзон."""
+        async with db_helper.read_session(primary=True) as session:
+            count = await warm_up_timezones_cache(session)
+        logger.debug(f"В кеш загружено таймзон: {count}")
+
+
+warmup = Warmup()
@@ -0,0 +1,16 @@
+import sys
+
+from app.db.index_audit import find_missing_indexes
+from app.db.models import Base
+
+if len(sys.argv) > 1:
+    print("Использование: python audit_indexes.py")
+    sys.exit(1)
+
+missing = find_missing_indexes(Base.metadata)
+for table, columns, reason in missing:
+    print(f"{table}({', '.join(columns)}): {reason}")
+if missing:
+    print(f"Колонок без индекса: {len(missing)}")
+    sys.exit(1)
+print("Все внешние ключи и колонки частых выборок покрыты индексами")
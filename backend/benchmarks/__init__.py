@@ -0,0 +1,26 @@
+import time
+from typing import Callable
+
+
+def measure(func: Callable[[], object], duration: float = 2.0, warmup: int = 100) -> float:
+    """Возвращает количество вызовов функции в секунду на одном ядре."""
+    for _ in range(warmup):
+        func()
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + duration
+    while True:
+        for _ in range(100):
+            func()
+        calls += 100
+        now = time.perf_counter()
+        if now >= deadline:
+            return calls / (now - started)
+
+
+def print_results(title: str, results: dict[str, float]) -> None:
+    """Печатает результаты замеров в виде таблицы."""
+    print(title)
+    width = max(len(name) for name in results)
+    for name, ops in results.items():
+        print(f"  {name:<{width}}  {ops:>12,.0f} ops/sec")
@@ -0,0 +1,61 @@
+"""Скорость сериализации и чтения объектов кеша на одном ядре для каждого формата хранения.
+
+Чтение включает разбор данных и создание объекта схемы, то есть все, что происходит после получения значения
+из Redis. Для сравнения замеряется и прежнее чтение: orjson.loads и конструктор схемы с полной валидацией.
+
+Запуск: python -m benchmarks.cache_codecs
+"""
+
+import datetime
+import uuid
+
+import orjson
+from pydantic import BaseModel
+
+from app.api.v1.classifiers.schemas import TimezoneCacheSchema
+from app.api.v1.users.schemas import UserCacheSchema
+from app.db.cache_codec import CODECS, get_decoder
+from benchmarks import measure, print_results
+
+
+def main() -> None:
+    """Запуск замеров."""
+    objects: list[BaseModel] = [
+        UserCacheSchema(
+            id=uuid.uuid4(),
+            email="username@example.com",
+            username="username",
+            display_name="Иван Иванов",
+            phone="+79990000000",
+            image=None,
+            timezone_id=1,
+            scheduled_deletion_date=datetime.datetime.now(datetime.timezone.utc),
+            active=True,
+            is_bot=False,
+        ),
+        TimezoneCacheSchema(id=1, display_name="(UTC+03:00) Москва", iana_name="Europe/Moscow"),
+    ]
+    for obj in objects:
+        model = type(obj)
+        encode_results: dict[str, float] = {}
+        decode_results: dict[str, float] = {}
+        sizes: dict[str, int] = {}
+
+        legacy_data = obj.model_dump_json()
+        decode_results["прежнее чтение"] = measure(lambda: model(**orjson.loads(legacy_data)))
+        for name, codec in CODECS.items():
+            data = codec.encode(obj)
+            assert codec.decode(data, model) == obj
+            sizes[name] = len(data)
+            encode_results[name] = measure(lambda: codec.encode(obj))
+            decode_results[name] = measure(lambda: codec.decode(data, model))
+
+        fast = "без валидации" if get_decoder(model).fast else "с валидацией"
+        print_results(f"{model.__name__}: запись", encode_results)
+        print_results(f"{model.__name__}: чтение (orjson {fast})", decode_results)
+        print("  размер: " + ", ".join(f"{name} {size} байт" for name, size in sizes.items()))
+        print()
+
+
+if __name__ == "__main__":
+    main()
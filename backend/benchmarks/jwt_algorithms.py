@@ -0,0 +1,61 @@
+"""Скорость подписи и проверки JWT на одном ядре для каждого поддерживаемого алгоритма.
+
+Подпись замеряется через _create_token, проверка через decode_token с отключенным кешем проверенных токенов.
+
+Запуск: python -m benchmarks.jwt_algorithms [алгоритм ...]
+"""
+
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.api.v1.auth.jwt import _create_token, decode_token
+from app.api.v1.auth.keys import PRIVATE_KEY_SUFFIX, PUBLIC_KEY_SUFFIX, JWTKeyRing, generate_key_pair
+from app.api.v1.auth.token_cache import VerifiedTokenCache
+from app.config import settings
+from benchmarks import measure, print_results
+
+ALGORITHMS = ["RS256", "PS256", "ES256", "EdDSA"]
+
+
+def main(algorithms: list[str]) -> None:
+    """Запуск замеров."""
+    payload = {
+        "sub": "00000000-0000-0000-0000-000000000000",
+        "token_type": "access",
+        "iat": datetime.now(timezone.utc),
+        "exp": datetime.now(timezone.utc) + settings.jwt.access_token_expires_delta,
+    }
+    no_cache = VerifiedTokenCache(max_size=0, ttl=0)
+    sign_results: dict[str, float] = {}
+    verify_results: dict[str, float] = {}
+    sizes: dict[str, float] = {}
+    for algorithm in algorithms:
+        with tempfile.TemporaryDirectory() as tmp:
+            keys_dir = Path(tmp)
+            private_pem, public_pem = generate_key_pair(algorithm)
+            (keys_dir / f"bench{PRIVATE_KEY_SUFFIX}").write_bytes(private_pem)
+            (keys_dir / f"bench{PUBLIC_KEY_SUFFIX}").write_bytes(public_pem)
+            ring = JWTKeyRing(keys_dir=keys_dir, algorithm=algorithm)
+            ring.load()
+            key = ring.get_signing_key()
+
+            def sign() -> str:
+                """Подпись токена."""
+                return _create_token(payload, key.private_key, key.algorithm, headers={"kid": key.kid})
+
+            token = sign()
+            sign_results[algorithm] = measure(sign)
+            verify_results[algorithm] = measure(lambda: decode_token(token, keys=ring, cache=no_cache))
+            sizes[algorithm] = len(token)
+
+    print_results("Подпись (_create_token)", sign_results)
+    print_results("Проверка (decode_token без кеша)", verify_results)
+    print("Размер access токена")
+    for algorithm, size in sizes.items():
+        print(f"  {algorithm:<6}  {size:>5} байт")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ALGORITHMS)
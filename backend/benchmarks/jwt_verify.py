@@ -0,0 +1,56 @@
+"""Пропускная способность проверки JWT на одном ядре: прежняя реализация, связка ключей и кеш проверенных токенов.
+
+Запуск: python -m benchmarks.jwt_verify
+"""
+
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import jwt
+
+from app.api.v1.auth.jwt import _create_signed_token, decode_token
+from app.api.v1.auth.keys import JWTKeyRing, generate_key_pair
+from app.api.v1.auth.token_cache import VerifiedTokenCache
+from app.config import settings
+from benchmarks import measure, print_results
+
+
+def main() -> None:
+    """Запуск замеров."""
+    with tempfile.TemporaryDirectory() as tmp:
+        keys_dir = Path(tmp)
+        private_pem, public_pem = generate_key_pair("RS256")
+        (keys_dir / "bench.pem").write_bytes(private_pem)
+        (keys_dir / "bench.pub").write_bytes(public_pem)
+        ring = JWTKeyRing(keys_dir=keys_dir, algorithm="RS256")
+        ring.load()
+        no_cache = VerifiedTokenCache(max_size=0, ttl=0)
+        cache = VerifiedTokenCache(max_size=settings.jwt.verified_tokens_cache_size, ttl=60)
+        token = _create_signed_token(
+            {
+                "sub": "00000000-0000-0000-0000-000000000000",
+                "token_type": "access",
+                "iat": datetime.now(timezone.utc),
+                "exp": datetime.now(timezone.utc) + settings.jwt.access_token_expires_delta,
+            },
+            keys=ring,
+        )
+        public_key_path = keys_dir / "bench.pub"
+
+        def legacy_decode() -> None:
+            """Прежняя реализация: чтение и разбор PEM на каждый вызов."""
+            jwt.decode(token, key=public_key_path.read_bytes(), algorithms=["RS256"])
+
+        print_results(
+            "Проверка RS256 access токена",
+            {
+                "до (read_bytes + PEM)": measure(legacy_decode),
+                "после (связка ключей)": measure(lambda: decode_token(token, keys=ring, cache=no_cache)),
+                "после (кеш проверенных токенов)": measure(lambda: decode_token(token, keys=ring, cache=cache)),
+            },
+        )
+
+
+if __name__ == "__main__":
+    main()
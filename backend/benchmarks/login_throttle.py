@@ -0,0 +1,62 @@
+"""Накладные расходы ограничителя попыток входа на один запрос.
+
+Замеряет время вызова Lua скрипта token bucket на Redis из настроек приложения: последовательно (задержка
+одного запроса) и конкурентно (пропускная способность воркера). Лимиты подняты, чтобы все запросы проходили.
+
+Запуск: python -m benchmarks.login_throttle [количество запросов]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from app.db.redis import redis_client
+from app.utils.rate_limiter import RateLimiter
+
+
+async def main(requests: int) -> None:
+    """Запуск замеров."""
+    limiter = RateLimiter(
+        redis=redis_client,
+        prefix="benchmark:rate_limit",
+        rules={"email": (requests * 10, 1), "ip": (requests * 10, 1)},
+    )
+    for i in range(100):
+        await limiter.hit(email=f"warmup{i}@example.com", ip="127.0.0.1")
+
+    timings = []
+    for i in range(requests):
+        started_at = time.perf_counter()
+        await limiter.hit(email=f"user{i % 1000}@example.com", ip=f"10.0.{i % 250}.1")
+        timings.append(time.perf_counter() - started_at)
+    timings.sort()
+
+    started_at = time.perf_counter()
+    await asyncio.gather(
+        *(limiter.hit(email=f"user{i % 1000}@example.com", ip=f"10.0.{i % 250}.1") for i in range(requests))
+    )
+    concurrent_elapsed = time.perf_counter() - started_at
+
+    ping_timings = []
+    for _ in range(requests):
+        started_at = time.perf_counter()
+        await redis_client.ping()
+        ping_timings.append(time.perf_counter() - started_at)
+
+    print(f"Проверка лимита входа (email + ip), {requests} запросов")
+    print(
+        f"  последовательно: среднее {statistics.mean(timings) * 1e6:.0f} мкс, "
+        f"p50 {timings[len(timings) // 2] * 1e6:.0f} мкс, p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f} мкс"
+    )
+    print(f"  для сравнения PING: среднее {statistics.mean(ping_timings) * 1e6:.0f} мкс")
+    print(f"  конкурентно: {requests / concurrent_elapsed:,.0f} проверок/сек")
+
+    keys = [key async for key in redis_client.scan_iter(match="benchmark:rate_limit:*")]
+    if keys:
+        await redis_client.delete(*keys)
+    await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
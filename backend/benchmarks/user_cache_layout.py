@@ -0,0 +1,119 @@
+"""Сравнение хранения пользователя в кеше строкой (формат cache_codec) и в hash по полям.
+
+Замеряет память Redis на один ключ (MEMORY USAGE) и задержку операций на Redis из настроек приложения
+без локального кеша: чтение всего пользователя, чтение полей для авторизации запроса и изменение одного поля.
+
+Запуск: python -m benchmarks.user_cache_layout [количество пользователей]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from app.api.v1.users.schemas import UserCacheSchema, UserIdentitySchema
+from app.db.cache_codec import HASH_VERSION_FIELD, decode_fields, decode_partial, encode_fields
+from app.db.redis import UPDATE_FIELDS_SCRIPT, cache_codec, redis_cache_client
+
+PREFIX = "benchmark:user_cache"
+
+
+async def measure_latency(func: Callable[[int], Awaitable[object]], count: int) -> str:
+    """Средняя задержка и p99 последовательных вызовов."""
+    timings = []
+    for i in range(count):
+        started_at = time.perf_counter()
+        await func(i)
+        timings.append(time.perf_counter() - started_at)
+    timings.sort()
+    return f"среднее {statistics.mean(timings) * 1e6:6.0f} мкс, p99 {timings[int(len(timings) * 0.99)] * 1e6:6.0f} мкс"
+
+
+async def main(count: int) -> None:
+    """Запуск замеров."""
+    users = [
+        UserCacheSchema(
+            id=uuid.uuid4(),
+            email=f"user{i}@example.com",
+            username=f"user{i}",
+            display_name=f"Пользователь {i}",
+            phone="+79990000000",
+            image=None,
+            timezone_id=1,
+            scheduled_deletion_date=None,
+            active=True,
+            is_bot=False,
+        )
+        for i in range(count)
+    ]
+    string_keys = [f"{PREFIX}:string:{user.id}" for user in users]
+    hash_keys = [f"{PREFIX}:hash:{user.id}" for user in users]
+    async with redis_cache_client.pipeline(transaction=False) as pipe:
+        for user, string_key, hash_key in zip(users, string_keys, hash_keys):
+            pipe.set(string_key, cache_codec.encode(user))
+            pipe.hset(hash_key, mapping=encode_fields(user))
+        await pipe.execute()
+
+    memory = {}
+    for layout, keys in (("строка", string_keys), ("hash", hash_keys)):
+        async with redis_cache_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.memory_usage(key)
+            memory[layout] = statistics.mean(await pipe.execute())
+
+    identity_fields = [HASH_VERSION_FIELD, *UserIdentitySchema.model_fields]
+    update_fields = redis_cache_client.register_script(UPDATE_FIELDS_SCRIPT)
+    deletion_date = datetime.now(timezone.utc)
+
+    async def read_string(i: int) -> object:
+        """Чтение пользователя из строки."""
+        return cache_codec.decode(await redis_cache_client.get(string_keys[i]), UserCacheSchema)
+
+    async def read_hash(i: int) -> object:
+        """Чтение пользователя из hash."""
+        return decode_fields(await redis_cache_client.hgetall(hash_keys[i]), UserCacheSchema)
+
+    async def read_identity_string(i: int) -> object:
+        """Чтение полей авторизации из строки."""
+        user = cache_codec.decode(await redis_cache_client.get(string_keys[i]), UserCacheSchema)
+        return UserIdentitySchema.model_validate(user)
+
+    async def read_identity_hash(i: int) -> object:
+        """Чтение полей авторизации из hash."""
+        _, *values = await redis_cache_client.hmget(hash_keys[i], identity_fields)
+        return decode_partial(dict(zip(identity_fields[1:], values)), UserIdentitySchema)
+
+    async def update_string(i: int) -> object:
+        """Изменение поля перезаписью строки."""
+        user = users[i].model_copy(update={"scheduled_deletion_date": deletion_date})
+        return await redis_cache_client.set(string_keys[i], cache_codec.encode(user))
+
+    async def update_hash(i: int) -> object:
+        """Изменение поля в hash."""
+        user = users[i].model_copy(update={"scheduled_deletion_date": deletion_date})
+        mapping = encode_fields(user, ["scheduled_deletion_date"])
+        return await update_fields(keys=[hash_keys[i]], args=[item for field in mapping.items() for item in field])
+
+    operations = {
+        "чтение пользователя, строка": read_string,
+        "чтение пользователя, hash": read_hash,
+        "чтение полей авторизации, строка": read_identity_string,
+        "чтение полей авторизации, hash": read_identity_hash,
+        "изменение одного поля, строка": update_string,
+        "изменение одного поля, hash": update_hash,
+    }
+    width = max(len(name) for name in operations)
+    print(f"Пользователь в кеше, {count} ключей, формат строки: {cache_codec.name}")
+    print(f"  память на ключ: строка {memory['строка']:.0f} байт, hash {memory['hash']:.0f} байт")
+    for name, func in operations.items():
+        print(f"  {name:<{width}}  {await measure_latency(func, count)}")
+
+    await redis_cache_client.delete(*string_keys, *hash_keys)
+    await redis_cache_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
@@ -0,0 +1,24 @@
+import sys
+
+from app.config import settings
+from app.utils.passwords import calibrate_rounds
+
+if len(sys.argv) > 2:
+    print("Использование: python calibrate_bcrypt.py [целевое время в мс]")
+    sys.exit(1)
+
+target_time_ms = int(sys.argv[1]) if len(sys.argv) == 2 else settings.passwords.bcrypt_target_time_ms
+
+rounds, timings = calibrate_rounds(
+    target_time=target_time_ms / 1000,
+    min_rounds=settings.passwords.bcrypt_min_rounds,
+    max_rounds=settings.passwords.bcrypt_max_rounds,
+)
+
+print(f"Время хеширования bcrypt на этом хосте (цель {target_time_ms} мс):")
+for cost, seconds in timings.items():
+    print(f"  cost={cost:<2}  {seconds * 1000:8.1f} мс")
+if timings[rounds] > target_time_ms / 1000:
+    print(f"Даже минимальная стоимость {rounds} не укладывается в целевое время")
+print(f"Текущая стоимость: {settings.passwords.bcrypt_rounds}, рекомендуемая: {rounds}")
+print(f"API_PASSWORDS__BCRYPT_ROUNDS={rounds}")
@@ -0,0 +1,31 @@
+import sys
+from datetime import datetime, timezone
+
+from app.api.v1.auth.keys import PRIVATE_KEY_SUFFIX, PUBLIC_KEY_SUFFIX, generate_key_pair
+from app.config import settings
+
+if len(sys.argv) not in (1, 2, 3):
+    print("Использование: python generate_jwt_keys.py [алгоритм] [kid]")
+    sys.exit(1)
+
+algorithm = sys.argv[1] if len(sys.argv) > 1 else settings.jwt.algorithm
+kid = sys.argv[2] if len(sys.argv) > 2 else f"{algorithm.lower()}-{datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+
+private_key_path = settings.jwt.keys_dir / f"{kid}{PRIVATE_KEY_SUFFIX}"
+public_key_path = settings.jwt.keys_dir / f"{kid}{PUBLIC_KEY_SUFFIX}"
+if private_key_path.exists() or public_key_path.exists():
+    print(f"Ключ {kid} уже существует")
+    sys.exit(1)
+
+try:
+    private_pem, public_pem = generate_key_pair(algorithm)
+except ValueError as e:
+    print(e)
+    sys.exit(1)
+
+settings.jwt.keys_dir.mkdir(parents=True, exist_ok=True)
+public_key_path.write_bytes(public_pem)
+private_key_path.touch(mode=0o600)
+private_key_path.write_bytes(private_pem)
+
+print(f"Создана пара ключей {kid} ({algorithm}) в {settings.jwt.keys_dir}")
@@ -0,0 +1,20 @@
+import asyncio
+import sys
+
+from app.db.redis import invalidate_cache_prefix, redis_cache_client, redis_client
+
+
+async def main(prefixes: list[str]) -> None:
+    """Сброс кеша префиксов."""
+    for prefix in prefixes:
+        generation = await invalidate_cache_prefix(prefix)
+        print(f"Кеш {prefix} сброшен, новое поколение: {generation}")
+    await redis_client.aclose()
+    await redis_cache_client.aclose()
+
+
+if len(sys.argv) < 2:
+    print("Использование: python invalidate_cache.py префикс [префикс ...]")
+    sys.exit(1)
+
+asyncio.run(main(sys.argv[1:]))
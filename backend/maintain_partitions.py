@@ -0,0 +1,22 @@
+import asyncio
+import sys
+
+from app.db import db_helper
+from app.db.partitions import messages_partitions
+from app.db.redis import redis_client
+
+
+async def main() -> None:
+    """Создание будущих и архивирование старых секций таблиц."""
+    created, archived = await messages_partitions.maintain(db_helper.engine)
+    print(f"Создано секций: {len(created)} {' '.join(created)}".rstrip())
+    print(f"Архивировано секций: {len(archived)} {' '.join(archived)}".rstrip())
+    await db_helper.dispose()
+    await redis_client.aclose()
+
+
+if len(sys.argv) > 1:
+    print("Использование: python maintain_partitions.py")
+    sys.exit(1)
+
+asyncio.run(main())
@@ -4,6 +4,7 @@ from logging.config import fileConfig
 from alembic import context
 from alembic.script import ScriptDirectory
 from app.db.models import Base
+from app.db.partitions import is_partition_name
 from sqlalchemy import pool
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
@@ -47,6 +48,11 @@ def process_revision_directives(context, revision, directives):
     migration_script.rev_id = "{0:04}".format(new_rev_id)
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    """Секции таблиц создаются миграциями и app.db.partitions, autogenerate их не сравнивает."""
+    return not (type_ == "table" and reflected and compare_to is None and is_partition_name(name))
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -63,6 +69,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -75,6 +82,7 @@ def do_run_migrations(connection: Connection) -> None:
     context.configure(
         connection=connection,
         target_metadata=target_metadata,
+        include_object=include_object,
         process_revision_directives=process_revision_directives,
     )
 
@@ -0,0 +1,124 @@
+"""add_foreign_key_indexes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 18:40:12.514206
+
+Индексы для внешних ключей и частых выборок, которых не хватало по отчету audit_indexes.py.
+Создаются через CREATE INDEX CONCURRENTLY, чтобы не блокировать запись в таблицы. Такие команды
+не выполняются внутри транзакции, поэтому миграция идет в autocommit_block. Прерванное создание
+оставляет нерабочий (INVALID) индекс, он удаляется при повторном запуске миграции.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Имя индекса, таблица, колонки и условие частичного индекса.
+INDEXES = [
+    ('ix_channels_groups_company_id', 'channels_groups', ['company_id'], None),
+    ('ix_channels_groups_project_id', 'channels_groups', ['project_id'], 'project_id IS NOT NULL'),
+    ('ix_channels_groups_parent_channel_group_id', 'channels_groups', ['parent_channel_group_id'], 'parent_channel_group_id IS NOT NULL'),
+    ('ix_channels_groups_permissions_parent_channel_group_id', 'channels_groups', ['permissions_parent_channel_group_id'], 'permissions_parent_channel_group_id IS NOT NULL'),
+    ('ix_channels_company_id', 'channels', ['company_id'], None),
+    ('ix_channels_channel_group_id', 'channels', ['channel_group_id'], 'channel_group_id IS NOT NULL'),
+    ('ix_channels_project_id', 'channels', ['project_id'], 'project_id IS NOT NULL'),
+    ('ix_channels_permissions_parent_channel_group_id', 'channels', ['permissions_parent_channel_group_id'], None),
+    ('ix_messages_channel_id_created_at', 'messages', ['channel_id', 'created_at'], None),
+    ('ix_messages_thread_id_created_at', 'messages', ['thread_id', 'created_at'], 'thread_id IS NOT NULL'),
+    ('ix_messages_user_id', 'messages', ['user_id'], None),
+    ('ix_messages_quoted_message_id', 'messages', ['quoted_message_id'], None),
+    ('ix_last_read_message_by_user_message_id', 'last_read_message_by_user', ['message_id'], None),
+    ('ix_last_read_message_by_user_channel_id', 'last_read_message_by_user', ['channel_id'], 'channel_id IS NOT NULL'),
+    ('ix_last_read_message_by_user_thread_id', 'last_read_message_by_user', ['thread_id'], 'thread_id IS NOT NULL'),
+    ('ix_threads_channel_id_created_at', 'threads', ['channel_id', 'created_at'], None),
+    ('ix_threads_parent_message_id', 'threads', ['parent_message_id'], None),
+    ('ix_task_types_company_id', 'task_types', ['company_id'], 'company_id IS NOT NULL'),
+    ('ix_task_types_project_id', 'task_types', ['project_id'], 'project_id IS NOT NULL'),
+    ('ix_task_types_icon_id', 'task_types', ['icon_id'], None),
+    ('ix_icons_company_id', 'icons', ['company_id'], 'company_id IS NOT NULL'),
+    ('ix_smiles_company_id', 'smiles', ['company_id'], 'company_id IS NOT NULL'),
+    ('ix_companies_scheduled_deletion_date', 'companies', ['scheduled_deletion_date'], 'scheduled_deletion_date IS NOT NULL'),
+    ('ix_files_groups_company_id', 'files_groups', ['company_id'], None),
+    ('ix_files_groups_icon_id', 'files_groups', ['icon_id'], None),
+    ('ix_files_groups_parent_file_group_id', 'files_groups', ['parent_file_group_id'], 'parent_file_group_id IS NOT NULL'),
+    ('ix_files_groups_permissions_parent_file_group_id', 'files_groups', ['permissions_parent_file_group_id'], 'permissions_parent_file_group_id IS NOT NULL'),
+    ('ix_files_company_id_created_at', 'files', ['company_id', 'created_at'], None),
+    ('ix_files_author_id', 'files', ['author_id'], None),
+    ('ix_files_in_groups_files_group_id_created_at', 'files_in_groups', ['files_group_id', 'created_at'], None),
+    ('ix_task_attachments_file_id', 'task_attachments', ['file_id'], None),
+    ('ix_comment_attachments_file_id', 'comment_attachments', ['file_id'], None),
+    ('ix_message_attachments_file_id', 'message_attachments', ['file_id'], None),
+    ('ix_logs_company_id_created_at', 'logs', ['company_id', 'created_at'], None),
+    ('ix_logs_object_id_context_type_id_created_at', 'logs', ['object_id', 'context_type_id', 'created_at'], None),
+    ('ix_logs_user_id', 'logs', ['user_id'], None),
+    ('ix_company_users_roles_user_id_company_id', 'company_users_roles', ['user_id', 'company_id'], None),
+    ('ix_company_users_roles_role_id', 'company_users_roles', ['role_id'], None),
+    ('ix_subject_permissions_to_object_subject_id_object_id', 'subject_permissions_to_object', ['subject_id', 'object_id'], None),
+    ('ix_subject_permissions_to_object_object_id', 'subject_permissions_to_object', ['object_id'], None),
+    ('ix_projects_company_id', 'projects', ['company_id'], None),
+    ('ix_projects_icon_id', 'projects', ['icon_id'], None),
+    ('ix_sprints_project_id_start_date', 'sprints', ['project_id', 'start_date'], None),
+    ('ix_tasks_sprints_sprint_id_task_id', 'tasks_sprints', ['sprint_id', 'task_id'], None),
+    ('ix_tasks_sprints_task_id', 'tasks_sprints', ['task_id'], None),
+    ('ix_tags_company_id', 'tags', ['company_id'], 'company_id IS NOT NULL'),
+    ('ix_tags_project_id', 'tags', ['project_id'], 'project_id IS NOT NULL'),
+    ('ix_tasks_tags_task_id', 'tasks_tags', ['task_id'], None),
+    ('ix_files_tags_file_id', 'files_tags', ['file_id'], None),
+    ('ix_tasks_column_id', 'tasks', ['column_id'], 'column_id IS NOT NULL'),
+    ('ix_tasks_assignee_id_deadline', 'tasks', ['assignee_id', 'deadline'], None),
+    ('ix_tasks_creator_id', 'tasks', ['creator_id'], None),
+    ('ix_tasks_archived_by_id', 'tasks', ['archived_by_id'], 'archived_by_id IS NOT NULL'),
+    ('ix_tasks_task_type_id', 'tasks', ['task_type_id'], None),
+    ('ix_child_tasks_parent_task_id_child_task_id', 'child_tasks', ['parent_task_id', 'child_task_id'], None),
+    ('ix_child_tasks_child_task_id', 'child_tasks', ['child_task_id'], None),
+    ('ix_task_comments_task_id_created_at', 'task_comments', ['task_id', 'created_at'], None),
+    ('ix_task_comments_user_id', 'task_comments', ['user_id'], None),
+    ('ix_linked_tasks_from_task_id', 'linked_tasks', ['from_task_id'], None),
+    ('ix_linked_tasks_to_task_id', 'linked_tasks', ['to_task_id'], None),
+    ('ix_task_time_spend_task_id', 'task_time_spend', ['task_id'], None),
+    ('ix_users_scheduled_deletion_date', 'users', ['scheduled_deletion_date'], 'scheduled_deletion_date IS NOT NULL'),
+    ('ix_user_company_membership_company_id', 'user_company_membership', ['company_id'], None),
+]
+
+
+def _drop_invalid_index(name: str) -> None:
+    """Удаляет индекс, оставшийся нерабочим после прерванного CREATE INDEX CONCURRENTLY."""
+    if op.get_context().as_sql:
+        return
+    invalid = op.get_bind().execute(
+        sa.text(
+            'SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid '
+            'WHERE pg_class.relname = :name AND NOT pg_index.indisvalid'
+        ),
+        {'name': name},
+    ).scalar()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            _drop_invalid_index(name)
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
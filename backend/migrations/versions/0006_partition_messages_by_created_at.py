@@ -0,0 +1,228 @@
+"""partition_messages_by_created_at
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 19:05:41.208117
+
+Таблица messages разбивается на секции по месяцам created_at (PARTITION BY RANGE). Время создания входит
+в первичный ключ, поэтому ссылки на сообщение из threads, message_attachments, last_read_message_by_user
+и самих messages становятся составными: id и время создания сообщения.
+
+Таблица пересоздается с копированием данных под блокировкой, запросы к сообщениям на время миграции
+останавливаются. Создаются секции messages_initial для данных до первого месяца с сообщениями и месячные
+секции до PARTITIONS_AHEAD месяцев вперед, дальше их создает app.db.partitions. Удаленное сообщение
+(id 1) получает время создания 2000-01-01, которое используется в ссылках на него по умолчанию.
+
+При откате таблица собирается обратно из присоединенных секций, архивные секции остаются в своей схеме.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# app.constants.DELETED_MESSAGE_ID и DELETED_MESSAGE_CREATED_AT.
+DELETED_MESSAGE_ID = 1
+DELETED_MESSAGE_CREATED_AT = "'2000-01-01T00:00:00+00:00'"
+
+# Месячных секций вперед от текущего месяца, как settings.messages.partitions_ahead по умолчанию.
+PARTITIONS_AHEAD = 3
+
+# Таблица, колонка id сообщения, колонка времени создания сообщения, ON DELETE, имя ключа до и после миграции.
+REFERENCES = [
+    ('threads', 'parent_message_id', 'parent_message_created_at', 'SET DEFAULT',
+     'threads_parent_message_id_fkey', 'threads_parent_message_id_parent_message_created_at_fkey'),
+    ('message_attachments', 'message_id', 'message_created_at', 'CASCADE',
+     'message_attachments_message_id_fkey', 'message_attachments_message_id_message_created_at_fkey'),
+    ('last_read_message_by_user', 'message_id', 'message_created_at', 'CASCADE',
+     'last_read_message_by_user_message_id_fkey', 'last_read_message_by_user_message_id_message_created_at_fkey'),
+]
+
+# Ссылки на удаленное сообщение состоят из его id и его времени создания одновременно, см. app.db.models.chats.
+REFERENCE_CHECKS = [
+    ('check_message_quoted_message_reference', 'messages', 'quoted_message_id', 'quoted_message_created_at'),
+    ('check_thread_parent_message_reference', 'threads', 'parent_message_id', 'parent_message_created_at'),
+]
+
+# Индексы messages из 0005 и их колонки после миграции.
+MESSAGES_INDEXES = [
+    ('ix_messages_channel_id_created_at', ['channel_id', 'created_at'], None),
+    ('ix_messages_thread_id_created_at', ['thread_id', 'created_at'], 'thread_id IS NOT NULL'),
+    ('ix_messages_user_id', ['user_id'], None),
+]
+
+
+def _created_at(alias: str) -> str:
+    """Время создания сообщения с учетом времени удаленного сообщения."""
+    return f'CASE WHEN {alias}.id = {DELETED_MESSAGE_ID} THEN {DELETED_MESSAGE_CREATED_AT} ELSE {alias}.created_at END'
+
+
+def _messages_columns() -> list[sa.Column]:
+    """Колонки messages, общие для таблицы до и после миграции."""
+    return [
+        sa.Column('content', sa.String(), nullable=False, comment='Содержимое сообщения'),
+        sa.Column('channel_id', sa.Uuid(), nullable=True, comment='Идентификатор канала'),
+        sa.Column('thread_id', sa.BIGINT(), nullable=True, comment='Идентификатор треда'),
+        sa.Column('user_id', sa.Uuid(), nullable=False, comment='Идентификатор пользователя'),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False, comment='Время создания сообщения'),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=True, comment='Время последнего изменения сообщения'),
+        sa.Column('is_deleted', sa.Boolean(), server_default=sa.text('false'), nullable=False, comment='Сообщение помечено как удаленное'),
+        sa.Column('id', sa.BIGINT(), server_default=sa.text("nextval('messages_id_seq'::regclass)"), nullable=False, comment='Идентификатор'),
+    ]
+
+
+def _create_messages_foreign_keys() -> None:
+    """Внешние ключи messages на другие таблицы, как в 0001."""
+    op.create_foreign_key(None, 'messages', 'channels', ['channel_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('fk_messages_thread_id_threads', 'messages', 'threads', ['thread_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key(None, 'messages', 'users', ['user_id'], ['id'], ondelete='SET DEFAULT')
+
+
+def upgrade() -> None:
+    # Границы месячных секций считаются в UTC.
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+    op.execute('LOCK TABLE messages IN ACCESS EXCLUSIVE MODE')
+    for table, _, _, _, old_constraint, _ in REFERENCES:
+        op.drop_constraint(old_constraint, table, type_='foreignkey')
+    op.drop_index('ix_threads_parent_message_id', table_name='threads')
+    op.drop_index('ix_last_read_message_by_user_message_id', table_name='last_read_message_by_user')
+    op.drop_constraint('uq_message_attachment', 'message_attachments', type_='unique')
+    for name, _, _ in MESSAGES_INDEXES:
+        op.drop_index(name, table_name='messages')
+    op.drop_index('ix_messages_quoted_message_id', table_name='messages')
+    op.rename_table('messages', 'messages_legacy')
+    op.execute('ALTER TABLE messages_legacy RENAME CONSTRAINT messages_pkey TO messages_legacy_pkey')
+
+    op.create_table(
+        'messages',
+        *_messages_columns(),
+        sa.Column('quoted_message_id', sa.BIGINT(), server_default=sa.text(str(DELETED_MESSAGE_ID)), nullable=False, comment='Идентификатор цитируемого сообщения'),
+        sa.Column('quoted_message_created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text(DELETED_MESSAGE_CREATED_AT), nullable=False, comment='Время создания цитируемого сообщения'),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        comment='Модель сообщения.',
+        postgresql_partition_by='RANGE (created_at)',
+    )
+    op.execute('ALTER SEQUENCE messages_id_seq OWNED BY messages.id')
+    op.execute(
+        f'''
+        DO $$
+        DECLARE
+            partition_start timestamptz := date_trunc(
+                'month', coalesce((SELECT min(created_at) FROM messages_legacy WHERE id <> {DELETED_MESSAGE_ID}), now())
+            );
+            last_start timestamptz := date_trunc('month', now()) + interval '{PARTITIONS_AHEAD} months';
+        BEGIN
+            EXECUTE format('CREATE TABLE messages_initial PARTITION OF messages FOR VALUES FROM (MINVALUE) TO (%L)', partition_start);
+            WHILE partition_start <= last_start LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                    'messages_' || to_char(partition_start, 'YYYY_MM'), partition_start, partition_start + interval '1 month'
+                );
+                partition_start := partition_start + interval '1 month';
+            END LOOP;
+        END $$
+        '''
+    )
+    op.execute(
+        f'''
+        INSERT INTO messages (content, channel_id, thread_id, user_id, created_at, updated_at, is_deleted, id,
+                              quoted_message_id, quoted_message_created_at)
+        SELECT m.content, m.channel_id, m.thread_id, m.user_id, {_created_at('m')}, m.updated_at, m.is_deleted, m.id,
+               m.quoted_message_id, coalesce({_created_at('q')}, {DELETED_MESSAGE_CREATED_AT})
+        FROM messages_legacy m LEFT JOIN messages_legacy q ON q.id = m.quoted_message_id
+        '''
+    )
+
+    op.alter_column('threads', 'parent_message_id', existing_type=sa.BIGINT(), server_default=sa.text(str(DELETED_MESSAGE_ID)))
+    for table, id_column, created_at_column, ondelete, _, _ in REFERENCES:
+        if ondelete == 'SET DEFAULT':
+            op.add_column(table, sa.Column(created_at_column, sa.TIMESTAMP(timezone=True), server_default=sa.text(DELETED_MESSAGE_CREATED_AT), nullable=False, comment='Время создания родительского сообщения'))
+        else:
+            op.add_column(table, sa.Column(created_at_column, sa.TIMESTAMP(timezone=True), nullable=True, comment='Время создания сообщения'))
+        op.execute(
+            f'UPDATE {table} r SET {created_at_column} = {_created_at("m")} '
+            f'FROM messages_legacy m WHERE m.id = r.{id_column}'
+        )
+        if ondelete != 'SET DEFAULT':
+            op.alter_column(table, created_at_column, existing_type=sa.TIMESTAMP(timezone=True), nullable=False)
+    op.drop_table('messages_legacy')
+
+    for name, columns, where in MESSAGES_INDEXES:
+        op.create_index(name, 'messages', columns, postgresql_where=sa.text(where) if where else None)
+    op.create_index('ix_messages_quoted_message_id_quoted_message_created_at', 'messages', ['quoted_message_id', 'quoted_message_created_at'])
+    op.create_index('ix_threads_parent_message_id_parent_message_created_at', 'threads', ['parent_message_id', 'parent_message_created_at'])
+    op.create_index('ix_last_read_message_by_user_message_id_message_created_at', 'last_read_message_by_user', ['message_id', 'message_created_at'])
+    op.create_unique_constraint('uq_message_attachment', 'message_attachments', ['message_id', 'message_created_at', 'file_id'])
+
+    for name, table, id_column, created_at_column in REFERENCE_CHECKS:
+        op.create_check_constraint(
+            name, table,
+            f'({id_column} = {DELETED_MESSAGE_ID}) = ({created_at_column} = {DELETED_MESSAGE_CREATED_AT})',
+        )
+
+    _create_messages_foreign_keys()
+    op.create_foreign_key(
+        'messages_quoted_message_id_quoted_message_created_at_fkey', 'messages', 'messages',
+        ['quoted_message_id', 'quoted_message_created_at'], ['id', 'created_at'], ondelete='SET DEFAULT',
+    )
+    for table, id_column, created_at_column, ondelete, _, new_constraint in REFERENCES:
+        op.create_foreign_key(
+            new_constraint, table, 'messages', [id_column, created_at_column], ['id', 'created_at'], ondelete=ondelete
+        )
+
+
+def downgrade() -> None:
+    op.execute('LOCK TABLE messages IN ACCESS EXCLUSIVE MODE')
+    op.drop_constraint('check_thread_parent_message_reference', 'threads', type_='check')
+    for table, _, _, _, _, new_constraint in REFERENCES:
+        op.drop_constraint(new_constraint, table, type_='foreignkey')
+    op.drop_index('ix_threads_parent_message_id_parent_message_created_at', table_name='threads')
+    op.drop_index('ix_last_read_message_by_user_message_id_message_created_at', table_name='last_read_message_by_user')
+    op.drop_constraint('uq_message_attachment', 'message_attachments', type_='unique')
+    for name, _, _ in MESSAGES_INDEXES:
+        op.drop_index(name, table_name='messages')
+    op.drop_index('ix_messages_quoted_message_id_quoted_message_created_at', table_name='messages')
+    op.rename_table('messages', 'messages_partitioned')
+    op.execute('ALTER TABLE messages_partitioned RENAME CONSTRAINT messages_pkey TO messages_partitioned_pkey')
+
+    op.create_table(
+        'messages',
+        *_messages_columns(),
+        sa.Column('quoted_message_id', sa.BIGINT(), nullable=False, comment='Идентификатор цитируемого сообщения'),
+        sa.PrimaryKeyConstraint('id'),
+        comment='Модель сообщения.',
+    )
+    op.execute('ALTER SEQUENCE messages_id_seq OWNED BY messages.id')
+    op.execute(
+        '''
+        INSERT INTO messages (content, channel_id, thread_id, user_id, created_at, updated_at, is_deleted, id,
+                              quoted_message_id)
+        SELECT content, channel_id, thread_id, user_id, created_at, updated_at, is_deleted, id, quoted_message_id
+        FROM messages_partitioned
+        '''
+    )
+    op.drop_table('messages_partitioned')
+
+    for table, _, created_at_column, _, _, _ in REFERENCES:
+        op.drop_column(table, created_at_column)
+    op.alter_column('threads', 'parent_message_id', existing_type=sa.BIGINT(), server_default=None)
+
+    for name, columns, where in MESSAGES_INDEXES:
+        op.create_index(name, 'messages', columns, postgresql_where=sa.text(where) if where else None)
+    op.create_index('ix_messages_quoted_message_id', 'messages', ['quoted_message_id'])
+    op.create_index('ix_threads_parent_message_id', 'threads', ['parent_message_id'])
+    op.create_index('ix_last_read_message_by_user_message_id', 'last_read_message_by_user', ['message_id'])
+    op.create_unique_constraint('uq_message_attachment', 'message_attachments', ['message_id', 'file_id'])
+
+    _create_messages_foreign_keys()
+    op.create_foreign_key(
+        'messages_quoted_message_id_fkey', 'messages', 'messages', ['quoted_message_id'], ['id'], ondelete='SET DEFAULT'
+    )
+    for table, id_column, _, ondelete, old_constraint, _ in REFERENCES:
+        op.create_foreign_key(old_constraint, table, 'messages', [id_column], ['id'], ondelete=ondelete)
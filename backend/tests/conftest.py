@@ -0,0 +1,80 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+# Настройки читаются при импорте app, поэтому окружение задается до первого импорта.
+_TMP_DIR = Path(tempfile.mkdtemp(prefix="office-tests-"))
+for name, value in {
+    "API_DEBUG": "False",
+    "API_DB__POSTGRES_DB": "office",
+    "API_DB__POSTGRES_USER": "office",
+    "API_DB__POSTGRES_PASSWORD": "office",
+    "API_DB__POSTGRES_HOST": "localhost",
+    "API_DB__POSTGRES_PORT": "5432",
+    "API_REDIS__HOST": "localhost",
+    "API_REDIS__PORT": "6379",
+    "API_RABBITMQ__HOST": "localhost",
+    "API_RABBITMQ__PORT": "5672",
+    "API_RABBITMQ__USER": "office",
+    "API_RABBITMQ__PASSWORD": "office",
+    "API_FILES_URLS__MEDIA": "/media",
+    "API_FILES_URLS__USERS_IMAGES_URL": "/users",
+    "API_FILES_URLS__ICONS_URL": "/icons",
+    "API_LOGS__APP_LOG_FILE": str(_TMP_DIR / "app.log"),
+    "API_LOGS__UVICORN_LOG_FILE": str(_TMP_DIR / "uvicorn.log"),
+    "API_JWT__KEYS_DIR": str(_TMP_DIR / "keys"),
+    "API_JWT__PRIVATE_KEY_PATH": str(_TMP_DIR / "private_key"),
+    "API_JWT__PUBLIC_KEY_PATH": str(_TMP_DIR / "public_key.pub"),
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def redis_server() -> FakeServer:
+    """Сервер Redis в памяти, отключить его можно через connected = False."""
+    return FakeServer()
+
+
+@pytest.fixture
+def redis(redis_server: FakeServer) -> FakeRedis:
+    """Клиент Redis в памяти."""
+    return FakeRedis(server=redis_server, decode_responses=True)
+
+
+@pytest.fixture
+def redis_down(redis_server: FakeServer) -> FakeRedis:
+    """Клиент недоступного Redis: любая команда завершается ConnectionError."""
+    redis_server.connected = False
+    return FakeRedis(server=redis_server, decode_responses=True)
+
+
+@pytest.fixture(autouse=True)
+def reset_redis_breaker():
+    """Каждый тест начинается с закрытого предохранителя Redis."""
+    from app.db.redis import redis_breaker
+
+    yield
+    redis_breaker._record_success()
+    redis_breaker._probing = False
+
+
+@pytest.fixture(scope="session")
+def jwt_keys() -> None:
+    """Пара ключей для подписи токенов в каталоге ключей из настроек."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    from app.api.v1.auth.keys import key_ring
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    key_ring.keys_dir.mkdir(parents=True, exist_ok=True)
+    (key_ring.keys_dir / "test.pem").write_bytes(
+        private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+    )
+    key_ring.load()
@@ -0,0 +1,108 @@
+import datetime
+import uuid
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+from pydantic import BaseModel
+
+from app.api.v1.users.schemas import UserCacheSchema, UserIdentitySchema
+from app.config import settings
+from app.db.cache_codec import CODECS, HASH_VERSION_FIELD, CacheCodec, decode_fields, encode_fields, get_decoder
+
+
+def _user() -> UserCacheSchema:
+    return UserCacheSchema(
+        id=uuid.uuid4(),
+        email="user@example.com",
+        username="user",
+        display_name=None,
+        phone="+70000000000",
+        image=None,
+        timezone_id=1,
+        scheduled_deletion_date=datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc),
+        active=True,
+        is_bot=False,
+    )
+
+
+class OtherSchema(BaseModel):
+    """Модель с другой версией схемы."""
+
+    id: uuid.UUID
+
+
+def test_codec_requires_encode_and_decode() -> None:
+    """Формат кеша без encode и decode создать нельзя."""
+
+    class IncompleteCodec(CacheCodec):
+        name = "incomplete"
+
+        def encode(self, schema: BaseModel) -> bytes:
+            return b""
+
+    with pytest.raises(TypeError):
+        IncompleteCodec()
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=CODECS.keys())
+def test_codec_round_trip(codec: CacheCodec) -> None:
+    """Объект, прочитанный из кеша, равен записанному."""
+    user = _user()
+
+    decoded = codec.decode(codec.encode(user), UserCacheSchema)
+
+    assert decoded == user
+    assert isinstance(decoded.id, uuid.UUID)
+    assert isinstance(decoded.scheduled_deletion_date, datetime.datetime)
+
+
+def test_orjson_codec_rejects_other_schema_version() -> None:
+    """Данные другой версии схемы считаются отсутствующими в кеше."""
+    codec = CODECS["orjson"]
+
+    assert codec.decode(codec.encode(_user()), OtherSchema) is None
+    assert codec.decode(b"", UserCacheSchema) is None
+
+
+def test_fields_round_trip() -> None:
+    """Объект, записанный в hash по полям, читается обратно только для своей версии схемы."""
+    user = _user()
+    values = {field.encode(): value for field, value in encode_fields(user).items()}
+
+    assert get_decoder(UserCacheSchema).fast
+    assert decode_fields(values, UserCacheSchema) == user
+    assert decode_fields(values, UserIdentitySchema) is None
+
+
+@pytest.fixture
+def cache_redis(redis_server, monkeypatch: pytest.MonkeyPatch) -> FakeRedis:
+    """Кеш Redis модуля app.db.redis в памяти."""
+    from app.db import redis as redis_module
+
+    client = FakeRedis(server=redis_server, decode_responses=False)
+    monkeypatch.setattr(redis_module, "redis_cache_client", client)
+    monkeypatch.setattr(redis_module.cache_generations, "redis", FakeRedis(server=redis_server, decode_responses=True))
+    return client
+
+
+async def test_fields_of_other_schema_version_are_a_miss(cache_redis: FakeRedis) -> None:
+    """Поля hash, записанного для другой версии схемы, не читаются."""
+    from app.db.redis import MISSING_MARKER, _make_key, get_object_fields_from_cache
+
+    prefix = settings.redis.user_prefix
+    user = _user()
+    key = _make_key(prefix, 0, user.id)
+    await cache_redis.hset(key, mapping=encode_fields(user))
+
+    cached = await get_object_fields_from_cache(prefix, user.id, UserIdentitySchema, UserCacheSchema)
+    assert cached.found
+    assert cached.value == UserIdentitySchema.model_validate(user)
+
+    await cache_redis.hset(key, HASH_VERSION_FIELD, b"1")
+    cached = await get_object_fields_from_cache(prefix, user.id, UserIdentitySchema, UserCacheSchema)
+    assert not cached.found
+
+    await cache_redis.hset(key, HASH_VERSION_FIELD, MISSING_MARKER)
+    cached = await get_object_fields_from_cache(prefix, user.id, UserIdentitySchema, UserCacheSchema)
+    assert cached.found
+    assert cached.value is None
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from redis.exceptions import ConnectionError, RedisError
+
+from app.db.redis import CacheUnavailableError
+from app.utils import circuit_breaker
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    options = {
+        "name": "test",
+        "failure_threshold": 2,
+        "reset_timeout": 10,
+        "timeout": 0.05,
+        "slow_call_threshold": 1,
+        "exceptions": (RedisError,),
+        "error": CacheUnavailableError,
+    }
+    return CircuitBreaker(**(options | kwargs))
+
+
+async def _fail() -> None:
+    raise ConnectionError("connection refused")
+
+
+async def _ok() -> str:
+    return "ok"
+
+
+async def test_breaker_opens_after_consecutive_failures() -> None:
+    """После failure_threshold ошибок подряд обращения отклоняются без вызова сервиса."""
+    breaker = _breaker()
+    calls = 0
+
+    async def counted() -> None:
+        nonlocal calls
+        calls += 1
+        await _fail()
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(counted)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CacheUnavailableError):
+        await breaker.call(counted)
+    assert calls == 2
+
+
+async def test_success_resets_failure_count() -> None:
+    """Успешное обращение обнуляет счетчик ошибок."""
+    breaker = _breaker()
+    with pytest.raises(ConnectionError):
+        await breaker.call(_fail)
+    assert await breaker.call(_ok) == "ok"
+    with pytest.raises(ConnectionError):
+        await breaker.call(_fail)
+
+    assert breaker.state == CLOSED
+
+
+async def test_timeout_counts_as_failure() -> None:
+    """Обращение дольше timeout завершается ошибкой выключателя."""
+    breaker = _breaker(failure_threshold=1)
+
+    with pytest.raises(CacheUnavailableError):
+        await breaker.call(lambda: asyncio.sleep(1))
+
+    assert breaker.state == OPEN
+
+
+async def test_probe_after_reset_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
+    """После reset_timeout одно пробное обращение замыкает или снова размыкает выключатель."""
+    now = 1000.0
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now)
+    breaker = _breaker(failure_threshold=1)
+    with pytest.raises(ConnectionError):
+        await breaker.call(_fail)
+
+    now += 10
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(ConnectionError):
+        await breaker.call(_fail)
+    assert breaker.state == OPEN
+
+    now += 10
+    assert await breaker.call(_ok) == "ok"
+    assert breaker.state == CLOSED
@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.api.v1.auth import keys
+from app.api.v1.auth.keys import JWTKeyRing
+
+
+def _write_rsa_pair(keys_dir: Path, kid: str, public_format: str = "pem") -> rsa.RSAPrivateKey:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    keys_dir.mkdir(exist_ok=True)
+    (keys_dir / f"{kid}.pem").write_bytes(
+        private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+    )
+    if public_format == "openssh":
+        public_bytes = private_key.public_key().public_bytes(
+            serialization.Encoding.OpenSSH, serialization.PublicFormat.OpenSSH
+        )
+    else:
+        public_bytes = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+    (keys_dir / f"{kid}.pub").write_bytes(public_bytes)
+    return private_key
+
+
+def test_openssh_public_key_is_loaded(tmp_path: Path) -> None:
+    """Публичный ключ в формате OpenSSH разбирается так же, как PEM."""
+    private_key = _write_rsa_pair(tmp_path, "ssh", public_format="openssh")
+    key_ring = JWTKeyRing(keys_dir=tmp_path, algorithm="RS256")
+
+    key = key_ring.get_verification_key("ssh")
+
+    assert key is not None
+    assert key.algorithm == "RS256"
+    assert key.public_key.public_numbers() == private_key.public_key().public_numbers()
+
+
+def test_unknown_kid_reload_is_rate_limited(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Токены с неизвестным kid проверяют каталог ключей не чаще unknown_kid_reload_interval."""
+    _write_rsa_pair(tmp_path, "first")
+    key_ring = JWTKeyRing(keys_dir=tmp_path, algorithm="RS256", reload_interval=60, unknown_kid_reload_interval=5)
+    key_ring.load()
+    now = 1000.0
+    monkeypatch.setattr(keys.time, "monotonic", lambda: now)
+    checks = 0
+    get_fingerprint = key_ring._get_fingerprint
+
+    def counting_fingerprint() -> tuple:
+        nonlocal checks
+        checks += 1
+        return get_fingerprint()
+
+    monkeypatch.setattr(key_ring, "_get_fingerprint", counting_fingerprint)
+
+    for _ in range(10):
+        assert key_ring.get_verification_key("unknown") is None
+    assert checks == 1
+
+    _write_rsa_pair(tmp_path, "second")
+    assert key_ring.get_verification_key("second") is None
+    now += 5
+    assert key_ring.get_verification_key("second") is not None
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import CheckConstraint
+
+from app.db.models import Message, Thread
+
+
+@pytest.mark.parametrize(
+    ("table", "id_column", "created_at_column"),
+    [
+        (Message.__table__, "quoted_message_id", "quoted_message_created_at"),
+        (Thread.__table__, "parent_message_id", "parent_message_created_at"),
+    ],
+)
+def test_message_reference_created_at_is_not_filled_in_python(table, id_column, created_at_column) -> None:
+    """Время создания в ссылке на сообщение не подставляется в python и проверяется вместе с id."""
+    column = table.c[created_at_column]
+
+    assert column.default is None
+    assert column.server_default is not None
+    checks = [
+        str(constraint.sqltext)
+        for constraint in table.constraints
+        if isinstance(constraint, CheckConstraint) and id_column in str(constraint.sqltext)
+    ]
+    assert len(checks) == 1
+    assert created_at_column in checks[0]
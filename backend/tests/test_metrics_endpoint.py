@@ -0,0 +1,36 @@
+import pytest
+from fastapi import HTTPException, Request
+
+from app.api.v1.metrics.views import check_metrics_access
+from app.config import settings
+
+
+def _request(client_host: str, headers: dict[str, str] | None = None) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/metrics/",
+            "headers": [(name.encode(), value.encode()) for name, value in (headers or {}).items()],
+            "client": (client_host, 12345),
+        }
+    )
+
+
+def test_metrics_disabled_by_default() -> None:
+    """Эндпоинт метрик подключается только явной настройкой."""
+    assert settings.metrics.enabled is False
+
+
+def test_metrics_allowed_from_loopback() -> None:
+    """С разрешенного адреса метрики отдаются."""
+    check_metrics_access(_request("127.0.0.1"))
+
+
+@pytest.mark.parametrize("client_host", ["203.0.113.7", "testclient"])
+def test_metrics_forbidden_from_other_addresses(client_host: str) -> None:
+    """С остальных адресов метрики не отдаются, X-Forwarded-For не учитывается."""
+    with pytest.raises(HTTPException) as error:
+        check_metrics_access(_request(client_host, {"x-forwarded-for": "127.0.0.1"}))
+
+    assert error.value.status_code == 403
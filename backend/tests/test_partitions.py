@@ -0,0 +1,38 @@
+import datetime
+
+from app.db.partitions import is_partition_name, messages_partitions, month_start
+
+
+def test_month_start_shifts_across_years() -> None:
+    """Начало месяца со сдвигом считается в UTC и переходит через границу года."""
+    day = datetime.date(2026, 11, 17)
+
+    assert month_start(day) == datetime.datetime(2026, 11, 1, tzinfo=datetime.timezone.utc)
+    assert month_start(day, 2) == datetime.datetime(2027, 1, 1, tzinfo=datetime.timezone.utc)
+    assert month_start(day, -11) == datetime.datetime(2025, 12, 1, tzinfo=datetime.timezone.utc)
+
+
+def test_partition_names() -> None:
+    """Секции таблицы отличаются от других таблиц с похожими именами."""
+    assert is_partition_name("messages_2026_10", {"messages"})
+    assert is_partition_name("messages_initial", {"messages"})
+    assert not is_partition_name("messages_2026_10", {"threads"})
+    assert not is_partition_name("message_attachments", {"messages"})
+
+
+def test_archive_checks_every_reference_to_messages() -> None:
+    """Перед архивацией проверяются все внешние ключи на сообщения, а строки других таблиц не меняются."""
+    queries = messages_partitions._reference_queries("messages_2026_10")
+
+    assert set(queries) == {
+        "last_read_message_by_user(message_id, message_created_at)",
+        "message_attachments(message_id, message_created_at)",
+        "messages(quoted_message_id, quoted_message_created_at)",
+        "threads(parent_message_id, parent_message_created_at)",
+    }
+    assert (
+        queries["threads(parent_message_id, parent_message_created_at)"]
+        == "SELECT EXISTS (SELECT 1 FROM threads r JOIN messages_2026_10 p "
+        "ON r.parent_message_id = p.id AND r.parent_message_created_at = p.created_at)"
+    )
+    assert all(query.startswith("SELECT EXISTS") for query in queries.values())
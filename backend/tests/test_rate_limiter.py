@@ -0,0 +1,70 @@
+import pytest
+from fakeredis.aioredis import FakeRedis
+from fastapi import HTTPException, Request
+
+from app.config import settings
+from app.utils.rate_limiter import RateLimiter, get_client_ip
+
+
+def _request(forwarded_for: list[str], client_host: str = "10.0.0.2") -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded_for],
+            "client": (client_host, 12345),
+        }
+    )
+
+
+@pytest.fixture
+def trusted_proxies(monkeypatch: pytest.MonkeyPatch):
+    """Включает доверие X-Forwarded-For и позволяет задать количество прокси."""
+    monkeypatch.setattr(settings.rate_limit, "trust_forwarded_for", True)
+
+    def set_hops(hops: int) -> None:
+        monkeypatch.setattr(settings.rate_limit, "trusted_proxy_hops", hops)
+
+    set_hops(1)
+    return set_hops
+
+
+def test_forwarded_for_is_ignored_by_default() -> None:
+    """Без доверенного прокси используется адрес соединения."""
+    assert get_client_ip(_request(["203.0.113.7"])) == "10.0.0.2"
+
+
+def test_spoofed_forwarded_for_entries_are_skipped(trusted_proxies) -> None:
+    """Записи, которые клиент подставил сам, не подменяют его адрес."""
+    assert get_client_ip(_request(["1.1.1.1, 203.0.113.7"])) == "203.0.113.7"
+    trusted_proxies(2)
+    assert get_client_ip(_request(["1.1.1.1, 203.0.113.7, 198.51.100.1"])) == "203.0.113.7"
+    assert get_client_ip(_request(["1.1.1.1, 203.0.113.7", "198.51.100.1"])) == "203.0.113.7"
+
+
+def test_short_forwarded_for_uses_leftmost_entry(trusted_proxies) -> None:
+    """Если записей меньше чем прокси, берется самая левая."""
+    trusted_proxies(3)
+    assert get_client_ip(_request(["203.0.113.7, 198.51.100.1"])) == "203.0.113.7"
+    assert get_client_ip(_request([])) == "10.0.0.2"
+
+
+async def test_rate_limiter_rejects_after_limit(redis: FakeRedis) -> None:
+    """После исчерпания лимита запрос отклоняется с 429 и Retry-After."""
+    limiter = RateLimiter(redis=redis, prefix="test", rules={"ip": (2, 60)})
+    await limiter.check(ip="203.0.113.7")
+    await limiter.check(ip="203.0.113.7")
+
+    with pytest.raises(HTTPException) as error:
+        await limiter.check(ip="203.0.113.7")
+
+    assert error.value.status_code == 429
+    assert int(error.value.headers["Retry-After"]) >= 1
+    await limiter.check(ip="198.51.100.1")
+
+
+async def test_rate_limiter_allows_when_redis_is_down(redis_down: FakeRedis) -> None:
+    """Недоступный Redis не блокирует вход."""
+    limiter = RateLimiter(redis=redis_down, prefix="test", rules={"ip": (1, 60)})
+
+    await limiter.check(ip="203.0.113.7")
+    await limiter.check(ip="203.0.113.7")
@@ -0,0 +1,54 @@
+import uuid
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from app.api.v1.dependencies.users import get_current_user_read_session
+from app.db import db_helper
+from app.db.db_helper import ReplicaSelector
+from app.db.read_your_writes import read_your_writes
+
+
+def _primary_factory():
+    raise AssertionError("Сессия не должна создаваться")
+
+
+def _replica_factory():
+    raise AssertionError("Сессия не должна создаваться")
+
+
+@pytest.fixture
+def replicas(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Основная база и одна реплика без настоящих соединений."""
+    monkeypatch.setattr(db_helper, "primary_read_session_factory", _primary_factory)
+    monkeypatch.setattr(db_helper, "replica_engines", [object()])
+    monkeypatch.setattr(db_helper, "replica_session_factories", [_replica_factory])
+    monkeypatch.setattr(db_helper, "replica_selector", ReplicaSelector(1, "round_robin"))
+    monkeypatch.setattr(read_your_writes, "window", 5)
+
+
+async def _read_session_factory(user_id: uuid.UUID):
+    sessions = get_current_user_read_session(user_id)
+    session = await anext(sessions)
+    await sessions.aclose()
+    return session._session_factory
+
+
+@pytest.mark.usefixtures("replicas")
+async def test_reads_stick_to_primary_after_write(redis: FakeRedis, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Чтения пользователя идут на реплику, а после его записи - в основную базу."""
+    monkeypatch.setattr(read_your_writes, "redis", redis)
+    user_id, other_user_id = uuid.uuid4(), uuid.uuid4()
+
+    assert await _read_session_factory(user_id) is _replica_factory
+    await read_your_writes.mark(user_id)
+    assert await _read_session_factory(user_id) is _primary_factory
+    assert await _read_session_factory(other_user_id) is _replica_factory
+
+
+@pytest.mark.usefixtures("replicas")
+async def test_reads_go_to_primary_when_redis_is_down(redis_down: FakeRedis, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Если отметки о записи недоступны, чтения идут в основную базу."""
+    monkeypatch.setattr(read_your_writes, "redis", redis_down)
+
+    assert await _read_session_factory(uuid.uuid4()) is _primary_factory
@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.api.v1.auth.jwt import create_access_token
+from app.api.v1.auth.revocation import revocation_list
+from app.api.v1.auth.security_version import security_versions
+from app.api.v1.dependencies import users as users_dependencies
+from app.api.v1.dependencies.jwt import get_access_token_payload
+from app.api.v1.dependencies.users import CurrentUserContext, get_identity_from_access_token
+from app.api.v1.users.schemas import UserIdentitySchema
+from app.config import settings
+
+pytestmark = pytest.mark.usefixtures("jwt_keys")
+
+
+@pytest.fixture
+def revocation_redis_down(redis_down: FakeRedis, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Список отзыва и версии безопасности работают с недоступным Redis."""
+    monkeypatch.setattr(revocation_list, "redis", redis_down)
+    monkeypatch.setattr(revocation_list, "_synced", False)
+    monkeypatch.setattr(security_versions, "redis", redis_down)
+
+
+def _credentials(claims: dict | None = None) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token(uuid.uuid4(), claims))
+
+
+@pytest.mark.usefixtures("revocation_redis_down")
+async def test_token_check_fails_closed_without_subscription() -> None:
+    """Без подписки и без Redis отзыв проверить нельзя, поэтому запрос отклоняется с 503, а не 500."""
+    with pytest.raises(HTTPException) as error:
+        await get_access_token_payload(_credentials())
+
+    assert error.value.status_code == 503
+
+
+@pytest.mark.usefixtures("revocation_redis_down")
+async def test_token_check_uses_filter_while_subscribed(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Пока фильтр синхронизирован, токены вне фильтра принимаются без обращения к Redis."""
+    monkeypatch.setattr(revocation_list, "_synced", True)
+
+    payload = await get_access_token_payload(_credentials())
+
+    assert payload["token_type"] == "access"
+
+
+@pytest.mark.usefixtures("revocation_redis_down")
+async def test_identity_falls_back_to_database(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Если версия безопасности недоступна, данные пользователя загружаются в обход токена."""
+    monkeypatch.setattr(settings.jwt, "self_contained_access_tokens", True)
+    user_id = uuid.uuid4()
+    payload = {"sub": str(user_id), "sv": 0, "act": True, "tz": None}
+    loaded = UserIdentitySchema(id=user_id, active=True, timezone_id=3)
+
+    async def get_user_identity_by_id(session, requested_id: uuid.UUID) -> UserIdentitySchema:
+        assert requested_id == user_id
+        return loaded
+
+    monkeypatch.setattr(users_dependencies.crud, "get_user_identity_by_id", get_user_identity_by_id)
+
+    assert await get_identity_from_access_token(payload) is None
+    assert await CurrentUserContext(payload, session=None).get_identity() == loaded
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+from redis.exceptions import RedisError
+
+from app.api.v1.auth.revocation import BloomFilter, TokenRevocationList
+from app.db.pubsub import RedisPubSubListener
+
+
+def _revocation_list(redis: FakeRedis) -> TokenRevocationList:
+    return TokenRevocationList(
+        redis=redis,
+        listener=RedisPubSubListener(redis),
+        key="revoked",
+        channel="revoked",
+        capacity=100,
+        error_rate=0.001,
+        rebuild_interval=60,
+    )
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    """Добавленные элементы всегда находятся в фильтре."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    assert sum(f"other-{i}" in bloom for i in range(1000)) < 50
+
+
+async def test_revoked_token_is_detected(redis: FakeRedis) -> None:
+    """Отозванный токен находится и по фильтру, и без подписки."""
+    revocation_list = _revocation_list(redis)
+    await revocation_list._on_connect()
+    await revocation_list.revoke("revoked-jti", time.time() + 60)
+
+    assert await revocation_list.is_revoked({"jti": "revoked-jti"})
+    assert not await revocation_list.is_revoked({"jti": "other-jti"})
+    revocation_list._on_disconnect()
+    assert await revocation_list.is_revoked({"jti": "revoked-jti"})
+
+
+async def test_revocation_during_rebuild_is_kept(redis: FakeRedis, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Отзыв, пришедший пока фильтр пересобирается, попадает в новый фильтр."""
+    revocation_list = _revocation_list(redis)
+    await revocation_list._on_connect()
+    zrange = redis.zrange
+    reading = asyncio.Event()
+    resume = asyncio.Event()
+
+    async def slow_zrange(*args, **kwargs):
+        result = await zrange(*args, **kwargs)
+        reading.set()
+        await resume.wait()
+        return result
+
+    monkeypatch.setattr(redis, "zrange", slow_zrange)
+    rebuild = asyncio.create_task(revocation_list._rebuild())
+    await reading.wait()
+    # Сообщение из pub/sub о токене, отозванном другим воркером.
+    revocation_list._add("concurrent-jti")
+    resume.set()
+    await rebuild
+
+    assert "concurrent-jti" in revocation_list._filter
+    assert revocation_list._pending is None
+
+
+async def test_failed_rebuild_keeps_old_filter(redis: FakeRedis, monkeypatch: pytest.MonkeyPatch) -> None:
+    """При ошибке Redis во время пересборки остается прежний фильтр."""
+    revocation_list = _revocation_list(redis)
+    await revocation_list._on_connect()
+    revocation_list._add("known-jti")
+    old_filter = revocation_list._filter
+
+    async def failing_zrange(*args, **kwargs):
+        raise RedisError("connection lost")
+
+    monkeypatch.setattr(redis, "zrange", failing_zrange)
+    with pytest.raises(RedisError):
+        await revocation_list._rebuild()
+
+    assert revocation_list._filter is old_filter
+    assert revocation_list._pending is None
+    revocation_list._add("later-jti")
+    assert "later-jti" in revocation_list._filter
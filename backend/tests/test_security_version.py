@@ -0,0 +1,78 @@
+import uuid
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+from redis.exceptions import RedisError
+
+from app.api.v1.auth.jwt import decode_token
+from app.api.v1.auth.security_version import UserSecurityVersions, security_versions
+from app.api.v1.dependencies.jwt import get_current_user_id
+from app.api.v1.users.schemas import UserIdentitySchema
+from app.api.v1.users.views import _create_tokens_pair, router
+from app.config import settings
+from app.db.pubsub import RedisPubSubListener
+from app.db.redis import redis_breaker
+from app.utils.circuit_breaker import OPEN
+
+
+def _security_versions(redis: FakeRedis) -> UserSecurityVersions:
+    return UserSecurityVersions(
+        redis=redis,
+        listener=RedisPubSubListener(redis),
+        prefix="sv",
+        channel="sv",
+        max_size=100,
+        ttl=60,
+        breaker=redis_breaker,
+    )
+
+
+async def test_versions_are_cached_only_while_synced(redis: FakeRedis) -> None:
+    """Версии кешируются только пока подписка активна и сбрасываются при ее разрыве."""
+    versions = _security_versions(redis)
+    user_id = str(uuid.uuid4())
+
+    assert await versions.get(user_id) == 0
+    assert len(versions) == 0
+    await versions._on_connect()
+    assert await versions.get(user_id) == 0
+    assert len(versions) == 1
+    assert await versions.bump(user_id) == 1
+    assert await versions.get(user_id) == 1
+    versions._on_disconnect()
+    assert not versions.synced
+    assert len(versions) == 0
+
+
+async def test_unavailable_redis_opens_breaker(redis_down: FakeRedis) -> None:
+    """Недоступный Redis приводит к RedisError и размыкает выключатель."""
+    versions = _security_versions(redis_down)
+
+    for _ in range(settings.redis.breaker_failure_threshold):
+        with pytest.raises(RedisError):
+            await versions.get(uuid.uuid4())
+
+    assert redis_breaker.state == OPEN
+
+
+async def test_tokens_are_issued_without_claims_when_redis_is_down(
+    redis_down: FakeRedis, jwt_keys: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Без версии безопасности вход работает, а токен выдается без вшитых данных пользователя."""
+    monkeypatch.setattr(settings.jwt, "self_contained_access_tokens", True)
+    monkeypatch.setattr(security_versions, "redis", redis_down)
+    user = UserIdentitySchema(id=uuid.uuid4(), active=True, timezone_id=None)
+
+    tokens = await _create_tokens_pair(user)
+
+    payload = decode_token(tokens.access_token)
+    assert payload["sub"] == str(user.id)
+    assert "sv" not in payload
+
+
+@pytest.mark.parametrize("name", ["schedule_deletion_user_me", "cancel_deletion_user_me", "partial_update_user_me"])
+def test_user_me_writes_authorize_by_token_only(name: str) -> None:
+    """Изменение текущего пользователя берет id из токена, не обращаясь к кешу и базе."""
+    route = next(route for route in router.routes if route.name == name)
+
+    assert get_current_user_id in [dependency.call for dependency in route.dependant.dependencies]
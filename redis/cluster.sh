@@ -0,0 +1,35 @@
+#!/bin/sh
+# Локальный Redis Cluster из трех мастеров без реплик в одном контейнере, для разработки и проверки
+# работы бэкенда с кластером. Узлы объявляют адрес контейнера, чтобы клиенты из других контейнеров
+# могли подключаться к ним напрямую.
+set -e
+
+PORTS="7000 7001 7002"
+IP=$(hostname -i | awk '{print $1}')
+NODES=""
+
+for PORT in $PORTS; do
+    mkdir -p "/data/$PORT"
+    rm -f "/data/$PORT/nodes.conf"
+    redis-server \
+        --port "$PORT" \
+        --bind 0.0.0.0 \
+        --protected-mode no \
+        --cluster-enabled yes \
+        --cluster-config-file "/data/$PORT/nodes.conf" \
+        --cluster-announce-ip "$IP" \
+        --dir "/data/$PORT" \
+        --save "" \
+        --appendonly no &
+    NODES="$NODES $IP:$PORT"
+done
+
+for PORT in $PORTS; do
+    until redis-cli -p "$PORT" ping > /dev/null 2>&1; do
+        sleep 0.1
+    done
+done
+
+redis-cli --cluster create $NODES --cluster-replicas 0 --cluster-yes
+
+wait